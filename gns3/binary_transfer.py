@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Binary sub-protocol to transfer files to servers in chunks.
+
+A transfer is opened with an "upload.start" JSON-RPC request, the file
+content is then sent in binary WebSocket messages (a header followed by
+the chunk data) and the server acknowledges what it has written with
+binary acknowledgment messages or "upload.ack" notifications. At most
+one window of unacknowledged data is in flight. The transfer is closed
+with an "upload.finish" request, the server replies with the path where
+it stored the file.
+
+Only servers selecting the gns3-binary sub-protocol during the handshake
+receive binary messages. They also accept a "<name>_upload" parameter,
+with the destination of an uploaded file, wherever a "<name>_base64"
+parameter is accepted (e.g. "startup_config_upload").
+"""
+
+import struct
+
+# WebSocket sub-protocol name
+BINARY_PROTOCOL = "gns3-binary"
+
+# binary message header: message type, transfer ID, offset in the file
+CHUNK_HEADER = struct.Struct("!BIQ")
+MESSAGE_CHUNK = 1
+
+# binary acknowledgment: message type, transfer ID, number of bytes written by the server
+ACK_MESSAGE = struct.Struct("!BIQ")
+MESSAGE_ACK = 2
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_WINDOW = 16 * DEFAULT_CHUNK_SIZE
+
+
+class BinaryTransferError(Exception):
+    """
+    Invalid binary message or acknowledgment.
+    """
+
+    pass
+
+
+def encodeChunk(transfer_id, offset, data):
+    """
+    Builds a binary message carrying a chunk of file.
+
+    :param transfer_id: transfer identifier (integer)
+    :param offset: position of the chunk in the file
+    :param data: chunk data (bytes)
+
+    :returns: binary message (bytes)
+    """
+
+    return CHUNK_HEADER.pack(MESSAGE_CHUNK, transfer_id, offset) + data
+
+
+def decodeChunk(message):
+    """
+    Decodes a binary message carrying a chunk of file.
+
+    :param message: binary message (bytes)
+
+    :returns: tuple (transfer ID, offset, chunk data)
+    """
+
+    if len(message) < CHUNK_HEADER.size:
+        raise BinaryTransferError("binary message too short ({} bytes)".format(len(message)))
+    message_type, transfer_id, offset = CHUNK_HEADER.unpack_from(message)
+    if message_type != MESSAGE_CHUNK:
+        raise BinaryTransferError("unknown binary message type {}".format(message_type))
+    return transfer_id, offset, message[CHUNK_HEADER.size:]
+
+
+def encodeAck(transfer_id, offset):
+    """
+    Builds a binary acknowledgment message.
+
+    :param transfer_id: transfer identifier (integer)
+    :param offset: number of bytes written by the server
+
+    :returns: binary message (bytes)
+    """
+
+    return ACK_MESSAGE.pack(MESSAGE_ACK, transfer_id, offset)
+
+
+def decodeAck(message):
+    """
+    Decodes a binary acknowledgment message.
+
+    :param message: binary message (bytes)
+
+    :returns: tuple (transfer ID, offset)
+    """
+
+    if len(message) != ACK_MESSAGE.size:
+        raise BinaryTransferError("invalid acknowledgment size ({} bytes)".format(len(message)))
+    message_type, transfer_id, offset = ACK_MESSAGE.unpack(message)
+    if message_type != MESSAGE_ACK:
+        raise BinaryTransferError("unknown binary message type {}".format(message_type))
+    return transfer_id, offset
+
+
+class FlowControl(object):
+    """
+    Keeps track of the data sent and acknowledged during a transfer.
+
+    :param size: total number of bytes to transfer
+    :param window: maximum number of unacknowledged bytes
+    """
+
+    def __init__(self, size, window=DEFAULT_WINDOW):
+
+        self._size = size
+        self._window = window
+        self._sent = 0
+        self._acknowledged = 0
+
+    def size(self):
+        """
+        Returns the total number of bytes to transfer.
+
+        :returns: integer
+        """
+
+        return self._size
+
+    def sentBytes(self):
+        """
+        Returns the number of bytes sent.
+
+        :returns: integer
+        """
+
+        return self._sent
+
+    def acknowledgedBytes(self):
+        """
+        Returns the number of bytes acknowledged by the server.
+
+        :returns: integer
+        """
+
+        return self._acknowledged
+
+    def available(self):
+        """
+        Returns how many bytes can be sent without exceeding the window.
+
+        :returns: integer
+        """
+
+        return max(0, min(self._window - (self._sent - self._acknowledged), self._size - self._sent))
+
+    def recordSent(self, nbytes):
+        """
+        Records bytes sent to the server.
+
+        :param nbytes: number of bytes
+        """
+
+        self._sent += nbytes
+
+    def acknowledge(self, offset):
+        """
+        Records an acknowledgment from the server.
+
+        :param offset: number of bytes written by the server
+
+        :returns: True if the acknowledgment made progress
+        """
+
+        if offset > self._sent:
+            raise BinaryTransferError("acknowledged {} bytes but only {} have been sent".format(offset, self._sent))
+        if offset <= self._acknowledged:
+            # duplicated or out of order acknowledgment
+            return False
+        self._acknowledged = offset
+        return True
+
+    def sendingDone(self):
+        """
+        Returns if all the data has been sent.
+
+        :returns: True or False
+        """
+
+        return self._sent >= self._size
+
+    def done(self):
+        """
+        Returns if all the data has been acknowledged.
+
+        :returns: True or False
+        """
+
+        return self._acknowledged >= self._size
+
+    def progress(self):
+        """
+        Returns the transfer progress.
+
+        :returns: percentage (integer)
+        """
+
+        if not self._size:
+            return 100
+        return self._acknowledged * 100 // self._size
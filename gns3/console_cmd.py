@@ -38,8 +38,13 @@ class ConsoleCmd(cmd.Cmd):
     def do_debug(self, args):
         """
         debug [level] (0 or 1).
+        debug stats: JSON-RPC latency and traffic for each server.
         """
 
+        if args.strip() == "stats":
+            self._printServerStatistics()
+            return
+
         root = logging.getLogger()
         ch = logging.StreamHandler(sys.stdout)
 
@@ -56,3 +61,22 @@ class ConsoleCmd(cmd.Cmd):
                 print(self.do_debug.__doc__)
         else:
             print(self.do_debug.__doc__)
+
+    def _printServerStatistics(self):
+        """
+        Prints the JSON-RPC statistics of all the servers.
+        """
+
+        from .servers import Servers
+        servers = Servers.instance()
+        for server in [servers.localServer()] + list(servers.remoteServers().values()):
+            if server.connected():
+                status = "connected"
+            else:
+                status = "disconnected"
+            print("Server {}:{} ({}, {} request(s) in flight)".format(server.host,
+                                                                      server.port,
+                                                                      status,
+                                                                      server.pendingRequestCount()))
+            for line in server.statistics().summary():
+                print("  {}".format(line))
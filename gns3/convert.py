@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Converts project files between the JSON and binary formats.
+"""
+
+import sys
+import argparse
+
+from gns3.project_file import isBinaryProjectFile, readProjectFile, writeProjectFile
+from gns3.version import __version__
+
+
+def main():
+    """
+    Entry point for gns3-convert.
+    """
+
+    parser = argparse.ArgumentParser(description="Converts GNS3 project files between the JSON and binary formats")
+    parser.add_argument("input", help="project file to convert")
+    parser.add_argument("output", help="converted project file")
+    parser.add_argument("--to", choices=["json", "binary"], help="format of the converted file (default: the other format)")
+    parser.add_argument("--version", action="version", version="%(prog)s {}".format(__version__))
+    args = parser.parse_args()
+
+    try:
+        binary = isBinaryProjectFile(args.input)
+        topology = readProjectFile(args.input)
+        if args.to:
+            binary = args.to == "binary"
+        else:
+            binary = not binary
+        writeProjectFile(args.output, topology, binary)
+    except (OSError, ValueError) as e:
+        print("Could not convert {}: {}".format(args.input, e), file=sys.stderr)
+        return 1
+
+    print("{} converted to {} ({} format)".format(args.input, args.output, "binary" if binary else "JSON"))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
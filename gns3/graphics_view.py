@@ -32,7 +32,7 @@ from .settings import GRAPHICS_VIEW_SETTINGS, GRAPHICS_VIEW_SETTING_TYPES
 from .topology import Topology
 from .ports.port import Port
 from .utils.progress_dialog import ProgressDialog
-from .utils.wait_for_connection_thread import WaitForConnectionThread
+from .utils.connect_to_server import ConnectToServer
 
 # link items
 from .items.link_item import LinkItem
@@ -63,6 +63,9 @@ class GraphicsView(QtGui.QGraphicsView):
         self._last_mouse_position = None
         self._topology = Topology.instance()
 
+        # node items on the scene (node ID -> NodeItem instance)
+        self._node_items = {}
+
         # set the scene
         scene = QtGui.QGraphicsScene(parent=self)
         width = self._settings["scene_width"]
@@ -103,8 +106,52 @@ class GraphicsView(QtGui.QGraphicsView):
         self._main_window.uiTopologySummaryTreeWidget.clear()
 
         # clear all objects on the scene
+        self._node_items.clear()
         self.scene().clear()
 
+    def addNodeItem(self, node_item):
+        """
+        Adds a node item to the scene.
+
+        :param node_item: NodeItem instance
+        """
+
+        self.scene().addItem(node_item)
+        self._node_items[node_item.node().id()] = node_item
+
+    def removeNodeItem(self, node_item):
+        """
+        Removes a node item from the scene.
+
+        :param node_item: NodeItem instance
+        """
+
+        node_id = node_item.node().id()
+        if self._node_items.get(node_id) is node_item:
+            del self._node_items[node_id]
+        if node_item.scene() is self.scene():
+            self.scene().removeItem(node_item)
+
+    def nodeItem(self, node_id):
+        """
+        Returns the node item of a node.
+
+        :param node_id: node identifier
+
+        :returns: NodeItem instance or None
+        """
+
+        return self._node_items.get(node_id)
+
+    def nodeItems(self):
+        """
+        Returns the node items on the scene.
+
+        :returns: dictionary of NodeItem instances (node ID -> NodeItem instance)
+        """
+
+        return self._node_items
+
     def updateProjectFilesDir(self, path):
         """
         Updates the project files directory path for all modules.
@@ -180,6 +227,8 @@ class GraphicsView(QtGui.QGraphicsView):
         :param source_port: source Port instance
         :param destination_node: destination Node instance
         :param destination_port: destination Port instance
+
+        :returns: Link instance
         """
 
         link = Link(source_node, source_port, destination_node, destination_port)
@@ -189,6 +238,7 @@ class GraphicsView(QtGui.QGraphicsView):
         link.add_link_signal.connect(self.addLinkSlot)
         link.delete_link_signal.connect(self.deleteLinkSlot)
         self._topology.addLink(link)
+        return link
 
     def addLinkSlot(self, link_id):
         """
@@ -199,20 +249,12 @@ class GraphicsView(QtGui.QGraphicsView):
         """
 
         link = self._topology.getLink(link_id)
-        source_item = None
-        destination_item = None
         source_port = link._source_port
         destination_port = link._destination_port
 
         # find the correct source and destination node items
-        for item in self.scene().items():
-            if isinstance(item, NodeItem):
-                if item.node().id() == link._source_node.id():
-                    source_item = item
-                if item.node().id() == link._destination_node.id():
-                    destination_item = item
-            if source_item and destination_item:
-                break
+        source_item = self._node_items.get(link._source_node.id())
+        destination_item = self._node_items.get(link._destination_node.id())
 
         if not source_item or not destination_item:
             print("Could not find a source or destination item for the link!")
@@ -265,9 +307,10 @@ class GraphicsView(QtGui.QGraphicsView):
         """
 
         link = self._topology.getLink(link_id)
-        # disconnect the signals just in case...
-        link.add_link_signal.disconnect()
-        link.delete_link_signal.disconnect()
+        # disconnect the signals just in case, the other receivers
+        # (e.g. a topology loader) must still be notified.
+        link.add_link_signal.disconnect(self.addLinkSlot)
+        link.delete_link_signal.disconnect(self.deleteLinkSlot)
         self._topology.removeLink(link)
 
     def _userNodeLinking(self, event, item):
@@ -790,7 +833,7 @@ class GraphicsView(QtGui.QGraphicsView):
             server = node_module.allocateServer(node_class)
             if not server.connected():
                 # connect to server in a non-blocking way.
-                self._thread = WaitForConnectionThread(server.host, server.port)
+                self._thread = ConnectToServer(server)
                 progress_dialog = ProgressDialog(self._thread,
                                                  "Server",
                                                  "Connecting to server {} on port {}...".format(server.host, server.port),
@@ -809,7 +852,7 @@ class GraphicsView(QtGui.QGraphicsView):
             QtGui.QMessageBox.critical(self, "Node creation", "{}".format(e))
             return
         node_item.setPos(self.mapToScene(pos))
-        self.scene().addItem(node_item)
+        self.addNodeItem(node_item)
         x = node_item.pos().x() - (node_item.boundingRect().width() / 2)
         y = node_item.pos().y() - (node_item.boundingRect().height() / 2)
         node_item.setPos(x, y)
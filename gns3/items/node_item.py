@@ -165,8 +165,10 @@ class NodeItem(QtSvg.QGraphicsSvgItem):
 
     def updatedSlot(self):
 
+        from ..topology import Topology
         self.textItem.setPlainText(self._node.name())
         self.setUnsavedState()
+        Topology.instance().nodeUpdated(self._node)
 
     def deleteLinksSlot(self):
         """
@@ -183,8 +185,8 @@ class NodeItem(QtSvg.QGraphicsSvgItem):
         when the node has been deleted.
         """
 
-        if self in self.scene().items():
-            self.scene().removeItem(self)
+        from ..main_window import MainWindow
+        MainWindow.instance().uiGraphicsView.removeNodeItem(self)
         self.setUnsavedState()
 
     def serverErrorSlot(self, node_id, code, message):
@@ -315,6 +317,9 @@ class NodeItem(QtSvg.QGraphicsSvgItem):
             self.setUnsavedState()
             for link in self._links:
                 link.adjust()
+            if change == QtSvg.QGraphicsSvgItem.ItemPositionHasChanged:
+                from ..topology import Topology
+                Topology.instance().nodeMoved(self._node, self.x(), self.y())
 
         return QtGui.QGraphicsItem.itemChange(self, change, value)
 
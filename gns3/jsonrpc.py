@@ -20,8 +20,13 @@ JSON-RPC protocol implementation.
 http://www.jsonrpc.org/specification
 """
 
+import itertools
 import json
-import uuid
+
+JSONRPC_VERSION = 2.0
+
+# cheap monotonic counter used to generate request identifiers
+_request_ids = itertools.count(1)
 
 
 class JSONRPCObject(object):
@@ -30,14 +35,25 @@ class JSONRPCObject(object):
     notifications and errors.
     """
 
-    def __init__(self):
-        return JSONRPCEncoder().default(self)
+    __slots__ = ()
+
+    def __str__(self):
+
+        return json.dumps(self())
 
-    def __str__(self, *args, **kwargs):
-        return json.dumps(self, cls=JSONRPCEncoder)
+    def __bytes__(self):
+
+        return json.dumps(self()).encode("utf-8")
 
     def __call__(self):
-        return JSONRPCEncoder().default(self)
+        """
+        Returns a Python dictionary corresponding to this JSON-RPC message.
+        Must be overloaded.
+
+        :returns: dictionary
+        """
+
+        raise NotImplementedError()
 
 
 class JSONRPCEncoder(json.JSONEncoder):
@@ -51,77 +67,95 @@ class JSONRPCEncoder(json.JSONEncoder):
         """
 
         if isinstance(obj, JSONRPCObject):
-            message = {"jsonrpc": 2.0}
-            for field in dir(obj):
-                if not field.startswith('_'):
-                    value = getattr(obj, field)
-                    message[field] = value
-            return message
+            return obj()
         return json.JSONEncoder.default(self, obj)
 
 
-class JSONRPCInvalidRequest(JSONRPCObject):
+class JSONRPCError(JSONRPCObject):
+    """
+    Base JSON-RPC error response.
+
+    :param code: JSON-RPC error code
+    :param message: JSON-RPC error message
+    :param request_id: JSON-RPC identifier (optional)
+    """
+
+    __slots__ = ("id", "error")
+
+    def __init__(self, code, message, request_id=None):
+
+        self.id = request_id
+        self.error = {"code": code, "message": message}
+
+    def __call__(self):
+
+        return {"jsonrpc": JSONRPC_VERSION,
+                "id": self.id,
+                "error": self.error}
+
+
+class JSONRPCInvalidRequest(JSONRPCError):
     """
     Error response for an invalid request.
     """
 
+    __slots__ = ()
+
     def __init__(self):
-        JSONRPCObject.__init__(self)
-        self.id = None
-        self.error = {"code": -32600, "message": "Invalid Request"}
+        JSONRPCError.__init__(self, -32600, "Invalid Request")
 
 
-class JSONRPCMethodNotFound(JSONRPCObject):
+class JSONRPCMethodNotFound(JSONRPCError):
     """
     Error response for an method not found.
 
     :param request_id: JSON-RPC identifier
     """
 
+    __slots__ = ()
+
     def __init__(self, request_id):
-        JSONRPCObject.__init__(self)
-        self.id = request_id
-        self.error = {"code": -32601, "message": "Method not found"}
+        JSONRPCError.__init__(self, -32601, "Method not found", request_id)
 
 
-class JSONRPCInvalidParams(JSONRPCObject):
+class JSONRPCInvalidParams(JSONRPCError):
     """
     Error response for invalid parameters.
 
     :param request_id: JSON-RPC identifier
     """
 
+    __slots__ = ()
+
     def __init__(self, request_id):
-        JSONRPCObject.__init__(self)
-        self.id = request_id
-        self.error = {"code": -32602, "message": "Invalid params"}
+        JSONRPCError.__init__(self, -32602, "Invalid params", request_id)
 
 
-class JSONRPCInternalError(JSONRPCObject):
+class JSONRPCInternalError(JSONRPCError):
     """
     Error response for an internal error.
 
     :param request_id: JSON-RPC identifier (optional)
     """
 
+    __slots__ = ()
+
     def __init__(self, request_id=None):
-        JSONRPCObject.__init__(self)
-        self.id = request_id
-        self.error = {"code": -32603, "message": "Internal error"}
+        JSONRPCError.__init__(self, -32603, "Internal error", request_id)
 
 
-class JSONRPCParseError(JSONRPCObject):
+class JSONRPCParseError(JSONRPCError):
     """
     Error response for parsing error.
     """
 
+    __slots__ = ()
+
     def __init__(self):
-        JSONRPCObject.__init__(self)
-        self.id = None
-        self.error = {"code": -32700, "message": "Parse error"}
+        JSONRPCError.__init__(self, -32700, "Parse error")
 
 
-class JSONRPCCustomError(JSONRPCObject):
+class JSONRPCCustomError(JSONRPCError):
     """
     Error response for an custom error.
 
@@ -130,10 +164,7 @@ class JSONRPCCustomError(JSONRPCObject):
     :param request_id: JSON-RPC identifier (optional)
     """
 
-    def __init__(self, code, message, request_id=None):
-        JSONRPCObject.__init__(self)
-        self.id = request_id
-        self.error = {"code": code, "message": message}
+    __slots__ = ()
 
 
 class JSONRPCResponse(JSONRPCObject):
@@ -144,11 +175,19 @@ class JSONRPCResponse(JSONRPCObject):
     :param request_id: JSON-RPC identifier
     """
 
+    __slots__ = ("id", "result")
+
     def __init__(self, result, request_id):
-        JSONRPCObject.__init__(self)
+
         self.id = request_id
         self.result = result
 
+    def __call__(self):
+
+        return {"jsonrpc": JSONRPC_VERSION,
+                "id": self.id,
+                "result": self.result}
+
 
 class JSONRPCRequest(JSONRPCObject):
     """
@@ -159,14 +198,24 @@ class JSONRPCRequest(JSONRPCObject):
     :param request_id: JSON-RPC identifier (generated by default)
     """
 
+    __slots__ = ("id", "method", "params")
+
     def __init__(self, method, params=None, request_id=None):
-        JSONRPCObject.__init__(self)
-        if request_id == None:
-            request_id = str(uuid.uuid4())
+
+        if request_id is None:
+            request_id = next(_request_ids)
         self.id = request_id
         self.method = method
-        if params:
-            self.params = params
+        self.params = params
+
+    def __call__(self):
+
+        message = {"jsonrpc": JSONRPC_VERSION,
+                   "id": self.id,
+                   "method": self.method}
+        if self.params:
+            message["params"] = self.params
+        return message
 
 
 class JSONRPCNotification(JSONRPCObject):
@@ -177,8 +226,59 @@ class JSONRPCNotification(JSONRPCObject):
     :param params: JSON-RPC params for the corresponding method (optional)
     """
 
+    __slots__ = ("method", "params")
+
     def __init__(self, method, params=None):
-        JSONRPCObject.__init__(self)
+
         self.method = method
-        if params:
-            self.params = params
+        self.params = params
+
+    def __call__(self):
+
+        message = {"jsonrpc": JSONRPC_VERSION,
+                   "method": self.method}
+        if self.params:
+            message["params"] = self.params
+        return message
+
+
+class JSONRPCBatch(object):
+    """
+    JSON-RPC batch: several requests and/or notifications
+    sent together as a single JSON array.
+    """
+
+    __slots__ = ("_messages",)
+
+    def __init__(self):
+
+        self._messages = []
+
+    def add(self, message):
+        """
+        Adds a request or a notification to this batch.
+
+        :param message: JSONRPCRequest or JSONRPCNotification instance
+        """
+
+        self._messages.append(message)
+
+    def __len__(self):
+
+        return len(self._messages)
+
+    def __iter__(self):
+
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+
+        return self._messages[index]
+
+    def __str__(self):
+
+        return json.dumps([message() for message in self._messages])
+
+    def __bytes__(self):
+
+        return str(self).encode("utf-8")
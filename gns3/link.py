@@ -154,6 +154,42 @@ class Link(QtCore.QObject):
 
         return self._id
 
+    def sourceNode(self):
+        """
+        Returns the source node of this link.
+
+        :returns: Node instance
+        """
+
+        return self._source_node
+
+    def sourcePort(self):
+        """
+        Returns the source port of this link.
+
+        :returns: Port instance
+        """
+
+        return self._source_port
+
+    def destinationNode(self):
+        """
+        Returns the destination node of this link.
+
+        :returns: Node instance
+        """
+
+        return self._destination_node
+
+    def destinationPort(self):
+        """
+        Returns the destination port of this link.
+
+        :returns: Port instance
+        """
+
+        return self._destination_port
+
     def UDPPortAllocatedSlot(self, node_id, port_id, lport):
         """
         Slot to receive events from Node instances
@@ -23,7 +23,6 @@ import os
 import tempfile
 import socket
 import shutil
-import json
 
 from .qt import QtGui, QtCore
 from .servers import Servers
@@ -35,10 +34,18 @@ from .preferences_dialog import PreferencesDialog
 from .settings import GENERAL_SETTINGS, GENERAL_SETTING_TYPES, CLOUD_SETTINGS, CLOUD_SETTINGS_TYPES
 from .utils.progress_dialog import ProgressDialog
 from .utils.process_files_thread import ProcessFilesThread
-from .utils.wait_for_connection_thread import WaitForConnectionThread
+from .utils.wait_for_connection import WaitForConnection
+from .utils.connect_to_server import ConnectToServer
+from .utils.save_project_thread import SaveProjectThread
 from .utils.message_box import MessageBox
 from .items.node_item import NodeItem
 from .topology import Topology
+from .project_file import isBinaryProjectFile, writeProjectFile
+from .placement_advisor import applyAssignment
+from .project_journal import ProjectJournal, hasRecovery, recoverTopology
+from .project_autosave import ProjectAutosave
+from .server_statistics_view import ServerStatisticsView
+from .server_health_indicator import ServerHealthIndicator
 
 import logging
 log = logging.getLogger(__name__)
@@ -75,16 +82,47 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self._project_path = None
         self._project_files_dir = None
 
+        # journal the changes of the current project
+        self._autosave = ProjectAutosave()
+        Topology.instance().setAutosave(self._autosave)
+        # project to recover once the local server is ready
+        self._recovery = None
+        self._save_thread = None
+        self._save_checkpoint = None
+
         #self.setWindowFlags(QtCore.Qt.FramelessWindowHint)
 
         # do not show the nodes dock widget my default
         self.uiNodesDockWidget.setVisible(False)
 
+        # server statistics, tabbed with the topology summary
+        self.uiServerStatisticsDockWidget = QtGui.QDockWidget("Server statistics", self)
+        self.uiServerStatisticsDockWidget.setObjectName("uiServerStatisticsDockWidget")
+        self.uiServerStatisticsDockWidget.setAllowedAreas(QtCore.Qt.LeftDockWidgetArea | QtCore.Qt.RightDockWidgetArea)
+        self.uiServerStatisticsView = ServerStatisticsView(self.uiServerStatisticsDockWidget)
+        self.uiServerStatisticsDockWidget.setWidget(self.uiServerStatisticsView)
+        self.addDockWidget(self.dockWidgetArea(self.uiTopologySummaryDockWidget), self.uiServerStatisticsDockWidget)
+        self.tabifyDockWidget(self.uiTopologySummaryDockWidget, self.uiServerStatisticsDockWidget)
+        self.uiTopologySummaryDockWidget.raise_()
+        # the main window state has been restored before this dock existed
+        self.restoreDockWidget(self.uiServerStatisticsDockWidget)
+
+        # health of the servers, always visible in the status bar
+        self.uiServerHealthIndicator = ServerHealthIndicator(self.uiStatusBar)
+        self.uiStatusBar.addPermanentWidget(self.uiServerHealthIndicator)
+
         # populate the view -> docks menu
         self.uiDocksMenu.addAction(self.uiTopologySummaryDockWidget.toggleViewAction())
+        self.uiDocksMenu.addAction(self.uiServerStatisticsDockWidget.toggleViewAction())
         self.uiDocksMenu.addAction(self.uiCaptureDockWidget.toggleViewAction())
         self.uiDocksMenu.addAction(self.uiConsoleDockWidget.toggleViewAction())
 
+        # populate the tools menu
+        self.uiRebalanceServersAction = QtGui.QAction("&Rebalance servers...", self)
+        self.uiRebalanceServersAction.setStatusTip("Move nodes between remote servers to reduce the links between servers")
+        self.uiRebalanceServersAction.triggered.connect(self._rebalanceServersActionSlot)
+        self.uiToolsMenu.addAction(self.uiRebalanceServersAction)
+
         # load initial stuff once the event loop isn't busy
         QtCore.QTimer.singleShot(0, self.startupLoading)
 
@@ -255,6 +293,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         """
 
         self._ignore_unsaved_state = value
+        self._autosave.setPaused(value)
 
     def _newProjectActionSlot(self):
         """
@@ -714,6 +753,10 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             settings.setValue("GUI/state", self.saveState())
             event.accept()
 
+            # closed properly, nothing to recover
+            self._autosave.stop()
+            settings.remove("GUI/autosave_project")
+
             servers = Servers.instance()
             servers.stopLocalServer(wait=True)
         else:
@@ -733,6 +776,10 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         :returns: boolean
         """
 
+        # wait for a project file being written,
+        # the changes are unsaved again if it failed.
+        self._finishSave()
+
         if self.testAttribute(QtCore.Qt.WA_WindowModified):
             if self._temporary_project:
                 destination_file = "untitled.gns3"
@@ -741,9 +788,10 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             reply = QtGui.QMessageBox.warning(self, "Unsaved changes", 'Save changes to project "{}" before closing?'.format(destination_file),
                                               QtGui.QMessageBox.Discard | QtGui.QMessageBox.Save | QtGui.QMessageBox.Cancel)
             if reply == QtGui.QMessageBox.Save:
+                # the project is closed only once it has been written
                 if self._temporary_project:
-                    return self._saveProjectAs()
-                return self._saveProject(self._project_path)
+                    return self._saveProjectAs(wait=True)
+                return self._saveProject(self._project_path, wait=True)
             elif reply == QtGui.QMessageBox.Cancel:
                 return False
         self._deleteTemporaryProject()
@@ -754,6 +802,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         Called by QTimer.singleShot to load everything needed at startup.
         """
 
+        self._recovery = self._checkForRecovery()
         self._createTemporaryProject()
 
         config_filename = QtCore.QSettings().fileName()
@@ -765,8 +814,13 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         self._newsActionSlot()
 
-        # connect to the local server
+        # connect to the remote servers in the background while the
+        # local server is connected (or started), they are all ready
+        # by the time the first node is created.
         servers = Servers.instance()
+        servers.connectRemoteServers()
+
+        # connect to the local server
         server = servers.localServer()
 
         if not server.connected():
@@ -777,59 +831,113 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
                     sock.bind((server.host, 0))
             except OSError as e:
                 QtGui.QMessageBox.critical(self, "Local server", "Could not bind with {host}: {error} (please check your host binding setting)".format(host=server.host, error=e))
+                self._recoverProject()
                 return
 
-            try:
-                server.connect()
-                log.info("use an already started local server on {}:{}".format(server.host, server.port))
-            except OSError as e:
+            # first try to use an already started local server,
+            # the connection is completed by the event loop.
+            server.connected_signal.connect(self._localServerConnectedSlot)
+            server.connection_error_signal.connect(self._localServerConnectionErrorSlot)
+            server.connect()
+        else:
+            self._recoverProject()
 
-                if not e.errno:
-                    # not a normal OSError, thrown from the Websocket client.
-                    MessageBox(self, "Local server", "Something other than a GNS3 server is already running on {} port {}, please adjust the local server port setting".format(server.host,
-                                                                                                                                                                               server.port),
-                                                                                                                                                                               str(e))
-                    return
+    def _disconnectLocalServerSlots(self, server):
+        """
+        Stops listening to the local server connection signals.
 
-                log.info("starting local server {} on {}:{}".format(servers.localServerPath(), server.host, server.port))
+        :param server: WebSocketClient instance
+        """
 
-                local_server_path = servers.localServerPath()
+        server.connected_signal.disconnect(self._localServerConnectedSlot)
+        server.connection_error_signal.disconnect(self._localServerConnectionErrorSlot)
 
-                if not local_server_path:
-                    log.info("no local server is configured")
-                    return
+    def _localServerConnectedSlot(self):
+        """
+        Slot called when an already started local server is connected.
+        """
 
-                if not os.path.isfile(local_server_path):
-                    QtGui.QMessageBox.critical(self, "Local server", "Could not find local server {}".format(local_server_path))
-                    return
+        server = Servers.instance().localServer()
+        self._disconnectLocalServerSlots(server)
+        log.info("use an already started local server on {}:{}".format(server.host, server.port))
+        self._recoverProject()
 
-                elif not os.access(local_server_path, os.X_OK):
-                    QtGui.QMessageBox.critical(self, "Local server", "{} is not an executable".format(local_server_path))
-                    return
+    def _localServerConnectionErrorSlot(self, message, error_code):
+        """
+        Slot called when no local server could be connected,
+        starts a new local server process.
+
+        :param message: error message
+        :param error_code: errno value, 0 if this is not a socket error
+        """
+
+        server = Servers.instance().localServer()
+        self._disconnectLocalServerSlots(server)
+        self._startLocalServer(message, error_code)
+        # the local server is now available or will not be
+        self._recoverProject()
+
+    def _startLocalServer(self, message, error_code):
+        """
+        Starts a new local server process and connects to it.
+
+        :param message: error message of the first connection attempt
+        :param error_code: errno value, 0 if this is not a socket error
+        """
+
+        servers = Servers.instance()
+        server = servers.localServer()
+
+        if not error_code:
+            # not a socket error, thrown from the Websocket client.
+            MessageBox(self, "Local server", "Something other than a GNS3 server is already running on {} port {}, please adjust the local server port setting".format(server.host,
+                                                                                                                                                                       server.port),
+                                                                                                                                                                       message)
+            return
+
+        log.info("starting local server {} on {}:{}".format(servers.localServerPath(), server.host, server.port))
+
+        local_server_path = servers.localServerPath()
+
+        if not local_server_path:
+            log.info("no local server is configured")
+            return
 
-                if servers.startLocalServer(servers.localServerPath(), server.host, server.port):
-                        self._thread = WaitForConnectionThread(server.host, server.port)
-                        progress_dialog = ProgressDialog(self._thread,
-                                                         "Local server",
-                                                         "Connecting to server {} on port {}...".format(server.host, server.port),
-                                                         "Cancel", busy=True, parent=self)
-                        progress_dialog.show()
-                        if progress_dialog.exec_() == False:
-                            return
-                else:
-                    QtGui.QMessageBox.critical(self, "Local server", "Could not start the local server process: {}".format(servers.localServerPath()))
+        if not os.path.isfile(local_server_path):
+            QtGui.QMessageBox.critical(self, "Local server", "Could not find local server {}".format(local_server_path))
+            return
+
+        elif not os.access(local_server_path, os.X_OK):
+            QtGui.QMessageBox.critical(self, "Local server", "{} is not an executable".format(local_server_path))
+            return
+
+        if servers.startLocalServer(servers.localServerPath(), server.host, server.port):
+                self._thread = WaitForConnection(server.host, server.port, ready_signal=servers.local_server_ready_signal)
+                progress_dialog = ProgressDialog(self._thread,
+                                                 "Local server",
+                                                 "Connecting to server {} on port {}...".format(server.host, server.port),
+                                                 "Cancel", busy=True, parent=self)
+                progress_dialog.show()
+                if progress_dialog.exec_() == False:
                     return
-                try:
-                    servers.localServer().connect()
-                except OSError as e:
-                    QtGui.QMessageBox.critical(self, "Local server", "Could not connect to the local server {host} on port {port}: {error}".format(host=server.host,
-                                                                                                                                                   port=server.port,
-                                                                                                                                                   error=e))
+        else:
+            QtGui.QMessageBox.critical(self, "Local server", "Could not start the local server process: {}".format(servers.localServerPath()))
+            return
+
+        self._thread = ConnectToServer(server)
+        progress_dialog = ProgressDialog(self._thread,
+                                         "Local server",
+                                         "Connecting to the local server {} on port {}...".format(server.host, server.port),
+                                         "Cancel", busy=True, parent=self)
+        progress_dialog.show()
+        progress_dialog.exec_()
 
-    def _saveProjectAs(self):
+    def _saveProjectAs(self, wait=False):
         """
         Saves a project to another location/name.
 
+        :param wait: wait for the project file to be written
+
         :returns: GNS3 project file (.gns3)
         """
 
@@ -916,27 +1024,266 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         self._deleteTemporaryProject()
         self._project_files_dir = new_project_files_dir
-        return self._saveProject(topology_file_path)
+        return self._saveProject(topology_file_path, wait)
+
+    def _checkForRecovery(self):
+        """
+        Looks for the autosave of a project that was not closed properly.
+
+        :returns: tuple (project path, temporary project) to recover or None
+        """
+
+        settings = QtCore.QSettings()
+        path = settings.value("GUI/autosave_project", "")
+        temporary = settings.value("GUI/autosave_temporary_project", True, type=bool)
+        if not path or not hasRecovery(path):
+            return None
+
+        if temporary:
+            project_name = "untitled.gns3"
+        else:
+            project_name = os.path.basename(path)
+        reply = QtGui.QMessageBox.question(self, "Recovery", 'GNS3 was not closed properly, recover the unsaved changes of project "{}"?'.format(project_name),
+                                           QtGui.QMessageBox.Yes, QtGui.QMessageBox.No)
+        if reply == QtGui.QMessageBox.Yes:
+            return path, temporary
+
+        log.info("discarding the autosave of {}".format(path))
+        ProjectJournal(path).discard()
+        if temporary:
+            shutil.rmtree(path + "-files", ignore_errors=True)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return None
+
+    def _recoverProject(self):
+        """
+        Loads the project accepted for recovery at startup.
+        """
+
+        if not self._recovery:
+            return
+        path, temporary = self._recovery
+        self._recovery = None
+
+        try:
+            topology = recoverTopology(path)
+        except (OSError, ValueError) as e:
+            QtGui.QMessageBox.critical(self, "Recovery", "Could not recover project {}: {}".format(path, e))
+            return
+
+        # replace the temporary project created at startup
+        self._autosave.stop()
+        self._deleteTemporaryProject()
+        self.uiGraphicsView.reset()
+
+        project_files_dir = path
+        if path.endswith(".gns3"):
+            project_files_dir = path[:-5]
+        elif path.endswith(".net"):
+            project_files_dir = path[:-4]
+        self._project_files_dir = project_files_dir + "-files"
+        if not os.path.isdir(self._project_files_dir):
+            os.makedirs(self._project_files_dir)
+        self.uiGraphicsView.updateProjectFilesDir(self._project_files_dir)
+
+        self._project_path = path
+        if temporary:
+            self._setCurrentFile()
+        else:
+            self._setCurrentFile(path)
+        self._startAutosave(topology)
+        Topology.instance().load(topology)
+        self.setWindowModified(True)
+
+    def _startAutosave(self, snapshot=None):
+        """
+        Starts the autosave of the current project.
 
-    def _saveProject(self, path):
+        :param snapshot: topology representation of a recovered project
+        """
+
+        self._autosave.start(self._project_path, self._settings["autosave_interval"], snapshot)
+        self._rememberAutosave()
+
+    def _rememberAutosave(self):
+        """
+        Remembers which project is autosaved, to recover it after a crash.
+        """
+
+        settings = QtCore.QSettings()
+        settings.setValue("GUI/autosave_project", self._project_path)
+        settings.setValue("GUI/autosave_temporary_project", self._temporary_project)
+
+    def _saveProject(self, path, wait=False):
         """
         Saves a project.
 
         :param path: path to project file
+        :param wait: wait for the project file to be written
+
+        :returns: False if the project file could not be written
         """
 
-        topology = Topology.instance()
-        try:
-            with open(path, "w") as f:
-                log.info("saving project: {}".format(path))
-                json.dump(topology.dump(), f, sort_keys=True, indent=4)
-        except OSError as e:
-            QtGui.QMessageBox.critical(self, "Save", "Could not save project to {}: {}".format(path, e))
-            return False
+        binary = self._binaryProjectFile(path)
+
+        # one save at a time, so the project file cannot be replaced by an older snapshot
+        self._finishSave()
+
+        # the snapshot is taken here, the serialization and the write are done by the thread.
+        # The autosave journal is kept until the project file has been written.
+        log.info("saving project: {}".format(path))
+        self._save_checkpoint = self._autosave.checkpoint()
+        self._save_thread = SaveProjectThread(path, Topology.instance().dump(), binary)
+        self._save_thread.completed.connect(self._saveCompletedSlot)
+        self._save_thread.error.connect(self._saveErrorSlot)
+        self._save_thread.start()
+        self.uiStatusBar.showMessage("Saving project to {}...".format(path))
 
-        self.uiStatusBar.showMessage("Project saved to {}".format(path), 2000)
         self._project_path = path
         self._setCurrentFile(path)
+        if wait:
+            return self._finishSave()
+        return True
+
+    def _binaryProjectFile(self, path):
+        """
+        Returns if a project must be saved in the binary format,
+        an existing project file keeps its format.
+
+        :param path: path to project file
+
+        :returns: True or False
+        """
+
+        if os.path.isfile(path):
+            try:
+                return isBinaryProjectFile(path)
+            except OSError as e:
+                log.warning("could not read {}: {}".format(path, e))
+        return self._settings["binary_project_files"]
+
+    def _rebalanceServersActionSlot(self):
+        """
+        Slot called to move nodes between remote servers.
+        """
+
+        if not self._project_path:
+            return
+
+        topology = Topology.instance()
+        try:
+            plan, servers = topology.rebalancePlan()
+        except ValueError as e:
+            QtGui.QMessageBox.critical(self, "Rebalance servers", "{}".format(e))
+            return
+
+        if not plan:
+            QtGui.QMessageBox.information(self, "Rebalance servers", "No node needs to move, {} link(s) between servers.".format(plan.cut_links_before))
+            return
+
+        moves = []
+        for node_id, source_server_id, destination_server_id in plan.moves:
+            source, destination = servers[source_server_id], servers[destination_server_id]
+            moves.append("{}: {}:{} -> {}:{}".format(topology.getNode(node_id).name(),
+                                                     source.host,
+                                                     source.port,
+                                                     destination.host,
+                                                     destination.port))
+        message_box = QtGui.QMessageBox(QtGui.QMessageBox.Question, "Rebalance servers",
+                                        "Move {} node(s), links between servers: {} -> {}.\n"
+                                        "The project will be saved and reloaded, running nodes will be stopped.".format(len(plan),
+                                                                                                                      plan.cut_links_before,
+                                                                                                                      plan.cut_links_after),
+                                        QtGui.QMessageBox.Yes | QtGui.QMessageBox.No, self)
+        message_box.setDetailedText("\n".join(moves))
+        if message_box.exec_() == QtGui.QMessageBox.Yes:
+            self._applyMigrationPlan(plan, servers)
+
+    def _applyMigrationPlan(self, plan, servers):
+        """
+        Saves the project with its nodes on their new servers and reloads it.
+
+        :param plan: MigrationPlan instance
+        :param servers: server ID -> WebSocketClient instance
+        """
+
+        snapshot = Topology.instance().dump()
+        content = snapshot["topology"]
+        content["nodes"] = list(applyAssignment(content.get("nodes", []), plan.assignment()))
+        server_ids = {node["server_id"] for node in content["nodes"]}
+        content["servers"] = [server.dump() for server_id, server in servers.items() if server_id in server_ids]
+
+        path = self._project_path
+        if not self._finishSave():
+            return
+        try:
+            log.info("saving project with {} node(s) on new servers: {}".format(len(plan), path))
+            writeProjectFile(path, snapshot, self._binaryProjectFile(path))
+        except (OSError, ValueError) as e:
+            QtGui.QMessageBox.critical(self, "Rebalance servers", "Could not save project to {}: {}".format(path, e))
+            return
+        self._loadProject(path)
+
+    def _saveCompletedSlot(self):
+        """
+        Slot called when the project file has been written.
+        """
+
+        self._saveFinished(self.sender())
+
+    def _saveErrorSlot(self, message, stop):
+        """
+        Slot called when the project file could not be written.
+
+        :param message: error message
+        :param stop: unused
+        """
+
+        self._saveFinished(self.sender())
+
+    def _saveFinished(self, save_thread):
+        """
+        Handles the end of a save, once.
+
+        :param save_thread: SaveProjectThread instance
+        """
+
+        if save_thread is not self._save_thread:
+            # already handled by _finishSave()
+            return
+        self._save_thread = None
+        checkpoint, self._save_checkpoint = self._save_checkpoint, None
+
+        if save_thread.succeeded():
+            self.uiStatusBar.showMessage("Project saved to {}".format(save_thread.path()), 2000)
+            # the journal only keeps the changes made since the topology was dumped
+            self._autosave.projectSaved(checkpoint, save_thread.path())
+            if save_thread.path() == self._project_path:
+                self._rememberAutosave()
+        else:
+            self.uiStatusBar.showMessage(save_thread.errorMessage())
+            if save_thread.path() == self._project_path:
+                # the changes are only in memory and in the autosave journal
+                self.setWindowModified(True)
+
+    def _finishSave(self):
+        """
+        Waits for the project file being written.
+
+        :returns: False if the project file could not be written
+        """
+
+        save_thread = self._save_thread
+        if save_thread is None:
+            return True
+        save_thread.wait()
+        self._saveFinished(save_thread)
+        if not save_thread.succeeded():
+            QtGui.QMessageBox.critical(self, "Save project", save_thread.errorMessage())
+            return False
         return True
 
     def _loadProject(self, path):
@@ -946,6 +1293,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         :param path: path to project file
         """
 
+        self._autosave.stop()
         self.uiGraphicsView.reset()
 
         project_files_dir = path
@@ -957,13 +1305,11 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         topology = Topology.instance()
         try:
-            with open(path, "r") as f:
-                log.info("loading project: {}".format(path))
-                json_topology = json.load(f)
-                if not os.path.isdir(self._project_files_dir):
-                    os.makedirs(self._project_files_dir)
-                self.uiGraphicsView.updateProjectFilesDir(self._project_files_dir)
-                topology.load(json_topology)
+            log.info("loading project: {}".format(path))
+            if not os.path.isdir(self._project_files_dir):
+                os.makedirs(self._project_files_dir)
+            self.uiGraphicsView.updateProjectFilesDir(self._project_files_dir)
+            topology.loadFile(path)
         except OSError as e:
             QtGui.QMessageBox.critical(self, "Load", "Could not load project from {}: {}".format(path, e))
             #log.error("exception {type}".format(type=type(e)), exc_info=1)
@@ -975,6 +1321,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.uiStatusBar.showMessage("Project loaded {}".format(path), 2000)
         self._project_path = path
         self._setCurrentFile(path)
+        self._startAutosave()
 
     def _deleteTemporaryProject(self):
         """
@@ -996,6 +1343,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         Creates a temporary project.
         """
 
+        self._autosave.stop()
         self.uiGraphicsView.reset()
         try:
             with tempfile.NamedTemporaryFile(prefix="gns3-", delete=False) as f:
@@ -1013,6 +1361,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         self.uiGraphicsView.updateProjectFilesDir(self._project_files_dir)
         self._setCurrentFile()
+        self._startAutosave()
 
     def isTemporaryProject(self):
         """
@@ -20,4 +20,22 @@ from gns3.modules.dynamips import Dynamips
 from gns3.modules.iou import IOU
 from gns3.modules.vpcs import VPCS
 
+from gns3.websocket_client import WebSocketClient
+
 MODULES = [Builtin, Dynamips, IOU, VPCS]
+
+
+def _notificationHandler(module_class):
+    """
+    Returns a handler forwarding notifications to a module instance.
+
+    :param module_class: module class
+    """
+
+    def handler(method, params):
+        module_class.instance().notification(method, params)
+    return handler
+
+# route the server notifications to the modules by method namespace
+for _module_class in MODULES:
+    WebSocketClient.registerNotificationHandler(_module_class.__name__.lower(), _notificationHandler(_module_class))
@@ -88,6 +88,7 @@ class Builtin(Module):
         """
 
         self._nodes.append(node)
+        self._indexNode(node)
 
     def removeNode(self, node):
         """
@@ -98,6 +99,7 @@ class Builtin(Module):
 
         if node in self._nodes:
             self._nodes.remove(node)
+            self._unindexNode(node)
 
     def allocateServer(self, node_class):
         """
@@ -130,7 +132,7 @@ class Builtin(Module):
             if not True in using_local_server and len(remote_servers) == 1:
                 # no module is using a local server and there is only one
                 # remote server available, so no need to ask the user.
-                return next(iter(servers))
+                return servers.allocateRemoteServer(node_class.__name__)
 
             server_list = []
             server_list.append("Local server ({}:{})".format(local_server.host, local_server.port))
@@ -215,6 +215,7 @@ class Dynamips(Module):
         """
 
         self._nodes.append(node)
+        self._indexNode(node)
 
     def removeNode(self, node):
         """
@@ -225,6 +226,7 @@ class Dynamips(Module):
 
         if node in self._nodes:
             self._nodes.remove(node)
+            self._unindexNode(node)
 
     def iosImages(self):
         """
@@ -299,6 +301,16 @@ class Dynamips(Module):
             params.update({"project_name": project_name})
         server.send_notification("dynamips.settings", params)
 
+    def resendSettings(self, server):
+        """
+        Sends the module settings again to a server that has been reconnected.
+
+        :param server: WebSocketClient instance
+        """
+
+        if server in self._servers:
+            self._sendSettings(server)
+
     def allocateServer(self, node_class):
         """
         Allocates a server.
@@ -314,10 +326,14 @@ class Dynamips(Module):
             # use the local server
             server = servers.localServer()
         else:
-            # pick up a remote server (round-robin method)
-            server = next(iter(servers))
+            # pick up a remote server using the placement policy,
+            # the RAM of a router is not known before its IOS image is chosen
+            ram = PLATFORMS_DEFAULT_RAM.get(node_class.__name__.lower(), 0)
+            server = servers.allocateRemoteServer(node_class.__name__, ram=ram)
             if not server:
-                raise ModuleError("No remote server is configured")
+                if not servers.remoteServers():
+                    raise ModuleError("No remote server is configured")
+                raise ModuleError("No remote server has enough capacity for a new {}".format(node_class.__name__))
         return server
 
     def createNode(self, node_class, server):
@@ -436,13 +452,13 @@ class Dynamips(Module):
         """
 
         if "devices" in params:
-            for node in self._nodes:
-                for device in params["devices"]:
-                    if node.name() == device:
-                        message = "node {}: {}".format(node.name(), params["message"])
-                        self.notification_signal.emit(message, params["details"])
-                        if hasattr(node, "stop"):
-                            node.stop()
+            for device in params["devices"]:
+                node = self.findNode(device, "name")
+                if node:
+                    message = "node {}: {}".format(node.name(), params["message"])
+                    self.notification_signal.emit(message, params["details"])
+                    if hasattr(node, "stop"):
+                        node.stop()
 
     @staticmethod
     def getNodeClass(name):
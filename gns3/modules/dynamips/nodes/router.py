@@ -332,18 +332,20 @@ class Router(Node):
             if name in self._settings and self._settings[name] != value:
                 params[name] = value
 
+        configs = {}
+
         # push the startup-config
         if "startup_config" in new_settings and self._settings["startup_config"] != new_settings["startup_config"] \
         and os.path.isfile(new_settings["startup_config"]):
-            params["startup_config_base64"] = self._base64Config(new_settings["startup_config"])
+            configs["startup_config"] = new_settings["startup_config"]
 
         # push the private-config
         if "private_config" in new_settings and self._settings["private_config"] != new_settings["private_config"] \
         and os.path.isfile(new_settings["private_config"]):
-            params["private_config_base64"] = self._base64Config(new_settings["private_config"])
+            configs["private_config"] = new_settings["private_config"]
 
         log.debug("{} is updating settings: {}".format(self.name(), params))
-        self._server.send_message("dynamips.vm.update", params, self._updateCallback)
+        self._sendWithConfigs("dynamips.vm.update", params, configs, self._updateCallback)
 
     def _updateCallback(self, result, error=False):
         """
@@ -24,6 +24,7 @@ import sys
 import re
 from gns3.qt import QtGui
 from gns3.servers import Servers
+from gns3.utils.upload_file import UploadFile, uploadImage
 from ..settings import PLATFORMS_DEFAULT_RAM, CHASSIS
 from .. import Dynamips
 from ..ui.ios_router_preferences_page_ui import Ui_IOSRouterPreferencesPageWidget
@@ -129,6 +130,14 @@ class IOSRouterPreferencesPage(QtGui.QWidget, Ui_IOSRouterPreferencesPageWidget)
             if not server:
                 QtGui.QMessageBox.critical(self, "IOS image", "No remote server available!")
                 return
+            if os.path.isfile(path) and UploadFile.supported(server):
+                reply = QtGui.QMessageBox.question(self, "IOS image", "Upload {} to server {}?".format(image, server.host),
+                                                   QtGui.QMessageBox.Yes, QtGui.QMessageBox.No)
+                if reply == QtGui.QMessageBox.Yes:
+                    path = uploadImage(server, path, parent=self)
+                    if path is None:
+                        return
+                    self.uiIOSPathLineEdit.setText(path)
             server = server.host
 
         #ios_images = Dynamips.instance().iosImages()
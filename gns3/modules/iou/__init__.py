@@ -180,6 +180,7 @@ class IOU(Module):
         """
 
         self._nodes.append(node)
+        self._indexNode(node)
 
     def removeNode(self, node):
         """
@@ -190,6 +191,7 @@ class IOU(Module):
 
         if node in self._nodes:
             self._nodes.remove(node)
+            self._unindexNode(node)
 
     def iouImages(self):
         """
@@ -295,6 +297,16 @@ class IOU(Module):
             params.update({"project_name": project_name})
         server.send_notification("iou.settings", params)
 
+    def resendSettings(self, server):
+        """
+        Sends the module settings again to a server that has been reconnected.
+
+        :param server: WebSocketClient instance
+        """
+
+        if server in self._servers:
+            self._sendSettings(server)
+
     def allocateServer(self, node_class):
         """
         Allocates a server.
@@ -310,10 +322,12 @@ class IOU(Module):
             # use the local server
             server = servers.localServer()
         else:
-            # pick up a remote server (round-robin method)
-            server = next(iter(servers))
+            # pick up a remote server using the placement policy (256 MB is the default RAM of an IOU device)
+            server = servers.allocateRemoteServer(node_class.__name__, ram=256)
             if not server:
-                raise ModuleError("No remote server is configured")
+                if not servers.remoteServers():
+                    raise ModuleError("No remote server is configured")
+                raise ModuleError("No remote server has enough capacity for a new {}".format(node_class.__name__))
         return server
 
     def createNode(self, node_class, server):
@@ -405,11 +419,11 @@ class IOU(Module):
         """
 
         if "id" in params:
-            for node in self._nodes:
-                if node.id() == params["id"]:
-                    message = "node {}: {}".format(node.name(), params["message"])
-                    self.notification_signal.emit(message, params["details"])
-                    node.stop()
+            node = self.findNode(params["id"])
+            if node:
+                message = "node {}: {}".format(node.name(), params["message"])
+                self.notification_signal.emit(message, params["details"])
+                node.stop()
 
     @staticmethod
     def getNodeClass(name):
@@ -216,12 +216,13 @@ class IOUDevice(Node):
             if name in self._settings and self._settings[name] != value:
                 params[name] = value
 
+        configs = {}
         if "startup_config" in new_settings and self._settings["startup_config"] != new_settings["startup_config"] \
         and os.path.isfile(new_settings["startup_config"]):
-            params["startup_config_base64"] = self._base64Config(new_settings["startup_config"])
+            configs["startup_config"] = new_settings["startup_config"]
 
         log.debug("{} is updating settings: {}".format(self.name(), params))
-        self._server.send_message("iou.update", params, self._updateCallback)
+        self._sendWithConfigs("iou.update", params, configs, self._updateCallback)
 
     def _updateCallback(self, result, error=False):
         """
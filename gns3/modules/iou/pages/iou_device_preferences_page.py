@@ -23,6 +23,7 @@ import os
 import sys
 from gns3.qt import QtGui
 from gns3.servers import Servers
+from gns3.utils.upload_file import UploadFile, uploadImage
 from .. import IOU
 from ..ui.iou_device_preferences_page_ui import Ui_IOUDevicePreferencesPageWidget
 
@@ -115,6 +116,14 @@ class IOUDevicePreferencesPage(QtGui.QWidget, Ui_IOUDevicePreferencesPageWidget)
             if not server:
                 QtGui.QMessageBox.critical(self, "IOU image", "No remote server available!")
                 return
+            if os.path.isfile(path) and UploadFile.supported(server):
+                reply = QtGui.QMessageBox.question(self, "IOU image", "Upload {} to server {}?".format(image, server.host),
+                                                   QtGui.QMessageBox.Yes, QtGui.QMessageBox.No)
+                if reply == QtGui.QMessageBox.Yes:
+                    path = uploadImage(server, path, parent=self)
+                    if path is None:
+                        return
+                    self.uiIOUPathLineEdit.setText(path)
             server = server.host
 
         key = "{server}:{image}".format(server=server, image=image)
@@ -36,6 +36,75 @@ class Module(QtCore.QObject):
 
         super(Module, self).__init__()
 
+        # node lookup tables (node method name -> {key: node}),
+        # rebuilt on demand from the module node list.
+        self._node_indexes = {}
+
+    def findNode(self, key, attribute="id"):
+        """
+        Returns the node of this module matching a key.
+
+        :param key: value to look for
+        :param attribute: name of the node method returning the key ("id" or "name")
+
+        :returns: Node instance or None
+        """
+
+        index = self._node_indexes.get(attribute)
+        if index is None:
+            index = self._buildNodeIndex(attribute)
+        node = index.get(key)
+        if node is not None and getattr(node, attribute)() != key:
+            # the node has changed since the index was built
+            node = self._buildNodeIndex(attribute).get(key)
+        return node
+
+    def _buildNodeIndex(self, attribute):
+        """
+        Builds the lookup table for a node attribute.
+
+        :param attribute: name of the node method returning the key
+
+        :returns: dictionary
+        """
+
+        index = {}
+        for node in self._nodes:
+            index.setdefault(getattr(node, attribute)(), node)
+        self._node_indexes[attribute] = index
+        return index
+
+    def _invalidateNodeIndexes(self):
+        """
+        Forgets the node lookup tables, they are rebuilt on the next lookup.
+        """
+
+        self._node_indexes.clear()
+
+    def _indexNode(self, node):
+        """
+        Keeps the lookup tables up to date for a node added to this module.
+
+        :param node: Node instance
+        """
+
+        self._invalidateNodeIndexes()
+        node.updated_signal.connect(self._invalidateNodeIndexes)
+
+    def _unindexNode(self, node):
+        """
+        Removes a node from the lookup tables.
+
+        :param node: Node instance
+        """
+
+        self._invalidateNodeIndexes()
+        try:
+            node.updated_signal.disconnect(self._invalidateNodeIndexes)
+        except (TypeError, RuntimeError):
+            # the signal was not connected
+            pass
+
     @staticmethod
     def nodes(self):
         """
@@ -58,6 +127,16 @@ class Module(QtCore.QObject):
 
         raise NotImplementedError()
 
+    def resendSettings(self, server):
+        """
+        Sends the module settings again to a server that has been
+        reconnected, if this module uses it.
+
+        :param server: WebSocketClient instance
+        """
+
+        pass
+
     def notification(self, destination, params):
         """
         To received notifications from the server.
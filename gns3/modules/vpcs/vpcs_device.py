@@ -105,15 +105,16 @@ class VPCSDevice(Node):
         if name:
             params["name"] = self._settings["name"] = name
 
+        configs = {}
         if base_script_file:
             params["base_script_file"] = self._settings["base_script_file"] = base_script_file
-            params["base_script_file_base64"] = self._base64Config(base_script_file)
+            configs["base_script_file"] = base_script_file
 
         # other initial settings will be applied when the router has been created
         if initial_settings:
             self._inital_settings = initial_settings
 
-        self._server.send_message("vpcs.create", params, self._setupCallback)
+        self._sendWithConfigs("vpcs.create", params, configs, self._setupCallback)
 
     def _setupCallback(self, result, error=False):
         """
@@ -212,12 +213,13 @@ class VPCSDevice(Node):
             if name in self._settings and self._settings[name] != value:
                 params[name] = value
 
+        configs = {}
         if "base_script_file" in new_settings and self._settings["base_script_file"] != new_settings["base_script_file"] \
         and os.path.isfile(new_settings["base_script_file"]):
-            params["base_script_file_base64"] = self._base64Config(new_settings["base_script_file"])
+            configs["base_script_file"] = new_settings["base_script_file"]
 
         log.debug("{} is updating settings: {}".format(self.name(), params))
-        self._server.send_message("vpcs.update", params, self._updateCallback)
+        self._sendWithConfigs("vpcs.update", params, configs, self._updateCallback)
 
     def _updateCallback(self, result, error=False):
         """
@@ -19,7 +19,9 @@
 Base class for node classes.
 """
 
+from functools import partial
 from .qt import QtCore
+from .utils.upload_file import UploadFile
 
 import logging
 log = logging.getLogger(__name__)
@@ -72,6 +74,8 @@ class Node(QtCore.QObject):
         self._server = server
         self._initialized = False
         self._status = 0
+        # requests waiting for their configuration files to be uploaded
+        self._config_requests = []
 
     @classmethod
     def reset(cls):
@@ -181,6 +185,83 @@ class Node(QtCore.QObject):
 
         raise NotImplementedError()
 
+    def _sendWithConfigs(self, method, params, configs, callback):
+        """
+        Sends a request with configuration files. The files are streamed
+        to servers supporting binary uploads, the request then has a
+        "<name>_upload" parameter with where the server stored each file.
+        Otherwise, or if an upload fails, the files are sent base64
+        encoded in "<name>_base64" parameters.
+
+        :param method: JSON-RPC method
+        :param params: request parameters
+        :param configs: parameter name (e.g. "startup_config") -> path to the file
+        :param callback: callback for the request
+        """
+
+        uploads = {}
+        for name, path in configs.items():
+            if UploadFile.supported(self._server):
+                uploads[name] = UploadFile(self._server, path, "configs/node{}_{}".format(self._id, name))
+            else:
+                params[name + "_base64"] = self._base64Config(path)
+
+        if not uploads:
+            self._server.send_message(method, params, callback)
+            return
+
+        request = (method, params, callback, uploads)
+        self._config_requests.append(request)
+        for name, upload in list(uploads.items()):
+            upload.completed.connect(partial(self._configUploadedSlot, request, name))
+            upload.error.connect(partial(self._configUploadErrorSlot, request, name))
+            upload.start()
+
+    def _configUploadedSlot(self, request, name):
+        """
+        Slot called when a configuration file has been uploaded.
+
+        :param request: request waiting for the file
+        :param name: parameter name
+        """
+
+        uploads = request[3]
+        upload = uploads.pop(name, None)
+        if upload is None:
+            return
+        request[1][name + "_upload"] = upload.destination()
+        self._sendConfigRequest(request)
+
+    def _configUploadErrorSlot(self, request, name, message, stop):
+        """
+        Slot called when a configuration file could not be uploaded.
+
+        :param request: request waiting for the file
+        :param name: parameter name
+        :param message: error message
+        :param stop: unused
+        """
+
+        uploads = request[3]
+        upload = uploads.pop(name, None)
+        if upload is None:
+            return
+        log.warning("{}: {}, sending {} base64 encoded".format(self.name(), message, upload.path()))
+        request[1][name + "_base64"] = self._base64Config(upload.path())
+        self._sendConfigRequest(request)
+
+    def _sendConfigRequest(self, request):
+        """
+        Sends a request once all its configuration files have been uploaded.
+
+        :param request: request waiting for files
+        """
+
+        method, params, callback, uploads = request
+        if not uploads and request in self._config_requests:
+            self._config_requests.remove(request)
+            self._server.send_message(method, params, callback)
+
     def update(self, new_settings):
         """
         Updates the settings for this node.
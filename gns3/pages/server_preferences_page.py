@@ -27,7 +27,7 @@ from ..servers import Servers
 from ..topology import Topology
 from ..utils.message_box import MessageBox
 from ..utils.progress_dialog import ProgressDialog
-from ..utils.wait_for_connection_thread import WaitForConnectionThread
+from ..utils.wait_for_connection import WaitForConnection
 
 
 class ServerPreferencesPage(QtGui.QWidget, Ui_ServerPreferencesPageWidget):
@@ -49,6 +49,10 @@ class ServerPreferencesPage(QtGui.QWidget, Ui_ServerPreferencesPageWidget):
         self.uiRemoteServersTreeWidget.itemSelectionChanged.connect(self._remoteServerChangedSlot)
         self.uiTestSettingsPushButton.clicked.connect(self._testSettingsSlot)
 
+        # show the health of the remote servers
+        self.uiRemoteServersTreeWidget.setHeaderLabels(["Host", "Port", "Status", "Version"])
+        Servers.instance().healthMonitor().health_signal.connect(self._serverHealthSlot)
+
         # load all available addresses
         for address in QtNetwork.QNetworkInterface.allAddresses():
             address_string = address.toString()
@@ -91,6 +95,36 @@ class ServerPreferencesPage(QtGui.QWidget, Ui_ServerPreferencesPageWidget):
         self.uiRemoteServerPortLineEdit.setText(host)
         self.uiRemoteServerPortSpinBox.setValue(port)
 
+    def _serverHealthSlot(self, server):
+        """
+        Slot called when the health of a server has been checked.
+
+        :param server: WebSocketClient instance
+        """
+
+        for index in range(0, self.uiRemoteServersTreeWidget.topLevelItemCount()):
+            item = self.uiRemoteServersTreeWidget.topLevelItem(index)
+            if item.text(0) == server.host and item.text(1) == str(server.port):
+                self._updateHealthItem(item, server)
+
+    def _updateHealthItem(self, item, server):
+        """
+        Shows the health of a remote server in the tree widget.
+
+        :param item: QTreeWidgetItem instance
+        :param server: WebSocketClient instance
+        """
+
+        health = Servers.instance().healthMonitor().health(server)
+        if health is None:
+            return
+        status = health.status()
+        if health.alive and health.rtt is not None:
+            status = "{} ({:.1f} ms)".format(status, health.rtt)
+        item.setText(2, status)
+        item.setText(3, health.version)
+        item.setToolTip(2, health.summary())
+
     def _remoteServerChangedSlot(self):
         """
         Enables the use of the delete button.
@@ -172,6 +206,7 @@ class ServerPreferencesPage(QtGui.QWidget, Ui_ServerPreferencesPageWidget):
             item = QtGui.QTreeWidgetItem(self.uiRemoteServersTreeWidget)
             item.setText(0, host)
             item.setText(1, str(port))
+            self._updateHealthItem(item, server)
 
         self.uiRemoteServersTreeWidget.resizeColumnToContents(0)
 
@@ -214,7 +249,7 @@ class ServerPreferencesPage(QtGui.QWidget, Ui_ServerPreferencesPageWidget):
                     servers.stopLocalServer(wait=True)
                     #TODO: ASK if the user wants to start local server
                     if servers.startLocalServer(local_server_path, local_server_host, local_server_port):
-                        self._thread = WaitForConnectionThread(local_server_host, local_server_port)
+                        self._thread = WaitForConnection(local_server_host, local_server_port, ready_signal=servers.local_server_ready_signal)
                         dialog = ProgressDialog(self._thread, "Local server", "Connecting...", "Cancel", busy=True, parent=self)
                         dialog.show()
                         dialog.exec_()
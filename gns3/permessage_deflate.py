@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+WebSocket permessage-deflate extension (RFC 7692), client side.
+"""
+
+import zlib
+
+EXTENSION_NAME = "permessage-deflate"
+
+# messages smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 128
+
+# every compressed message ends with an empty deflate block, which is not sent
+DEFLATE_TAIL = b"\x00\x00\xff\xff"
+
+
+class PerMessageDeflateError(Exception):
+    """
+    Invalid permessage-deflate negotiation or compressed data.
+    """
+
+    pass
+
+
+def offer():
+    """
+    Returns the Sec-WebSocket-Extensions value offered by the client.
+
+    :returns: header value (string)
+    """
+
+    return "{}; client_max_window_bits".format(EXTENSION_NAME)
+
+
+def negotiate(header_value):
+    """
+    Processes the Sec-WebSocket-Extensions header sent back by the server.
+
+    :param header_value: header value or None if the server did not send it
+
+    :returns: PerMessageDeflate instance, or None if the server declined the extension
+    """
+
+    if not header_value:
+        return None
+
+    for extension in header_value.split(","):
+        parameters = [parameter.strip() for parameter in extension.split(";")]
+        if parameters[0] != EXTENSION_NAME:
+            raise PerMessageDeflateError("server accepted an extension that was not offered: {}".format(parameters[0]))
+
+        options = {}
+        for parameter in parameters[1:]:
+            name, _, value = parameter.partition("=")
+            name = name.strip()
+            value = value.strip().strip('"')
+            if name in options:
+                raise PerMessageDeflateError("duplicated parameter {}".format(name))
+            if name in ("server_no_context_takeover", "client_no_context_takeover"):
+                if value:
+                    raise PerMessageDeflateError("parameter {} does not accept a value".format(name))
+                options[name] = True
+            elif name in ("server_max_window_bits", "client_max_window_bits"):
+                if not value.isdigit() or not 8 <= int(value) <= 15:
+                    raise PerMessageDeflateError("invalid value for {}: {}".format(name, value))
+                options[name] = int(value)
+            else:
+                raise PerMessageDeflateError("unknown parameter {}".format(name))
+        return PerMessageDeflate(**options)
+    return None
+
+
+class PerMessageDeflate(object):
+    """
+    Compresses and decompresses message payloads with the parameters
+    agreed during the handshake.
+
+    :param server_no_context_takeover: the server resets its compression context after each message
+    :param client_no_context_takeover: the client must reset its compression context after each message
+    :param server_max_window_bits: LZ77 window size used by the server (informative)
+    :param client_max_window_bits: LZ77 window size the client may use
+    """
+
+    def __init__(self, server_no_context_takeover=False, client_no_context_takeover=False,
+                 server_max_window_bits=15, client_max_window_bits=15):
+
+        self._server_no_context_takeover = server_no_context_takeover
+        self._client_no_context_takeover = client_no_context_takeover
+        self._client_max_window_bits = client_max_window_bits
+        self._compressor = None
+        self._decompressor = None
+
+    def canCompress(self):
+        """
+        Returns if outgoing messages can be compressed. zlib cannot produce
+        a raw deflate stream with an 8-bit window, messages are then sent
+        uncompressed, which the extension allows.
+
+        :returns: True or False
+        """
+
+        return self._client_max_window_bits >= 9
+
+    def compress(self, data):
+        """
+        Compresses a message payload.
+
+        :param data: payload (bytes)
+
+        :returns: compressed payload (bytes)
+        """
+
+        if self._compressor is None or self._client_no_context_takeover:
+            self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -self._client_max_window_bits)
+        compressed = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressed.endswith(DEFLATE_TAIL):
+            compressed = compressed[:-len(DEFLATE_TAIL)]
+        return compressed
+
+    def decompress(self, data):
+        """
+        Decompresses a message payload.
+
+        :param data: compressed payload (bytes)
+
+        :returns: payload (bytes)
+        """
+
+        if self._decompressor is None or self._server_no_context_takeover:
+            # a window larger than the one used by the server is fine to decompress
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        try:
+            return self._decompressor.decompress(data + DEFLATE_TAIL)
+        except zlib.error as e:
+            raise PerMessageDeflateError("could not decompress message: {}".format(e))
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Placement advisor: spreads the nodes of a topology on servers so that
+as few links as possible cross servers (each one is a UDP tunnel
+between two hosts) while the load stays balanced.
+"""
+
+import math
+from collections import Counter, OrderedDict
+
+# nodes bound to their host (a cloud uses the network interfaces of its server)
+PINNED_NODE_TYPES = ("Cloud",)
+
+
+class MigrationPlan(object):
+    """
+    Moves of nodes from their current server to a new one.
+
+    :param graph: TopologyGraph instance
+    :param assignment: new placement (node ID -> server ID)
+    """
+
+    def __init__(self, graph, assignment):
+
+        self._assignment = assignment
+        self.moves = [(node_id, graph.serverId(node_id), server_id) for node_id, server_id in assignment.items()
+                      if graph.serverId(node_id) != server_id]
+        self.cut_links_before = len(graph.cutLinks())
+        self.cut_links_after = len(graph.cutLinks(assignment))
+        self.loads_before = Counter(graph.serverId(node_id) for node_id in graph.nodes())
+        self.loads_after = Counter(assignment.values())
+
+    def __len__(self):
+
+        return len(self.moves)
+
+    def assignment(self):
+        """
+        Returns the new placement.
+
+        :returns: dictionary (node ID -> server ID)
+        """
+
+        return self._assignment
+
+    def dump(self):
+        """
+        Returns a representation of this plan.
+
+        :returns: dictionary
+        """
+
+        return {"moves": [{"node_id": node_id, "from": source, "to": destination}
+                          for node_id, source, destination in self.moves],
+                "cut_links_before": self.cut_links_before,
+                "cut_links_after": self.cut_links_after}
+
+
+class PlacementAdvisor(object):
+    """
+    Suggests node placements for a topology graph.
+
+    :param graph: TopologyGraph instance, nodes are on their current server
+    :param server_ids: servers the nodes can be placed on
+    :param capacities: server ID -> ServerCapacity instance (optional)
+    :param fixed: node ID -> server ID of the nodes that cannot move (optional)
+    :param imbalance: allowed load above an even (weighted) spread
+    """
+
+    def __init__(self, graph, server_ids, capacities=None, fixed=None, imbalance=0.1):
+
+        self._graph = graph
+        self._server_ids = list(server_ids)
+        self._capacities = capacities or {}
+        self._fixed = fixed or {}
+        self._imbalance = imbalance
+
+    def _maxNodes(self):
+        """
+        Returns the maximum number of nodes on each server: a share of
+        the nodes proportional to the server weight, limited by the
+        declared maximum.
+        """
+
+        server_ids = set(self._server_ids)
+        node_count = len([node_id for node_id in self._graph.nodes() if self._fixed.get(node_id, self._server_ids[0]) in server_ids])
+        weights = {server_id: self._capacities[server_id].weight if server_id in self._capacities else 1
+                   for server_id in self._server_ids}
+        total_weight = sum(weights.values())
+
+        max_nodes = {}
+        for server_id in self._server_ids:
+            share = math.ceil(node_count * (1 + self._imbalance) * weights[server_id] / total_weight)
+            capacity = self._capacities.get(server_id)
+            if capacity and capacity.max_nodes:
+                share = min(share, capacity.max_nodes)
+            max_nodes[server_id] = share
+
+        if sum(max_nodes.values()) < node_count:
+            # the weighted shares are too tight, only keep the declared limits
+            for server_id in self._server_ids:
+                capacity = self._capacities.get(server_id)
+                max_nodes[server_id] = capacity.max_nodes if capacity and capacity.max_nodes else node_count
+        return max_nodes
+
+    def suggest(self):
+        """
+        Suggests a placement ignoring the current one.
+
+        :returns: dictionary (node ID -> server ID)
+        """
+
+        if not self._server_ids:
+            raise ValueError("no server to place the nodes on")
+        return self._graph.partition(self._server_ids, self._maxNodes(), fixed=self._fixed, imbalance=self._imbalance)
+
+    def _relabel(self, assignment, max_nodes):
+        """
+        Swaps the servers of the groups of a placement so that
+        as many nodes as possible stay on their current server.
+        """
+
+        # the groups with fixed nodes cannot change server
+        mapping = {server_id: server_id for server_id in self._fixed.values()}
+        used = set(mapping)
+        sizes = Counter(assignment.values())
+        overlaps = Counter((server_id, self._graph.serverId(node_id)) for node_id, server_id in assignment.items()
+                           if node_id not in self._fixed)
+        for (group, server_id), _ in overlaps.most_common():
+            if group in mapping or server_id in used or server_id not in max_nodes or sizes[group] > max_nodes[server_id]:
+                continue
+            mapping[group] = server_id
+            used.add(server_id)
+
+        free = [server_id for server_id in self._server_ids if server_id not in used]
+        for group in self._server_ids:
+            if group in mapping:
+                continue
+            server_id = next((server_id for server_id in free if sizes[group] <= max_nodes[server_id]), None)
+            if server_id is None:
+                return assignment
+            mapping[group] = server_id
+            free.remove(server_id)
+        return OrderedDict((node_id, mapping.get(server_id, server_id)) for node_id, server_id in assignment.items())
+
+    def rebalance(self):
+        """
+        Produces a migration plan from the current placement: the better of the
+        current placement refined and of a new placement keeping most nodes in place.
+
+        :returns: MigrationPlan instance, empty when no move is worth it
+        """
+
+        if not self._server_ids:
+            raise ValueError("no server to place the nodes on")
+        graph = self._graph
+        max_nodes = self._maxNodes()
+        current = OrderedDict((node_id, graph.serverId(node_id)) for node_id in graph.nodes())
+
+        refined = graph.partition(self._server_ids, max_nodes, assignment=current, fixed=self._fixed,
+                                  imbalance=self._imbalance)
+        fresh = self._relabel(graph.partition(self._server_ids, max_nodes, fixed=self._fixed, imbalance=self._imbalance),
+                              max_nodes)
+        candidates = [MigrationPlan(graph, refined), MigrationPlan(graph, fresh)]
+        plan = min(candidates, key=lambda plan: (plan.cut_links_after, len(plan)))
+
+        if plan.cut_links_after >= plan.cut_links_before and not self._overloaded(plan.loads_before, max_nodes):
+            # moving nodes is not worth it
+            return MigrationPlan(graph, current)
+        return plan
+
+    @staticmethod
+    def _overloaded(loads, max_nodes):
+
+        return any(loads[server_id] > limit for server_id, limit in max_nodes.items())
+
+
+def applyAssignment(topology_nodes, assignment):
+    """
+    Moves node representations to the servers of a placement.
+
+    :param topology_nodes: iterable of node representations
+    :param assignment: node ID -> server ID
+
+    :returns: generator of node representations
+    """
+
+    for topology_node in topology_nodes:
+        server_id = assignment.get(topology_node.get("id"))
+        if server_id is not None:
+            topology_node["server_id"] = server_id
+        yield topology_node
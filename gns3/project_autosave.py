@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Background autosave: collects the topology changes and periodically
+appends them to the journal of the project.
+"""
+
+from collections import OrderedDict
+from .qt import QtCore
+from .project_journal import ProjectJournal
+from .utils.save_project_thread import SaveProjectThread
+
+import logging
+log = logging.getLogger(__name__)
+
+# the journal is folded into a snapshot once it has this many records
+COMPACT_RECORDS = 500
+
+
+class ProjectAutosave(QtCore.QObject):
+    """
+    Records the changes made to the topology.
+
+    :param compact_records: number of journal records before a compaction
+    """
+
+    def __init__(self, compact_records=COMPACT_RECORDS):
+
+        QtCore.QObject.__init__(self)
+        self._compact_records = compact_records
+        self._journal = None
+        self._paused = False
+
+        # changes since the last flush: nodes to write (node ID -> (Node instance, kind)),
+        # last known node positions and the other records in order.
+        self._nodes = OrderedDict()
+        self._positions = {}
+        self._records = []
+
+        # snapshot being written by a thread: (SaveProjectThread instance, checkpoint)
+        self._compaction = None
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self.flush)
+
+    def start(self, project_path, interval, snapshot=None):
+        """
+        Starts journaling the changes of a project.
+
+        :param project_path: path to the project file
+        :param interval: seconds between two writes to the journal, 0 disables the autosave
+        :param snapshot: topology representation the journal starts from (recovered project)
+        """
+
+        self.stop()
+        if not interval:
+            return
+        self._journal = ProjectJournal(project_path)
+        if snapshot is None:
+            self._journal.discard()
+        else:
+            try:
+                self._journal.compact(snapshot)
+            except (OSError, ValueError) as e:
+                log.error("could not write the autosave snapshot: {}".format(e))
+        self._timer.start(interval * 1000)
+        log.info("autosave of {} every {} seconds".format(project_path, interval))
+
+    def stop(self, discard=True):
+        """
+        Stops journaling.
+
+        :param discard: delete the journal and snapshot
+        """
+
+        self._timer.stop()
+        self._finishCompaction()
+        self._nodes.clear()
+        self._positions.clear()
+        self._records.clear()
+        if self._journal and discard:
+            self._journal.discard()
+        self._journal = None
+
+    def setPaused(self, paused):
+        """
+        Ignores the changes, used while a topology is being loaded.
+
+        :param paused: boolean
+        """
+
+        self._paused = paused
+
+    def checkpoint(self):
+        """
+        Writes the pending changes to the journal, called before
+        the topology is dumped to be saved.
+
+        :returns: checkpoint to give to projectSaved() or None
+        """
+
+        if not self._journal:
+            return None
+        self.flush()
+        return self._journal, self._journal.checkpoint()
+
+    def projectSaved(self, checkpoint, project_path):
+        """
+        Keeps only the changes made after a project file has been written,
+        the journal follows the project if it has been saved to another file.
+
+        :param checkpoint: value returned by checkpoint() before the topology was dumped
+        :param project_path: path to the project file
+        """
+
+        if not checkpoint or checkpoint[0] is not self._journal:
+            # the autosave has been restarted since
+            return
+        journal, index = checkpoint
+        self._finishCompaction()
+        try:
+            journal.projectSaved(index)
+            if journal.projectPath() != project_path:
+                journal.move(project_path)
+        except OSError as e:
+            log.error("could not update the autosave journal: {}".format(e))
+
+    def _recording(self):
+
+        return self._journal is not None and not self._paused
+
+    def nodeAdded(self, node):
+        """
+        Records a new node.
+
+        :param node: Node instance
+        """
+
+        if self._recording():
+            self._nodes[node.id()] = (node, "node_added")
+
+    def nodeUpdated(self, node):
+        """
+        Records a node update.
+
+        :param node: Node instance
+        """
+
+        if self._recording():
+            _, kind = self._nodes.get(node.id(), (node, "node_updated"))
+            if kind != "node_added":
+                kind = "node_updated"
+            self._nodes[node.id()] = (node, kind)
+
+    def nodeMoved(self, node, x, y):
+        """
+        Records a node move.
+
+        :param node: Node instance
+        :param x: new X coordinate
+        :param y: new Y coordinate
+        """
+
+        if self._recording():
+            self._positions[node.id()] = (x, y)
+            if node.id() not in self._nodes:
+                self._nodes[node.id()] = (node, "node_moved")
+
+    def nodeRemoved(self, node):
+        """
+        Records a deleted node.
+
+        :param node: Node instance
+        """
+
+        if self._recording():
+            self._nodes.pop(node.id(), None)
+            self._positions.pop(node.id(), None)
+            self._records.append({"op": "node_removed", "id": node.id()})
+
+    def linkAdded(self, link):
+        """
+        Records a new link.
+
+        :param link: Link instance
+        """
+
+        if self._recording():
+            self._records.append({"op": "link_added", "link": link.dump()})
+
+    def linkRemoved(self, link):
+        """
+        Records a deleted link.
+
+        :param link: Link instance
+        """
+
+        if self._recording():
+            self._records.append({"op": "link_removed", "id": link.id()})
+
+    def flush(self):
+        """
+        Writes the changes to the journal.
+        """
+
+        if not self._journal or (not self._nodes and not self._records):
+            return
+
+        records = []
+        for node_id, (node, kind) in self._nodes.items():
+            position = self._positions.get(node_id)
+            if kind == "node_moved":
+                records.append({"op": kind, "id": node_id, "x": position[0], "y": position[1]})
+                continue
+            node_info = node.dump()
+            if position:
+                node_info["x"], node_info["y"] = position
+            records.append({"op": kind, "node": node_info, "server": node.server().dump()})
+        records.extend(self._records)
+        self._nodes.clear()
+        self._positions.clear()
+        self._records = []
+
+        try:
+            self._journal.append(records)
+        except (OSError, ValueError) as e:
+            log.error("autosave failed: {}".format(e))
+            return
+        if self._journal.recordCount() >= self._compact_records and self._compaction is None:
+            self._compact()
+
+    def _compact(self):
+        """
+        Replaces the snapshot in a thread, the journal keeps
+        the changes until the snapshot has been written.
+        """
+
+        from .topology import Topology
+        save_thread = SaveProjectThread(self._journal.snapshotPath(), Topology.instance().dump(), binary=True)
+        save_thread.completed.connect(self._compactionCompletedSlot)
+        save_thread.error.connect(self._compactionErrorSlot)
+        self._compaction = (save_thread, self._journal.checkpoint())
+        save_thread.start()
+
+    def _compactionCompletedSlot(self):
+        """
+        Slot called when the snapshot has been written.
+        """
+
+        self._compactionFinished(self.sender())
+
+    def _compactionErrorSlot(self, message, stop):
+        """
+        Slot called when the snapshot could not be written.
+
+        :param message: error message
+        :param stop: ignored
+        """
+
+        log.error("autosave compaction failed: {}".format(message))
+        self._compactionFinished(self.sender())
+
+    def _compactionFinished(self, save_thread):
+        """
+        Handles the end of a compaction, once.
+
+        :param save_thread: SaveProjectThread instance
+        """
+
+        if self._compaction is None or save_thread is not self._compaction[0]:
+            # already handled by _finishCompaction()
+            return
+        checkpoint = self._compaction[1]
+        self._compaction = None
+        if save_thread.succeeded() and self._journal:
+            try:
+                self._journal.snapshotWritten(checkpoint)
+            except OSError as e:
+                log.error("could not compact the autosave journal: {}".format(e))
+
+    def _finishCompaction(self):
+        """
+        Waits for the snapshot being written.
+        """
+
+        if self._compaction is None:
+            return
+        save_thread = self._compaction[0]
+        save_thread.wait()
+        self._compactionFinished(save_thread)
@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Project file formats: the JSON format and a compact binary format.
+
+A binary project file starts with a magic string and a format version,
+followed by the topology encoded with MessagePack (http://msgpack.org).
+The msgpack module (a dependency of GNS3) is used for speed, the slower
+encoder and decoder implemented here are only used when it is missing
+or too old.
+"""
+
+import json
+import os
+import shutil
+import struct
+
+try:
+    import msgpack
+    if msgpack.version < (0, 5, 2):
+        # raw=False is not supported
+        msgpack = None
+except ImportError:
+    msgpack = None
+
+# msgpack.unpackb() options, maps with integer keys are rejected by default since msgpack 1.0
+_UNPACK_OPTIONS = {"raw": False}
+if msgpack and msgpack.version >= (1, 0):
+    _UNPACK_OPTIONS["strict_map_key"] = False
+
+# binary project file header: magic string and format version
+MAGIC = b"\x89GNS3\r\n\x1a\n"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("!{}sB".format(len(MAGIC)))
+
+_INT8 = struct.Struct("!b")
+_INT16 = struct.Struct("!h")
+_INT32 = struct.Struct("!i")
+_INT64 = struct.Struct("!q")
+_UINT8 = struct.Struct("!B")
+_UINT16 = struct.Struct("!H")
+_UINT32 = struct.Struct("!I")
+_UINT64 = struct.Struct("!Q")
+_DOUBLE = struct.Struct("!d")
+
+# type byte -> struct of the value or length that follows
+_SCALARS = {0xcc: _UINT8, 0xcd: _UINT16, 0xce: _UINT32, 0xcf: _UINT64,
+            0xd0: _INT8, 0xd1: _INT16, 0xd2: _INT32, 0xd3: _INT64}
+_STRINGS = {0xd9: _UINT8, 0xda: _UINT16, 0xdb: _UINT32}
+_BINARIES = {0xc4: _UINT8, 0xc5: _UINT16, 0xc6: _UINT32}
+_ARRAYS = {0xdc: _UINT16, 0xdd: _UINT32}
+_MAPS = {0xde: _UINT16, 0xdf: _UINT32}
+
+
+class ProjectFileError(ValueError):
+    """
+    Invalid project file.
+    """
+
+    pass
+
+
+def _encodeLength(length, out, fix_type, fix_limit, type8, type16, type32):
+    """
+    Writes the header of a string, binary, array or map.
+    """
+
+    if length < fix_limit:
+        out.append(fix_type | length)
+    elif type8 is not None and length <= 0xff:
+        out.append(type8)
+        out.append(length)
+    elif length <= 0xffff:
+        out.append(type16)
+        out += _UINT16.pack(length)
+    elif length <= 0xffffffff:
+        out.append(type32)
+        out += _UINT32.pack(length)
+    else:
+        raise ProjectFileError("object too large to be encoded ({} items)".format(length))
+
+
+def _encode(obj, out):
+    """
+    Encodes an object at the end of a bytearray.
+
+    :param obj: object to encode
+    :param out: bytearray instance
+    """
+
+    obj_type = type(obj)
+    if obj_type is str:
+        data = obj.encode("utf-8")
+        _encodeLength(len(data), out, 0xa0, 32, 0xd9, 0xda, 0xdb)
+        out += data
+    elif obj_type is int:
+        if 0 <= obj < 0x80 or -32 <= obj < 0:
+            out += _INT8.pack(obj)
+        elif obj >= 0:
+            if obj <= 0xff:
+                out.append(0xcc)
+                out.append(obj)
+            elif obj <= 0xffff:
+                out.append(0xcd)
+                out += _UINT16.pack(obj)
+            elif obj <= 0xffffffff:
+                out.append(0xce)
+                out += _UINT32.pack(obj)
+            elif obj <= 0xffffffffffffffff:
+                out.append(0xcf)
+                out += _UINT64.pack(obj)
+            else:
+                raise ProjectFileError("integer too large to be encoded: {}".format(obj))
+        elif obj >= -0x80:
+            out.append(0xd0)
+            out += _INT8.pack(obj)
+        elif obj >= -0x8000:
+            out.append(0xd1)
+            out += _INT16.pack(obj)
+        elif obj >= -0x80000000:
+            out.append(0xd2)
+            out += _INT32.pack(obj)
+        elif obj >= -0x8000000000000000:
+            out.append(0xd3)
+            out += _INT64.pack(obj)
+        else:
+            raise ProjectFileError("integer too large to be encoded: {}".format(obj))
+    elif obj is None:
+        out.append(0xc0)
+    elif obj is True:
+        out.append(0xc3)
+    elif obj is False:
+        out.append(0xc2)
+    elif obj_type is float:
+        out.append(0xcb)
+        out += _DOUBLE.pack(obj)
+    elif isinstance(obj, dict):
+        _encodeLength(len(obj), out, 0x80, 16, None, 0xde, 0xdf)
+        for key, value in obj.items():
+            _encode(key, out)
+            _encode(value, out)
+    elif isinstance(obj, (list, tuple)):
+        _encodeLength(len(obj), out, 0x90, 16, None, 0xdc, 0xdd)
+        for value in obj:
+            _encode(value, out)
+    elif isinstance(obj, (bytes, bytearray)):
+        _encodeLength(len(obj), out, 0, 0, 0xc4, 0xc5, 0xc6)
+        out += obj
+    else:
+        raise ProjectFileError("cannot encode {!r}".format(obj))
+
+
+def _decode(data, pos):
+    """
+    Decodes MessagePack data.
+
+    :param data: encoded data (bytes)
+    :param pos: position of the object
+
+    :returns: tuple (decoded object, position after the object)
+    """
+
+    size = len(data)
+
+    def read(pos, length):
+        end = pos + length
+        if end > size:
+            raise ProjectFileError("truncated project file")
+        return data[pos:end], end
+
+    def unpack(fmt, pos):
+        return fmt.unpack_from(data, pos)[0], pos + fmt.size
+
+    def decodeArray(pos, length):
+        result = []
+        append = result.append
+        for _ in range(length):
+            value, pos = decode(pos)
+            append(value)
+        return result, pos
+
+    def decodeMap(pos, length):
+        result = {}
+        for _ in range(length):
+            key, pos = decode(pos)
+            result[key], pos = decode(pos)
+        return result, pos
+
+    def decode(pos):
+        byte = data[pos]
+        pos += 1
+
+        # the most common types first
+        if byte < 0x80:
+            return byte, pos
+        if 0xa0 <= byte <= 0xbf:
+            value, pos = read(pos, byte & 0x1f)
+            return value.decode("utf-8"), pos
+        if byte <= 0x8f:
+            return decodeMap(pos, byte & 0x0f)
+        if byte <= 0x9f:
+            return decodeArray(pos, byte & 0x0f)
+        if byte >= 0xe0:
+            return byte - 0x100, pos
+        if byte == 0xc0:
+            return None, pos
+        if byte == 0xc2:
+            return False, pos
+        if byte == 0xc3:
+            return True, pos
+        if byte == 0xcb:
+            return unpack(_DOUBLE, pos)
+        if byte in _SCALARS:
+            return unpack(_SCALARS[byte], pos)
+        if byte in _STRINGS:
+            length, pos = unpack(_STRINGS[byte], pos)
+            value, pos = read(pos, length)
+            return value.decode("utf-8"), pos
+        if byte in _BINARIES:
+            length, pos = unpack(_BINARIES[byte], pos)
+            return read(pos, length)
+        if byte in _ARRAYS:
+            length, pos = unpack(_ARRAYS[byte], pos)
+            return decodeArray(pos, length)
+        if byte in _MAPS:
+            length, pos = unpack(_MAPS[byte], pos)
+            return decodeMap(pos, length)
+        raise ProjectFileError("unsupported type 0x{:02x}".format(byte))
+
+    try:
+        return decode(pos)
+    except (IndexError, struct.error):
+        raise ProjectFileError("truncated project file")
+    except UnicodeDecodeError as e:
+        raise ProjectFileError("invalid string: {}".format(e))
+    except TypeError as e:
+        raise ProjectFileError("invalid map key: {}".format(e))
+
+
+def encodeBinary(topology):
+    """
+    Encodes a topology in the binary format.
+
+    :param topology: topology representation
+
+    :returns: file content (bytes)
+    """
+
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION))
+    if msgpack:
+        try:
+            out += msgpack.packb(topology, use_bin_type=True)
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ProjectFileError("cannot encode the topology: {}".format(e))
+    else:
+        _encode(topology, out)
+    return bytes(out)
+
+
+def decodeBinary(data):
+    """
+    Decodes a topology in the binary format.
+
+    :param data: file content (bytes)
+
+    :returns: topology representation
+    """
+
+    if len(data) < HEADER.size:
+        raise ProjectFileError("not a binary project file")
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ProjectFileError("not a binary project file")
+    if version > FORMAT_VERSION:
+        raise ProjectFileError("binary project format version {} is not supported (this version of GNS3 supports up to {})".format(version,
+                                                                                                                             FORMAT_VERSION))
+    if msgpack:
+        try:
+            return msgpack.unpackb(data[HEADER.size:], **_UNPACK_OPTIONS)
+        except (TypeError, ValueError) as e:
+            raise ProjectFileError("invalid binary project file: {}".format(e))
+
+    topology, pos = _decode(data, HEADER.size)
+    if pos != len(data):
+        raise ProjectFileError("extra data at the end of the project file")
+    return topology
+
+
+def isBinaryProjectFile(path):
+    """
+    Returns if a project file is in the binary format.
+
+    :param path: path to the project file
+
+    :returns: True or False
+    """
+
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def readProjectFile(path):
+    """
+    Reads a project file in any format.
+
+    :param path: path to the project file
+
+    :returns: topology representation
+    """
+
+    if isBinaryProjectFile(path):
+        with open(path, "rb") as f:
+            return decodeBinary(f.read())
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def writeProjectFile(path, topology, binary=False):
+    """
+    Writes a project file. The content is first written and synced to a
+    temporary file that then replaces the project file, which is never
+    left half written.
+
+    :param path: path to the project file
+    :param topology: topology representation
+    :param binary: use the binary format instead of JSON
+    """
+
+    temporary_path = path + ".tmp"
+    try:
+        if binary:
+            data = encodeBinary(topology)
+            with open(temporary_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            with open(temporary_path, "w") as f:
+                json.dump(topology, f, sort_keys=True, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, temporary_path)
+        os.replace(temporary_path, path)
+    except Exception:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
+
+    if hasattr(os, "O_DIRECTORY"):
+        # make the rename itself durable
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Autosave journal: the changes made to a topology since it was saved are
+appended to a journal file next to the project file, one JSON record per
+line. The journal is periodically folded into a snapshot of the whole
+topology. Replaying a record more than once has no effect, so a crash
+between writing a snapshot and emptying the journal is harmless.
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+from .project_file import readProjectFile, writeProjectFile
+from .version import __version__
+
+import logging
+log = logging.getLogger(__name__)
+
+JOURNAL_EXTENSION = ".journal"
+SNAPSHOT_EXTENSION = ".autosave"
+
+
+def journalPath(project_path):
+    """
+    Returns the path of the journal of a project.
+
+    :param project_path: path to the project file
+    """
+
+    return project_path + JOURNAL_EXTENSION
+
+
+def snapshotPath(project_path):
+    """
+    Returns the path of the snapshot of a project.
+
+    :param project_path: path to the project file
+    """
+
+    return project_path + SNAPSHOT_EXTENSION
+
+
+def hasRecovery(project_path):
+    """
+    Returns if changes can be recovered for a project.
+
+    :param project_path: path to the project file
+
+    :returns: True or False
+    """
+
+    if os.path.isfile(snapshotPath(project_path)):
+        return True
+    try:
+        return os.path.getsize(journalPath(project_path)) > 0
+    except OSError:
+        return False
+
+
+def readJournal(path):
+    """
+    Reads the records of a journal. A crash may have left
+    an incomplete record at the end, it is ignored.
+
+    :param path: path to the journal
+
+    :returns: list of records
+    """
+
+    records = []
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.endswith("\n"):
+                log.warning("ignoring incomplete record at line {} of {}".format(line_number, path))
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                log.warning("ignoring the end of {}, invalid record at line {}: {}".format(path, line_number, e))
+                break
+    return records
+
+
+def applyJournal(topology, records):
+    """
+    Applies journal records to a topology representation.
+
+    :param topology: topology representation (modified in place)
+    :param records: list of records
+
+    :returns: topology representation
+    """
+
+    content = topology.setdefault("topology", {})
+    nodes = OrderedDict((node["id"], node) for node in content.get("nodes", []))
+    links = OrderedDict((link["id"], link) for link in content.get("links", []))
+    servers = OrderedDict((server["id"], server) for server in content.get("servers", []))
+
+    for record in records:
+        operation = record.get("op")
+        if operation in ("node_added", "node_updated"):
+            node = record["node"]
+            previous = nodes.get(node["id"])
+            if previous:
+                # keep the position if the record does not have it
+                for coordinate in ("x", "y", "z"):
+                    if coordinate not in node and coordinate in previous:
+                        node[coordinate] = previous[coordinate]
+            node.setdefault("x", 0.0)
+            node.setdefault("y", 0.0)
+            nodes[node["id"]] = node
+            server = record.get("server")
+            if server:
+                servers[server["id"]] = server
+        elif operation == "node_moved":
+            node = nodes.get(record["id"])
+            if node:
+                node["x"] = record["x"]
+                node["y"] = record["y"]
+        elif operation == "node_removed":
+            nodes.pop(record["id"], None)
+            for link_id, link in list(links.items()):
+                if record["id"] in (link["source_node_id"], link["destination_node_id"]):
+                    del links[link_id]
+        elif operation == "link_added":
+            link = record["link"]
+            links[link["id"]] = link
+        elif operation == "link_removed":
+            links.pop(record["id"], None)
+        else:
+            log.warning("unknown journal record: {}".format(operation))
+
+    # only the servers used by a node are part of a topology
+    server_ids = {node["server_id"] for node in nodes.values()}
+    for name, items in (("nodes", list(nodes.values())),
+                        ("links", list(links.values())),
+                        ("servers", [server for server in servers.values() if server["id"] in server_ids])):
+        if items:
+            content[name] = items
+        else:
+            content.pop(name, None)
+    return topology
+
+
+def recoverTopology(project_path):
+    """
+    Rebuilds a topology from the last snapshot (or the project file) and the journal.
+
+    :param project_path: path to the project file
+
+    :returns: topology representation
+    """
+
+    snapshot_path = snapshotPath(project_path)
+    if os.path.isfile(snapshot_path):
+        topology = readProjectFile(snapshot_path)
+    elif os.path.isfile(project_path) and os.path.getsize(project_path):
+        topology = readProjectFile(project_path)
+    else:
+        # temporary project that has never been saved
+        topology = {"version": __version__, "type": "topology", "topology": {}}
+
+    records = []
+    journal_path = journalPath(project_path)
+    if os.path.isfile(journal_path):
+        records = readJournal(journal_path)
+    log.info("recovering {} with {} journal record(s)".format(project_path, len(records)))
+    return applyJournal(topology, records)
+
+
+class ProjectJournal(object):
+    """
+    Journal of the changes made to a project.
+
+    :param project_path: path to the project file
+    """
+
+    def __init__(self, project_path):
+
+        self._project_path = project_path
+        self._path = journalPath(project_path)
+        self._snapshot_path = snapshotPath(project_path)
+        self._record_count = 0
+        # index of the first record of the journal file, counting
+        # the records dropped since the journal has been created.
+        self._first_record = 0
+
+    def projectPath(self):
+        """
+        Returns the path of the project file.
+
+        :returns: path
+        """
+
+        return self._project_path
+
+    def snapshotPath(self):
+        """
+        Returns the path of the snapshot.
+
+        :returns: path
+        """
+
+        return self._snapshot_path
+
+    def recordCount(self):
+        """
+        Returns the number of records since the last snapshot.
+
+        :returns: integer
+        """
+
+        return self._record_count
+
+    def checkpoint(self):
+        """
+        Returns the index of the next record, a topology dumped now
+        includes all the records before this index.
+
+        :returns: integer
+        """
+
+        return self._first_record + self._record_count
+
+    def _dropRecords(self, checkpoint):
+        """
+        Drops the records before a checkpoint, they are part of the
+        snapshot or the project file.
+
+        :param checkpoint: record index returned by checkpoint()
+        """
+
+        count = checkpoint - self._first_record
+        if count <= 0:
+            return
+        try:
+            with open(self._path, "r") as f:
+                lines = f.readlines()[count:]
+        except FileNotFoundError:
+            lines = []
+        temporary_path = self._path + ".tmp"
+        with open(temporary_path, "w") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self._path)
+        self._first_record = checkpoint
+        self._record_count = len(lines)
+
+    def projectSaved(self, checkpoint):
+        """
+        Lets the journal know the project file has been written with a
+        topology dumped at a checkpoint. The snapshot and the records
+        before the checkpoint are not needed anymore.
+
+        :param checkpoint: record index returned by checkpoint()
+        """
+
+        if checkpoint < self._first_record:
+            # the snapshot has been written after the topology was dumped
+            return
+        try:
+            os.remove(self._snapshot_path)
+        except FileNotFoundError:
+            pass
+        self._dropRecords(checkpoint)
+
+    def move(self, project_path):
+        """
+        Moves the journal and the snapshot next to another project file.
+
+        :param project_path: path to the project file
+        """
+
+        journal_path = journalPath(project_path)
+        snapshot_path = snapshotPath(project_path)
+        for source, destination in ((self._path, journal_path), (self._snapshot_path, snapshot_path)):
+            if os.path.exists(source):
+                os.replace(source, destination)
+            elif os.path.exists(destination):
+                os.remove(destination)
+        self._project_path = project_path
+        self._path = journal_path
+        self._snapshot_path = snapshot_path
+
+    def append(self, records):
+        """
+        Appends records to the journal.
+
+        :param records: list of records
+        """
+
+        if not records:
+            return
+        data = "".join(json.dumps(record, sort_keys=True) + "\n" for record in records)
+        with open(self._path, "a") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._record_count += len(records)
+
+    def compact(self, topology):
+        """
+        Replaces the snapshot and empties the journal.
+
+        :param topology: topology representation
+        """
+
+        writeProjectFile(self._snapshot_path, topology, binary=True)
+        with open(self._path, "w"):
+            pass
+        self._first_record = self.checkpoint()
+        self._record_count = 0
+        log.info("autosave journal of {} compacted".format(self._project_path))
+
+    def snapshotWritten(self, checkpoint):
+        """
+        Lets the journal know the snapshot has been replaced by a
+        topology dumped at a checkpoint, the records before the
+        checkpoint are not needed anymore.
+
+        :param checkpoint: record index returned by checkpoint()
+        """
+
+        if checkpoint < self._first_record:
+            # the project file has been written after the topology was dumped,
+            # the records between the snapshot and the journal are gone.
+            os.remove(self._snapshot_path)
+            return
+        self._dropRecords(checkpoint)
+        log.info("autosave journal of {} compacted".format(self._project_path))
+
+    def discard(self):
+        """
+        Deletes the journal and the snapshot.
+        """
+
+        for path in (self._path, self._snapshot_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("could not delete {}: {}".format(path, e))
+        self._first_record = self.checkpoint()
+        self._record_count = 0
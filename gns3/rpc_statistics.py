@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+JSON-RPC statistics collected for each server: latency histograms
+per method and traffic counters in each direction.
+"""
+
+import bisect
+
+# upper bounds of the latency histogram buckets in milliseconds,
+# the last bucket holds everything slower than 10 seconds.
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class LatencyHistogram(object):
+    """
+    Round-trip latency histogram for one JSON-RPC method.
+    """
+
+    __slots__ = ("buckets", "count", "total", "minimum", "maximum")
+
+    def __init__(self):
+
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, latency):
+        """
+        Records a latency.
+
+        :param latency: latency in seconds
+        """
+
+        milliseconds = latency * 1000
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        if self.minimum is None or milliseconds < self.minimum:
+            self.minimum = milliseconds
+        if self.maximum is None or milliseconds > self.maximum:
+            self.maximum = milliseconds
+
+    def mean(self):
+        """
+        Returns the mean latency.
+
+        :returns: latency in milliseconds (float)
+        """
+
+        if not self.count:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """
+        Returns an upper bound of a latency percentile.
+
+        :param percent: percentile (e.g. 95)
+
+        :returns: latency in milliseconds (float)
+        """
+
+        if not self.count:
+            return 0.0
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                if index < len(LATENCY_BUCKETS):
+                    return min(float(LATENCY_BUCKETS[index]), self.maximum)
+                break
+        return self.maximum
+
+
+class RPCStatistics(object):
+    """
+    Statistics of the JSON-RPC traffic with one server.
+    """
+
+    def __init__(self):
+
+        self.reset()
+
+    def reset(self):
+        """
+        Clears all the statistics.
+        """
+
+        self._histograms = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.requests_failed = 0
+
+    def recordLatency(self, method, latency):
+        """
+        Records the round-trip latency of a request.
+
+        :param method: JSON-RPC method
+        :param latency: latency in seconds
+        """
+
+        histogram = self._histograms.get(method)
+        if histogram is None:
+            histogram = self._histograms[method] = LatencyHistogram()
+        histogram.add(latency)
+
+    def recordFailure(self):
+        """
+        Records a request that got no reply (timeout or connection lost).
+        """
+
+        self.requests_failed += 1
+
+    def recordSent(self, nbytes, messages=1):
+        """
+        Records data sent to the server.
+
+        :param nbytes: number of bytes
+        :param messages: number of JSON-RPC messages
+        """
+
+        self.bytes_sent += nbytes
+        self.messages_sent += messages
+
+    def recordReceived(self, nbytes=0, messages=0):
+        """
+        Records data received from the server.
+
+        :param nbytes: number of bytes
+        :param messages: number of JSON-RPC messages
+        """
+
+        self.bytes_received += nbytes
+        self.messages_received += messages
+
+    def histograms(self):
+        """
+        Returns the latency histograms.
+
+        :returns: dictionary (method -> LatencyHistogram instance)
+        """
+
+        return self._histograms
+
+    def slowestMethods(self, count=None):
+        """
+        Returns the methods sorted by total time spent waiting for them.
+
+        :param count: maximum number of methods to return
+
+        :returns: list of (method, LatencyHistogram instance) tuples
+        """
+
+        methods = sorted(self._histograms.items(), key=lambda item: item[1].total, reverse=True)
+        if count is not None:
+            return methods[:count]
+        return methods
+
+    def summary(self):
+        """
+        Returns a text summary of the statistics.
+
+        :returns: list of lines
+        """
+
+        lines = ["sent {} messages ({} bytes), received {} messages ({} bytes), {} failed requests".format(self.messages_sent,
+                                                                                                           self.bytes_sent,
+                                                                                                           self.messages_received,
+                                                                                                           self.bytes_received,
+                                                                                                           self.requests_failed)]
+        for method, histogram in self.slowestMethods():
+            lines.append("{}: {} calls, mean {:.1f} ms, p95 {:.1f} ms, max {:.1f} ms".format(method,
+                                                                                              histogram.count,
+                                                                                              histogram.mean(),
+                                                                                              histogram.percentile(95),
+                                                                                              histogram.maximum))
+        return lines
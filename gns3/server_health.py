@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Health monitor: periodically checks every configured server, with a
+WebSocket ping when it is connected and an HTTP request for its
+version otherwise, and keeps its round-trip time, liveness and version.
+"""
+
+import json
+import struct
+import time
+from functools import partial
+from .qt import QtCore, QtNetwork
+
+import logging
+log = logging.getLogger(__name__)
+
+# seconds between two checks
+DEFAULT_HEALTH_CHECK_INTERVAL = 10
+
+# a connected server that misses this many pings in a row has been lost
+MAX_MISSED_PINGS = 3
+
+
+class ServerHealth(object):
+    """
+    Health of a server.
+    """
+
+    def __init__(self):
+
+        self.alive = None
+        self.rtt = None
+        self.version = ""
+        self.last_seen = None
+        self.missed_pings = 0
+        self.error = ""
+
+    def status(self):
+        """
+        Returns the status of the server.
+
+        :returns: "up", "down" or "unknown"
+        """
+
+        if self.alive is None:
+            return "unknown"
+        return "up" if self.alive else "down"
+
+    def summary(self):
+        """
+        Returns a text summary of the health.
+
+        :returns: string
+        """
+
+        details = [self.status()]
+        if self.alive and self.rtt is not None:
+            details.append("{:.1f} ms".format(self.rtt))
+        if self.version:
+            details.append("version {}".format(self.version))
+        if not self.alive and self.error:
+            details.append(self.error)
+        return ", ".join(details)
+
+
+class HealthMonitor(QtCore.QObject):
+    """
+    Checks the health of servers in the background.
+
+    :param parent: parent object
+    """
+
+    # emitted with the server when its health has been updated
+    health_signal = QtCore.Signal(object)
+
+    def __init__(self, parent=None):
+
+        super(HealthMonitor, self).__init__(parent)
+        self._health = {}
+        self._slots = {}
+        # server -> (ping payload, time it was sent)
+        self._pings = {}
+        # server -> (version request, time it was sent)
+        self._probes = {}
+        self._ping_count = 0
+        self._interval = DEFAULT_HEALTH_CHECK_INTERVAL
+        self._network_manager = QtNetwork.QNetworkAccessManager(self)
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self.check)
+
+    def watch(self, server):
+        """
+        Starts checking a server.
+
+        :param server: WebSocketClient instance
+        """
+
+        if server in self._slots:
+            return
+        slots = (partial(self._pongSlot, server),
+                 partial(self._connectedSlot, server),
+                 partial(self._connectionLostSlot, server))
+        server.pong_signal.connect(slots[0])
+        server.connected_signal.connect(slots[1])
+        server.connection_lost_signal.connect(slots[2])
+        self._slots[server] = slots
+        self._health[server] = ServerHealth()
+
+    def unwatch(self, server):
+        """
+        Stops checking a server.
+
+        :param server: WebSocketClient instance
+        """
+
+        slots = self._slots.pop(server, None)
+        if slots:
+            server.pong_signal.disconnect(slots[0])
+            server.connected_signal.disconnect(slots[1])
+            server.connection_lost_signal.disconnect(slots[2])
+        self._health.pop(server, None)
+        self._pings.pop(server, None)
+        probe = self._probes.pop(server, None)
+        if probe:
+            probe[0].abort()
+
+    def health(self, server):
+        """
+        Returns the health of a server.
+
+        :param server: WebSocketClient instance
+
+        :returns: ServerHealth instance or None if the server is not checked
+        """
+
+        return self._health.get(server)
+
+    def interval(self):
+        """
+        Returns the time between two checks.
+
+        :returns: interval in seconds, 0 if the monitor is stopped
+        """
+
+        return self._interval if self._timer.isActive() else 0
+
+    def start(self, interval=DEFAULT_HEALTH_CHECK_INTERVAL):
+        """
+        Starts checking the servers periodically.
+
+        :param interval: seconds between two checks, 0 stops the monitor
+        """
+
+        self._interval = interval
+        if interval > 0:
+            self._timer.start(interval * 1000)
+            QtCore.QTimer.singleShot(0, self.check)
+        else:
+            self.stop()
+
+    def stop(self):
+        """
+        Stops checking the servers.
+        """
+
+        self._timer.stop()
+
+    def check(self):
+        """
+        Checks all the servers once.
+        """
+
+        for server in list(self._health):
+            if server.connected():
+                self._ping(server)
+            elif not server.connecting() and server not in self._probes:
+                self._probe(server)
+
+    def _update(self, server, alive, rtt=None, version=None, error=""):
+        """
+        Updates the health of a server.
+        """
+
+        health = self._health[server]
+        health.alive = alive
+        health.error = error
+        if alive:
+            health.rtt = rtt
+            health.last_seen = time.time()
+            if version:
+                health.version = version
+        self.health_signal.emit(server)
+
+    def _ping(self, server):
+        """
+        Pings a connected server, a server missing too many pings is lost.
+
+        :param server: WebSocketClient instance
+        """
+
+        health = self._health[server]
+        if server in self._pings:
+            health.missed_pings += 1
+            if health.missed_pings >= MAX_MISSED_PINGS:
+                log.warning("server {}:{} did not answer {} pings".format(server.host, server.port, health.missed_pings))
+                self._pings.pop(server)
+                self._update(server, False, error="no answer to pings")
+                server.connectionLost()
+                return
+
+        self._ping_count += 1
+        payload = struct.pack("!Q", self._ping_count)
+        self._pings[server] = (payload, time.monotonic())
+        try:
+            server.ping(payload)
+        except OSError as e:
+            log.debug("could not ping server {}:{}: {}".format(server.host, server.port, e))
+            self._pings.pop(server, None)
+
+    def _pongSlot(self, server, payload):
+        """
+        Slot called when a server answers a ping.
+
+        :param server: WebSocketClient instance
+        :param payload: payload of the pong
+        """
+
+        ping = self._pings.get(server)
+        if not ping or ping[0] != payload:
+            # unsolicited or late pong
+            return
+        del self._pings[server]
+        self._health[server].missed_pings = 0
+        self._update(server, True, (time.monotonic() - ping[1]) * 1000, server.version())
+
+    def _probe(self, server):
+        """
+        Asks a server which is not connected for its version.
+
+        :param server: WebSocketClient instance
+        """
+
+        url = QtCore.QUrl("http://{host}:{port}/version".format(host=server.host, port=server.port))
+        reply = self._network_manager.get(QtNetwork.QNetworkRequest(url))
+        self._probes[server] = (reply, time.monotonic())
+        reply.finished.connect(partial(self._probeFinishedSlot, server, reply))
+        # a server that does not answer would keep the request open
+        QtCore.QTimer.singleShot(server.timeout() * 1000, partial(self._probeTimeoutSlot, server, reply))
+
+    def _probeTimeoutSlot(self, server, reply):
+        """
+        Slot called when a version request takes too long.
+
+        :param server: WebSocketClient instance
+        :param reply: QNetworkReply instance
+        """
+
+        probe = self._probes.get(server)
+        if probe and probe[0] is reply:
+            reply.abort()
+
+    def _probeFinishedSlot(self, server, reply):
+        """
+        Slot called when a version request has finished.
+
+        :param server: WebSocketClient instance
+        :param reply: QNetworkReply instance
+        """
+
+        reply.deleteLater()
+        probe = self._probes.get(server)
+        if not probe or probe[0] is not reply:
+            return
+        del self._probes[server]
+
+        if reply.error() == QtNetwork.QNetworkReply.OperationCanceledError:
+            self._update(server, False, error="no answer after {} seconds".format(server.timeout()))
+            return
+        if reply.error() != QtNetwork.QNetworkReply.NoError:
+            self._update(server, False, error=reply.errorString())
+            return
+        rtt = (time.monotonic() - probe[1]) * 1000
+        try:
+            version = json.loads(bytes(reply.readAll()).decode("utf-8")).get("version")
+        except (ValueError, AttributeError) as e:
+            self._update(server, False, error="invalid version reply: {}".format(e))
+            return
+        self._update(server, True, rtt, version)
+
+    def _connectedSlot(self, server):
+        """
+        Slot called when a server is connected.
+
+        :param server: WebSocketClient instance
+        """
+
+        self._health[server].missed_pings = 0
+        self._update(server, True, self._health[server].rtt, server.version())
+
+    def _connectionLostSlot(self, server):
+        """
+        Slot called when the connection with a server has been lost.
+
+        :param server: WebSocketClient instance
+        """
+
+        self._pings.pop(server, None)
+        self._update(server, False, error="connection lost")
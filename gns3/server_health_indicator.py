@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Status bar indicator showing the health of the servers.
+"""
+
+from .qt import QtGui
+from .servers import Servers
+
+
+class ServerHealthIndicator(QtGui.QLabel):
+    """
+    Server health indicator implementation.
+
+    :param parent: parent widget
+    """
+
+    def __init__(self, parent):
+
+        QtGui.QLabel.__init__(self, parent)
+        Servers.instance().healthMonitor().health_signal.connect(self.refresh)
+        Servers.instance().updated_signal.connect(self.refresh)
+        self.refresh()
+
+    def refresh(self, *args):
+        """
+        Shows how many servers are up, the details are in the tooltip.
+        """
+
+        servers = Servers.instance()
+        monitor = servers.healthMonitor()
+        lines = []
+        up = 0
+        down = 0
+        for server in servers.allServers():
+            health = monitor.health(server)
+            if health is None:
+                continue
+            if health.alive:
+                up += 1
+            elif health.alive is False:
+                down += 1
+            name = "local server" if server.isLocal() else "{}:{}".format(server.host, server.port)
+            lines.append("{}: {}".format(name, health.summary()))
+
+        self.setText("Servers: {}/{} up".format(up, len(lines)))
+        self.setToolTip("\n".join(lines))
+        if down:
+            self.setStyleSheet("QLabel { color: red; }")
+        else:
+            self.setStyleSheet("")
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Placement of new nodes on the remote servers. A placement policy picks
+a server from the load of each candidate server: its live node count,
+the RAM used by its nodes and its declared capacity.
+"""
+
+from collections import Counter
+
+DEFAULT_PLACEMENT_POLICY = "least_loaded"
+
+
+class ServerCapacity(object):
+    """
+    Declared capacity of a server, 0 means unlimited.
+
+    :param max_nodes: maximum number of nodes
+    :param ram: RAM available to the nodes (MB)
+    :param weight: share of the nodes relative to the other servers
+    """
+
+    def __init__(self, max_nodes=0, ram=0, weight=1):
+
+        self.max_nodes = max_nodes
+        self.ram = ram
+        self.weight = weight if weight > 0 else 1
+
+    def dump(self):
+        """
+        Returns a representation of this capacity.
+
+        :returns: dictionary
+        """
+
+        return {"max_nodes": self.max_nodes,
+                "ram": self.ram,
+                "weight": self.weight}
+
+
+class ServerLoad(object):
+    """
+    Load of a candidate server.
+
+    :param server: server instance
+    :param capacity: ServerCapacity instance
+    :param node_count: number of nodes on the server
+    :param ram: RAM used by the nodes on the server (MB)
+    :param node_types: number of nodes per node type (Counter)
+    """
+
+    def __init__(self, server, capacity=None, node_count=0, ram=0, node_types=None):
+
+        self.server = server
+        self.capacity = capacity or ServerCapacity()
+        self.node_count = node_count
+        self.ram = ram
+        self.node_types = node_types if node_types is not None else Counter()
+
+    def freeRam(self):
+        """
+        Returns the RAM left on the server.
+
+        :returns: RAM in MB or None if the RAM is unlimited
+        """
+
+        if not self.capacity.ram:
+            return None
+        return self.capacity.ram - self.ram
+
+    def fits(self, ram=0):
+        """
+        Returns if a node fits on the server.
+
+        :param ram: RAM needed by the node (MB)
+
+        :returns: True or False
+        """
+
+        if self.capacity.max_nodes and self.node_count >= self.capacity.max_nodes:
+            return False
+        free_ram = self.freeRam()
+        return free_ram is None or free_ram >= ram
+
+
+class PlacementPolicy(object):
+    """
+    Picks a server for a new node, the servers where the node
+    does not fit are never picked.
+    """
+
+    name = None
+
+    def select(self, loads, node_type=None, ram=0):
+        """
+        Picks a server.
+
+        :param loads: list of ServerLoad instances
+        :param node_type: type of the new node (class name)
+        :param ram: RAM needed by the new node (MB)
+
+        :returns: ServerLoad instance or None if the node fits nowhere
+        """
+
+        candidates = [load for load in loads if load.fits(ram)]
+        if not candidates:
+            return None
+        return self._select(candidates, node_type, ram)
+
+    def _select(self, candidates, node_type, ram):
+
+        raise NotImplementedError()
+
+
+class RoundRobinPolicy(PlacementPolicy):
+    """
+    Picks the servers in turn.
+    """
+
+    name = "round_robin"
+
+    def __init__(self):
+
+        self._position = 0
+
+    def _select(self, candidates, node_type, ram):
+
+        load = candidates[self._position % len(candidates)]
+        self._position += 1
+        return load
+
+
+class LeastLoadedPolicy(PlacementPolicy):
+    """
+    Picks the server with the fewest nodes.
+    """
+
+    name = "least_loaded"
+
+    def _select(self, candidates, node_type, ram):
+
+        return min(candidates, key=lambda load: load.node_count)
+
+
+class WeightedPolicy(PlacementPolicy):
+    """
+    Spreads the nodes in proportion to the weight of the servers.
+    """
+
+    name = "weighted"
+
+    def _select(self, candidates, node_type, ram):
+
+        return min(candidates, key=lambda load: (load.node_count + 1) / load.capacity.weight)
+
+
+class RamPolicy(PlacementPolicy):
+    """
+    Packs the nodes by RAM: picks the server with the least RAM
+    left once the node is placed (best fit). The servers without
+    declared RAM come last, the least used first.
+    """
+
+    name = "ram"
+
+    def _select(self, candidates, node_type, ram):
+
+        def key(load):
+            free_ram = load.freeRam()
+            if free_ram is None:
+                return (1, load.ram)
+            return (0, free_ram - ram)
+        return min(candidates, key=key)
+
+
+class AffinityPolicy(PlacementPolicy):
+    """
+    Keeps the nodes of the same type together: picks the server
+    with the most nodes of this type, the least loaded otherwise.
+    """
+
+    name = "affinity"
+
+    def _select(self, candidates, node_type, ram):
+
+        return min(candidates, key=lambda load: (-load.node_types[node_type], load.node_count))
+
+
+PLACEMENT_POLICIES = {policy.name: policy for policy in (RoundRobinPolicy,
+                                                         LeastLoadedPolicy,
+                                                         WeightedPolicy,
+                                                         RamPolicy,
+                                                         AffinityPolicy)}
+
+
+def createPlacementPolicy(name):
+    """
+    Creates a placement policy.
+
+    :param name: policy name
+
+    :returns: PlacementPolicy instance
+    """
+
+    if name not in PLACEMENT_POLICIES:
+        raise ValueError("unknown placement policy: {}".format(name))
+    return PLACEMENT_POLICIES[name]()
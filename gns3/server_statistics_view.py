@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Server statistics view that shows the JSON-RPC latency and traffic of each server.
+"""
+
+from .qt import QtGui, QtCore
+from .servers import Servers
+
+import logging
+log = logging.getLogger(__name__)
+
+# refresh interval in milliseconds
+REFRESH_INTERVAL = 1000
+
+
+class ServerStatisticsView(QtGui.QTreeWidget):
+    """
+    Server statistics view implementation.
+
+    :param parent: parent widget
+    """
+
+    def __init__(self, parent):
+
+        QtGui.QTreeWidget.__init__(self, parent)
+        self.setHeaderLabels(["Server / method", "Calls", "In flight", "Mean (ms)", "p95 (ms)", "Max (ms)", "Sent", "Received"])
+        self.setRootIsDecorated(True)
+        self.setAlternatingRowColors(True)
+
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        """
+        Starts refreshing the statistics when the view is shown.
+
+        :param event: QShowEvent instance
+        """
+
+        self.refresh()
+        self._refresh_timer.start(REFRESH_INTERVAL)
+        QtGui.QTreeWidget.showEvent(self, event)
+
+    def hideEvent(self, event):
+        """
+        Stops refreshing the statistics when the view is hidden.
+
+        :param event: QHideEvent instance
+        """
+
+        self._refresh_timer.stop()
+        QtGui.QTreeWidget.hideEvent(self, event)
+
+    def refresh(self):
+        """
+        Updates the view with the current statistics.
+        """
+
+        servers = Servers.instance()
+        expanded = set()
+        for index in range(self.topLevelItemCount()):
+            item = self.topLevelItem(index)
+            if item.isExpanded():
+                expanded.add(item.text(0))
+
+        self.clear()
+        for server in [servers.localServer()] + list(servers.remoteServers().values()):
+            statistics = server.statistics()
+            server_item = QtGui.QTreeWidgetItem(self)
+            server_item.setText(0, "{}:{}".format(server.host, server.port))
+            server_item.setText(1, str(sum(histogram.count for histogram in statistics.histograms().values())))
+            server_item.setText(2, str(server.pendingRequestCount()))
+            server_item.setText(6, "{} msg / {} B".format(statistics.messages_sent, statistics.bytes_sent))
+            server_item.setText(7, "{} msg / {} B".format(statistics.messages_received, statistics.bytes_received))
+            if server.connected():
+                server_item.setIcon(0, QtGui.QIcon(':/icons/led_green.svg'))
+            else:
+                server_item.setIcon(0, QtGui.QIcon(':/icons/led_red.svg'))
+
+            for method, histogram in statistics.slowestMethods():
+                method_item = QtGui.QTreeWidgetItem(server_item)
+                method_item.setText(0, method)
+                method_item.setText(1, str(histogram.count))
+                method_item.setText(3, "{:.1f}".format(histogram.mean()))
+                method_item.setText(4, "{:.1f}".format(histogram.percentile(95)))
+                method_item.setText(5, "{:.1f}".format(histogram.maximum))
+
+            server_item.setExpanded(server_item.text(0) in expanded)
@@ -21,16 +21,270 @@ Keeps track of all the local and remote servers and their settings.
 
 import sys
 import os
+import random
+import re
 import shlex
 import signal
 import socket
 import subprocess
+import threading
+from functools import partial
 from .qt import QtCore
 from .websocket_client import WebSocketClient
+from .permessage_deflate import EXTENSION_NAME as PERMESSAGE_DEFLATE
+from .binary_transfer import BINARY_PROTOCOL
+from .server_placement import DEFAULT_PLACEMENT_POLICY, ServerCapacity, ServerLoad, createPlacementPolicy
+from .server_health import DEFAULT_HEALTH_CHECK_INTERVAL, HealthMonitor
 
 import logging
 log = logging.getLogger(__name__)
 
+# automatic reconnection: delays in seconds
+RECONNECT_BASE_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+RECONNECT_MAX_ATTEMPTS = 10
+
+# line printed by the local server once it accepts connections
+LOCAL_SERVER_READY_PATTERN = re.compile(r"\bstarting server on\b", re.IGNORECASE)
+
+
+def setNonBlocking(fd, non_blocking=True):
+    """
+    Makes reads from a pipe return immediately (POSIX only).
+
+    :param fd: file descriptor
+    :param non_blocking: False to make reads wait for data again
+    """
+
+    import fcntl  # not available on Windows
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    if non_blocking:
+        flags |= os.O_NONBLOCK
+    else:
+        flags &= ~os.O_NONBLOCK
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags)
+
+
+def logLocalServerOutput(line):
+    """
+    Logs a line written by the local server process.
+
+    :param line: line (bytes)
+    """
+
+    log.info("local server: {}".format(line.decode("utf-8", errors="replace").rstrip()))
+
+
+def drainLocalServerOutput(output, pending=b""):
+    """
+    Logs the output of the local server process until it exits,
+    run in a thread so the process never blocks on a full pipe.
+
+    :param output: process output (file object, reads must block)
+    :param pending: beginning of the current line, already read
+    """
+
+    try:
+        with output:
+            for line in output:
+                logLocalServerOutput(pending + line)
+                pending = b""
+    except (OSError, ValueError) as e:
+        log.warning("could not read the local server output: {}".format(e))
+    if pending:
+        logLocalServerOutput(pending)
+
+
+class ReconnectSupervisor(QtCore.QObject):
+    """
+    Reconnects the servers that lost their connection. The delay between
+    two attempts doubles after each failure, with some random jitter so
+    that servers lost at the same time are not all retried together.
+
+    :param parent: parent object
+    """
+
+    def __init__(self, parent=None):
+
+        super(ReconnectSupervisor, self).__init__(parent)
+        self._slots = {}
+        self._attempts = {}
+        self._timers = {}
+        # servers to connect once they answer again: the supervisor
+        # gave up reconnecting them or they could not be connected at all.
+        self._awaiting = set()
+
+    def watch(self, server):
+        """
+        Starts watching a server for lost connections.
+
+        :param server: WebSocketClient instance
+        """
+
+        if server in self._slots:
+            return
+        slots = (partial(self._connectionLostSlot, server),
+                 partial(self._connectedSlot, server),
+                 partial(self._connectionErrorSlot, server))
+        server.connection_lost_signal.connect(slots[0])
+        server.connected_signal.connect(slots[1])
+        server.connection_error_signal.connect(slots[2])
+        self._slots[server] = slots
+
+    def unwatch(self, server):
+        """
+        Stops watching a server.
+
+        :param server: WebSocketClient instance
+        """
+
+        self.cancel(server)
+        self._awaiting.discard(server)
+        slots = self._slots.pop(server, None)
+        if slots:
+            server.connection_lost_signal.disconnect(slots[0])
+            server.connected_signal.disconnect(slots[1])
+            server.connection_error_signal.disconnect(slots[2])
+
+    def cancel(self, server):
+        """
+        Stops trying to reconnect a server.
+
+        :param server: WebSocketClient instance
+        """
+
+        timer = self._timers.pop(server, None)
+        if timer:
+            timer.stop()
+            timer.deleteLater()
+        if self._attempts.pop(server, None) is not None:
+            server.setReconnectPending(False)
+
+    def reconnecting(self, server):
+        """
+        Returns if a server is being reconnected.
+
+        :param server: WebSocketClient instance
+
+        :returns: True or False
+        """
+
+        return server in self._attempts
+
+    def expect(self, server):
+        """
+        Lets the supervisor know a server should be connected, if it cannot
+        be, it is reconnected when it answers again (see resume()).
+
+        :param server: WebSocketClient instance
+        """
+
+        if not server.connected() and server not in self._attempts:
+            self._awaiting.add(server)
+
+    def resume(self, server):
+        """
+        Tries to reconnect a server right away, used when the server is known
+        to answer again. Only a server being reconnected, or expected to be
+        connected, is reconnected.
+
+        :param server: WebSocketClient instance
+        """
+
+        if server in self._attempts:
+            self._timers[server].stop()
+            self._attemptSlot(server)
+        elif server in self._awaiting:
+            self._awaiting.discard(server)
+            log.info("server {}:{} answers again".format(server.host, server.port))
+            self._connectionLostSlot(server)
+
+    def _connectionLostSlot(self, server):
+        """
+        Slot called when a server connection has been lost.
+
+        :param server: WebSocketClient instance
+        """
+
+        if server in self._attempts:
+            return
+        self._awaiting.discard(server)
+        log.info("server {}:{} will be reconnected".format(server.host, server.port))
+        self._attempts[server] = 0
+        server.setReconnectPending(True)
+        self._scheduleAttempt(server)
+
+    def _scheduleAttempt(self, server):
+        """
+        Schedules the next reconnection attempt.
+
+        :param server: WebSocketClient instance
+        """
+
+        attempt = self._attempts[server]
+        delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+        log.debug("reconnection attempt {} to {}:{} in {:.1f} seconds".format(attempt + 1, server.host, server.port, delay))
+        timer = self._timers.get(server)
+        if timer is None:
+            timer = self._timers[server] = QtCore.QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(partial(self._attemptSlot, server))
+        timer.start(int(delay * 1000))
+
+    def _attemptSlot(self, server):
+        """
+        Slot called to try to reconnect a server.
+
+        :param server: WebSocketClient instance
+        """
+
+        if server not in self._attempts:
+            return
+        if server.connected():
+            self._connectedSlot(server)
+            return
+        try:
+            server.reconnect()
+        except OSError as e:
+            self._connectionErrorSlot(server, "could not reconnect to server {}:{}: {}".format(server.host, server.port, e), e.errno or 0)
+
+    def _connectedSlot(self, server):
+        """
+        Slot called when a server is connected.
+
+        :param server: WebSocketClient instance
+        """
+
+        self._awaiting.discard(server)
+        if server not in self._attempts:
+            return
+        log.info("reconnected to server {}:{} after {} attempt(s)".format(server.host, server.port, self._attempts[server] + 1))
+        self.cancel(server)
+
+        # the server may have lost the module settings (e.g. after a restart)
+        from .modules import MODULES
+        for module in MODULES:
+            module.instance().resendSettings(server)
+
+    def _connectionErrorSlot(self, server, message, error_code):
+        """
+        Slot called when a reconnection attempt has failed.
+
+        :param server: WebSocketClient instance
+        :param message: error message
+        :param error_code: errno value, 0 if this is not a socket error
+        """
+
+        if server not in self._attempts:
+            return
+        self._attempts[server] += 1
+        if self._attempts[server] >= RECONNECT_MAX_ATTEMPTS:
+            log.error("giving up reconnecting to server {}:{} after {} attempts".format(server.host, server.port, RECONNECT_MAX_ATTEMPTS))
+            self.cancel(server)
+            self._awaiting.add(server)
+            return
+        self._scheduleAttempt(server)
+
 
 class Servers(QtCore.QObject):
     """
@@ -40,15 +294,29 @@ class Servers(QtCore.QObject):
     # to let other pages know about remote server updates
     updated_signal = QtCore.Signal()
 
+    # emitted when the local server process reports it accepts connections
+    local_server_ready_signal = QtCore.Signal()
+
     def __init__(self):
 
         super(Servers, self).__init__()
         self._local_server = None
         self._remote_servers = {}
+        # declared capacity of the remote servers (server ID -> ServerCapacity instance)
+        self._capacities = {}
+        self._placement_policy = createPlacementPolicy(DEFAULT_PLACEMENT_POLICY)
         self._local_server_path = ""
         self._local_server_proccess = None
+        self._local_server_stdout = None
+        self._local_server_output = b""
+        self._local_server_output_notifier = None
+        self._local_server_output_thread = None
+        self._reconnect_supervisor = ReconnectSupervisor(self)
+        self._health_monitor = HealthMonitor(self)
+        self._health_monitor.health_signal.connect(self._serverHealthSlot)
+        self._health_check_interval = DEFAULT_HEALTH_CHECK_INTERVAL
         self._loadSettings()
-        self._remote_server_iter_pos = 0
+        self._health_monitor.start(self._health_check_interval)
 
     def _loadSettings(self):
         """
@@ -98,8 +366,18 @@ class Servers(QtCore.QObject):
             host = settings.value("host", "")
             port = settings.value("port", 0, type=int)
             if host and port:
-                self._addRemoteServer(host, port)
+                capacity = ServerCapacity(settings.value("max_nodes", 0, type=int),
+                                          settings.value("ram", 0, type=int),
+                                          settings.value("weight", 1, type=int))
+                self._addRemoteServer(host, port, capacity)
         settings.endArray()
+
+        placement_policy = settings.value("placement_policy", DEFAULT_PLACEMENT_POLICY)
+        try:
+            self._placement_policy = createPlacementPolicy(placement_policy)
+        except ValueError as e:
+            log.warning(e)
+        self._health_check_interval = settings.value("health_check_interval", DEFAULT_HEALTH_CHECK_INTERVAL, type=int)
         settings.endGroup()
 
     def _saveSettings(self):
@@ -121,12 +399,16 @@ class Servers(QtCore.QObject):
         # save the remote servers
         settings.beginWriteArray("remote", len(self._remote_servers))
         index = 0
-        for server in self._remote_servers.values():
+        for server_id, server in self._remote_servers.items():
             settings.setArrayIndex(index)
             settings.setValue("host", server.host)
             settings.setValue("port", server.port)
+            for name, value in self._capacities[server_id].dump().items():
+                settings.setValue(name, value)
             index += 1
         settings.endArray()
+        settings.setValue("placement_policy", self._placement_policy.name)
+        settings.setValue("health_check_interval", self._health_check_interval)
         settings.endGroup()
 
     def localServerPath(self):
@@ -154,15 +436,81 @@ class Servers(QtCore.QObject):
                 # use the string on Windows
                 self._local_server_proccess = subprocess.Popen(command, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
             else:
-                # use arguments on other platforms
+                # use arguments on other platforms, the output is
+                # read to know as soon as the server is ready.
                 args = shlex.split(command)
-                self._local_server_proccess = subprocess.Popen(args)
+                self._local_server_proccess = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
         except OSError as e:
             log.warning('could not start local server "{}": {}'.format(command, e))
             return False
 
+        self._stopReadingLocalServerOutput()
+        if self._local_server_proccess.stdout:
+            self._local_server_stdout = self._local_server_proccess.stdout
+            fd = self._local_server_stdout.fileno()
+            setNonBlocking(fd)
+            self._local_server_output_notifier = QtCore.QSocketNotifier(fd, QtCore.QSocketNotifier.Read)
+            self._local_server_output_notifier.activated.connect(self._localServerOutputSlot)
         return True
 
+    def _stopReadingLocalServerOutput(self, drain=True):
+        """
+        Stops reading the output of the local server process from
+        the event loop. The process writes to a pipe, so a thread
+        keeps reading it until the process exits.
+
+        :param drain: False if the output has been closed
+        """
+
+        if self._local_server_output_notifier:
+            self._local_server_output_notifier.setEnabled(False)
+            self._local_server_output_notifier = None
+        stdout, self._local_server_stdout = self._local_server_stdout, None
+        if stdout and drain:
+            setNonBlocking(stdout.fileno(), False)
+            self._local_server_output_thread = threading.Thread(target=drainLocalServerOutput,
+                                                                args=(stdout, self._local_server_output),
+                                                                name="local server output")
+            self._local_server_output_thread.daemon = True
+            self._local_server_output_thread.start()
+        elif stdout:
+            stdout.close()
+        self._local_server_output = b""
+
+    def _localServerOutputSlot(self, fd):
+        """
+        Slot called when the local server process has written something,
+        the output is logged and local_server_ready_signal is emitted
+        when the server says it accepts connections.
+
+        :param fd: file descriptor of the process output
+        """
+
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            log.warning("could not read the local server output: {}".format(e))
+            data = b""
+
+        if not data:
+            # the process has exited or closed its output
+            self._stopReadingLocalServerOutput(drain=False)
+            return
+
+        self._local_server_output += data
+        *lines, self._local_server_output = self._local_server_output.split(b"\n")
+        ready = False
+        for line in lines:
+            logLocalServerOutput(line)
+            if LOCAL_SERVER_READY_PATTERN.search(line.decode("utf-8", errors="replace")):
+                ready = True
+        if ready:
+            # nothing else is expected from the output
+            self._stopReadingLocalServerOutput()
+            self.local_server_ready_signal.emit()
+
     def stopLocalServer(self, wait=False):
 
         if self._local_server and self._local_server.connected() and not sys.platform.startswith('win'):
@@ -189,6 +537,8 @@ class Servers(QtCore.QObject):
         if self._local_server:
             if self._local_server.host == host and self._local_server.port == port:
                 return
+            self._reconnect_supervisor.unwatch(self._local_server)
+            self._health_monitor.unwatch(self._local_server)
             if self._local_server.connected():
                 self._local_server.close_connection()
             log.info("local server connection {} unregistered".format(self._local_server.url))
@@ -196,6 +546,8 @@ class Servers(QtCore.QObject):
         url = "ws://{host}:{port}".format(host=host, port=port)
         self._local_server = WebSocketClient(url)
         self._local_server.setLocal(True)
+        self._reconnect_supervisor.watch(self._local_server)
+        self._health_monitor.watch(self._local_server)
         log.info("new local server connection {} registered".format(url))
 
     def localServer(self):
@@ -207,20 +559,25 @@ class Servers(QtCore.QObject):
 
         return self._local_server
 
-    def _addRemoteServer(self, host, port):
+    def _addRemoteServer(self, host, port, capacity=None):
         """
         Adds a new remote server.
 
         :param host: host or address of the server
         :param port: port of the server (integer)
+        :param capacity: ServerCapacity instance
 
         :returns: the new remote server
         """
 
         server_socket = "{host}:{port}".format(host=host, port=port)
         url = "ws://{server_socket}".format(server_socket=server_socket)
-        server = WebSocketClient(url)
+        # compression and binary uploads are only worth it over the network, not for the local server
+        server = WebSocketClient(url, protocols=[BINARY_PROTOCOL], extensions=[PERMESSAGE_DEFLATE])
+        self._reconnect_supervisor.watch(server)
+        self._health_monitor.watch(server)
         self._remote_servers[server_socket] = server
+        self._capacities[server_socket] = capacity or ServerCapacity()
         log.info("new remote server connection {} registered".format(url))
         return server
 
@@ -236,25 +593,36 @@ class Servers(QtCore.QObject):
         """
         Updates the remote servers list.
 
-        :param servers: servers dictionary.
+        :param servers: servers dictionary, each server may declare
+        its capacity with "max_nodes", "ram" and "weight".
         """
 
         for server_id, server in self._remote_servers.copy().items():
             if not server_id in servers:
+                self._reconnect_supervisor.unwatch(server)
+                self._health_monitor.unwatch(server)
                 if server.connected():
                     server.close()
                 log.info("remote server connection {} unregistered".format(server.url))
                 del self._remote_servers[server_id]
+                del self._capacities[server_id]
 
         for server_id, server in servers.items():
+            if "max_nodes" in server or "ram" in server or "weight" in server:
+                self._capacities[server_id] = ServerCapacity(server.get("max_nodes", 0),
+                                                             server.get("ram", 0),
+                                                             server.get("weight", 1))
             if server_id in self._remote_servers:
                 continue
 
             host = server["host"]
             port = server["port"]
             url = "ws://{host}:{port}".format(host=host, port=port)
-            new_server = WebSocketClient(url)
+            new_server = WebSocketClient(url, protocols=[BINARY_PROTOCOL], extensions=[PERMESSAGE_DEFLATE])
+            self._reconnect_supervisor.watch(new_server)
+            self._health_monitor.watch(new_server)
             self._remote_servers[server_id] = new_server
+            self._capacities.setdefault(server_id, ServerCapacity())
             log.info("new remote server connection {} registered".format(url))
 
         self.updated_signal.emit()
@@ -268,32 +636,160 @@ class Servers(QtCore.QObject):
 
         return self._remote_servers
 
-    def __iter__(self):
+    def serverCapacity(self, server_id):
         """
-        Creates a round-robin system to pick up a remote server.
+        Returns the declared capacity of a remote server.
+
+        :param server_id: remote server identifier (host:port)
+
+        :returns: ServerCapacity instance or None
         """
 
-        return self
+        return self._capacities.get(server_id)
 
-    def __next__(self):
+    def setServerCapacity(self, server_id, capacity):
         """
-        Returns the next available remote server.
+        Declares the capacity of a remote server.
 
-        :returns: remote server (WebSocketClient instance)
+        :param server_id: remote server identifier (host:port)
+        :param capacity: ServerCapacity instance
+        """
+
+        if server_id in self._remote_servers:
+            self._capacities[server_id] = capacity
+
+    def placementPolicy(self):
+        """
+        Returns the policy used to place new nodes on the remote servers.
+
+        :returns: PlacementPolicy instance
+        """
+
+        return self._placement_policy
+
+    def setPlacementPolicy(self, name):
+        """
+        Sets the policy used to place new nodes on the remote servers.
+
+        :param name: policy name (see server_placement.PLACEMENT_POLICIES)
+        """
+
+        if name != self._placement_policy.name:
+            self._placement_policy = createPlacementPolicy(name)
+
+    def healthMonitor(self):
+        """
+        Returns the monitor checking the health of the servers.
+
+        :returns: HealthMonitor instance
+        """
+
+        return self._health_monitor
+
+    def healthCheckInterval(self):
+        """
+        Returns the time between two health checks.
+
+        :returns: interval in seconds, 0 if disabled
+        """
+
+        return self._health_check_interval
+
+    def setHealthCheckInterval(self, interval):
+        """
+        Sets the time between two health checks.
+
+        :param interval: interval in seconds, 0 disables the health checks
+        """
+
+        if interval != self._health_check_interval:
+            self._health_check_interval = interval
+            self._health_monitor.start(interval)
+
+    def allServers(self):
+        """
+        Returns the local server and all the remote servers.
+
+        :returns: list of WebSocketClient instances
+        """
+
+        return [self._local_server] + list(self._remote_servers.values())
+
+    def _serverHealthSlot(self, server):
+        """
+        Slot called when the health of a server has been checked.
+        A disconnected server which answers again is reconnected.
+
+        :param server: WebSocketClient instance
+        """
+
+        health = self._health_monitor.health(server)
+        if health.alive and not server.connected() and not server.connecting():
+            self._reconnect_supervisor.resume(server)
+
+    def remoteServerLoads(self):
+        """
+        Returns the load of the remote servers, the disconnected servers
+        are left out unless no remote server is connected.
+
+        :returns: list of ServerLoad instances
+        """
+
+        from .topology import Topology
+        usage = Topology.instance().serverUsage()
+        servers = [(server_id, server) for server_id, server in self._remote_servers.items() if server.connected()]
+        if not servers:
+            # the connection is attempted again when the node is created,
+            # preferably to a server that answered the last health check.
+            servers = [(server_id, server) for server_id, server in self._remote_servers.items()
+                       if self._health_monitor.health(server).alive is not False]
+        if not servers:
+            servers = list(self._remote_servers.items())
+
+        loads = []
+        for server_id, server in servers:
+            node_count, ram, node_types = usage.get(server.id(), (0, 0, None))
+            loads.append(ServerLoad(server, self._capacities[server_id], node_count, ram, node_types))
+        return loads
+
+    def allocateRemoteServer(self, node_type=None, ram=0):
+        """
+        Picks a remote server for a new node using the placement policy.
+
+        :param node_type: type of the new node (class name)
+        :param ram: RAM needed by the new node (MB)
+
+        :returns: remote server (WebSocketClient instance) or None
         """
 
         if not self._remote_servers:
             return None
 
-        server_ids = list(self._remote_servers.keys())
-        server_id = server_ids[self._remote_server_iter_pos]
+        load = self._placement_policy.select(self.remoteServerLoads(), node_type, ram)
+        if load is None:
+            log.warning("no remote server has enough capacity for a new {} node".format(node_type))
+            return None
+        log.debug("{} policy picked remote server {}:{} ({} nodes)".format(self._placement_policy.name,
+                                                                          load.server.host,
+                                                                          load.server.port,
+                                                                          load.node_count))
+        return load.server
 
-        if self._remote_server_iter_pos < len(server_ids) - 1:
-            self._remote_server_iter_pos += 1
-        else:
-            self._remote_server_iter_pos = 0
+    def __iter__(self):
+        """
+        Iterating picks remote servers using the placement policy.
+        """
 
-        return self._remote_servers[server_id]
+        return self
+
+    def __next__(self):
+        """
+        Returns the next available remote server.
+
+        :returns: remote server (WebSocketClient instance)
+        """
+
+        return self.allocateRemoteServer()
 
     def save(self):
         """
@@ -302,14 +798,49 @@ class Servers(QtCore.QObject):
 
         self._saveSettings()
 
+    def _connectServers(self, servers):
+        """
+        Connects servers that are not yet connected. Connections are non-blocking
+        and therefore attempted concurrently, each one with its own timeout.
+        A server that cannot be connected is connected once it answers the
+        health checks.
+
+        :param servers: list of WebSocketClient instances
+        """
+
+        for server in servers:
+            if not server.connected() and not server.connecting():
+                self._reconnect_supervisor.expect(server)
+                try:
+                    server.reconnect()
+                except OSError as e:
+                    log.warning("could not connect to server {}:{}: {}".format(server.host, server.port, e))
+
+    def connectRemoteServers(self):
+        """
+        Connects all the remote servers that are not yet connected,
+        so that they are ready by the time nodes are created on them.
+        """
+
+        self._connectServers(list(self._remote_servers.values()))
+
+    def connectAllServers(self):
+        """
+        Connects all servers (local and remote) that are not yet connected.
+        """
+
+        self._connectServers(self.allServers())
+
     def disconnectAllServers(self):
         """
         Disconnects all servers (local and remote).
         """
 
+        for server in [self._local_server] + list(self._remote_servers.values()):
+            self._reconnect_supervisor.cancel(server)
         if self._local_server.connected():
             self._local_server.close_connection()
-        for server in self._remote_servers:
+        for server in self._remote_servers.values():
             if server.connected():
                 server.close_connection()
 
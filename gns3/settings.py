@@ -128,6 +128,10 @@ GENERAL_SETTINGS = {
     "auto_close_console": True,
     "bring_console_to_front": True,
     "slow_console_all": 0.5,
+    "topology_load_window": 8,
+    "binary_project_files": False,
+    "autosave_interval": 30,
+    "optimize_placement_on_load": False,
 }
 
 GENERAL_SETTING_TYPES = {
@@ -141,6 +145,10 @@ GENERAL_SETTING_TYPES = {
     "auto_close_console": bool,
     "bring_console_to_front": bool,
     "slow_console_all": float,
+    "topology_load_window": int,
+    "binary_project_files": bool,
+    "autosave_interval": int,
+    "optimize_placement_on_load": bool,
 }
 
 GRAPHICS_VIEW_SETTINGS = {
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Checks GNS3 project files and reports statistics, without starting the GUI.
+"""
+
+import sys
+import json
+import argparse
+import multiprocessing
+
+from gns3.project_file import readProjectFile
+from gns3.topology_check import checkTopology
+from gns3.version import __version__
+
+
+def checkProjectFile(path):
+    """
+    Checks a project file.
+
+    :param path: path to the project file
+
+    :returns: tuple (path, report representation or None, error message or None)
+    """
+
+    try:
+        topology = readProjectFile(path)
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+    return path, checkTopology(topology).dump(), None
+
+
+def _printReport(path, report, error, quiet):
+    """
+    Prints the report of a project file.
+    """
+
+    if error:
+        print("{}: cannot be read: {}".format(path, error))
+        return
+    if quiet and not report["problems"]:
+        return
+
+    print("{}: {}".format(path, "OK" if not report["problems"] else "{} problem(s)".format(len(report["problems"]))))
+    for problem in report["problems"]:
+        print("  error: {}".format(problem))
+    if quiet:
+        return
+    print("  {} node(s), {} link(s), {} server(s)".format(report["nodes"], report["links"], report["servers"]))
+    for module, count in report["nodes_by_module"].items():
+        print("  nodes on module {}: {}".format(module, count))
+    for server, count in report["links_by_server"].items():
+        print("  links on server {}: {}".format(server, count))
+    if report["cross_server_links"]:
+        print("  links between servers: {}".format(report["cross_server_links"]))
+
+
+def main():
+    """
+    Entry point for gns3-topo.
+    """
+
+    parser = argparse.ArgumentParser(description="Checks GNS3 project files and reports statistics")
+    parser.add_argument("files", nargs="+", help="project files to check")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of files checked in parallel (default: 1)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only report the files with problems")
+    parser.add_argument("--json", action="store_true", help="print the reports in JSON")
+    parser.add_argument("--version", action="version", version="%(prog)s {}".format(__version__))
+    args = parser.parse_args()
+
+    if args.jobs > 1 and len(args.files) > 1:
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.imap(checkProjectFile, args.files, chunksize=16)
+    else:
+        pool = None
+        results = map(checkProjectFile, args.files)
+
+    failed = 0
+    reports = {}
+    try:
+        for path, report, error in results:
+            if error or report["problems"]:
+                failed += 1
+            if args.json:
+                reports[path] = report if report else {"error": error}
+            else:
+                _printReport(path, report, error, args.quiet)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    if args.json:
+        json.dump(reports, sys.stdout, sort_keys=True, indent=4)
+        print()
+    elif len(args.files) > 1:
+        print("{} file(s) checked, {} with problems".format(len(args.files), failed))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -20,12 +20,17 @@ Contains this entire topology: nodes and links.
 Handles the saving and loading of a topology.
 """
 
-#import networkx as nx
-from .qt import QtCore
+from collections import Counter, OrderedDict
 from .items.node_item import NodeItem
 from .servers import Servers
 from .modules import MODULES
 from .modules.module_error import ModuleError
+from .topology_graph import TopologyGraph
+from .placement_advisor import PINNED_NODE_TYPES, PlacementAdvisor, applyAssignment
+from .topology_loader import TopologyLoader
+from .topology_stream import TopologyFile
+from .project_file import isBinaryProjectFile, readProjectFile
+from .utils.progress_dialog import ProgressDialog
 from .utils.message_box import MessageBox
 from .version import __version__
 
@@ -40,11 +45,34 @@ class Topology(object):
 
     def __init__(self):
 
-        self._nodes = []
-        self._links = []
+        # indexed by identifier, in insertion order
+        self._nodes = OrderedDict()
+        self._links = OrderedDict()
+        # node identifier -> links connected to this node (link ID -> Link instance)
+        self._node_links = {}
+        # what the nodes use on each server (server ID -> [number of nodes, RAM in MB, Counter of node types])
+        # and what has been counted for each node (node ID -> (server ID, RAM in MB, node type))
+        self._server_usage = {}
+        self._node_usage = {}
         self._topology = None
-        self._initialized_nodes = []
-        #self._topology = nx.Graph()
+        self._initialized_nodes = set()
+        # topology load state: links waiting for their endpoints and port lookup tables
+        self._node_to_links_mapping = {}
+        self._pending_links = {}
+        self._node_ports = {}
+        self._loader = None
+        self._autosave = None
+        # nodes and links as a graph, for the analyses
+        self._graph = TopologyGraph()
+
+    def setAutosave(self, autosave):
+        """
+        Sets the autosave that records the changes made to this topology.
+
+        :param autosave: ProjectAutosave instance
+        """
+
+        self._autosave = autosave
 
     def addNode(self, node):
         """
@@ -53,8 +81,11 @@ class Topology(object):
         :param node: Node instance
         """
 
-        #self._topology.add_node(node)
-        self._nodes.append(node)
+        self._nodes[node.id()] = node
+        self._graph.addNode(node.id(), node.server().id())
+        self._countNode(node)
+        if self._autosave:
+            self._autosave.nodeAdded(node)
 
     def removeNode(self, node):
         """
@@ -63,8 +94,37 @@ class Topology(object):
         :param node: Node instance
         """
 
-        if node in self._nodes:
-            self._nodes.remove(node)
+        if self._nodes.get(node.id()) is node:
+            del self._nodes[node.id()]
+            self._graph.removeNode(node.id())
+            self._uncountNode(node.id())
+            if self._autosave:
+                self._autosave.nodeRemoved(node)
+
+    def nodeUpdated(self, node):
+        """
+        Called when the settings of a node have changed.
+
+        :param node: Node instance
+        """
+
+        if node.id() in self._nodes:
+            # the RAM may have changed
+            self._countNode(node)
+            if self._autosave:
+                self._autosave.nodeUpdated(node)
+
+    def nodeMoved(self, node, x, y):
+        """
+        Called when a node has been moved in the scene.
+
+        :param node: Node instance
+        :param x: X coordinate
+        :param y: Y coordinate
+        """
+
+        if self._autosave:
+            self._autosave.nodeMoved(node, x, y)
 
     def getNode(self, node_id):
         """
@@ -73,10 +133,7 @@ class Topology(object):
         :returns: Node instance or None
         """
 
-        for node in self._nodes:
-            if node.id() == node_id:
-                return node
-        return None
+        return self._nodes.get(node_id)
 
     def addLink(self, link):
         """
@@ -85,8 +142,12 @@ class Topology(object):
         :param link: Link instance
         """
 
-        #self._topology.add_node(node)
-        self._links.append(link)
+        self._links[link.id()] = link
+        self._graph.addLink(link.id(), link.sourceNode().id(), link.destinationNode().id())
+        for node in (link.sourceNode(), link.destinationNode()):
+            self._node_links.setdefault(node.id(), OrderedDict())[link.id()] = link
+        if self._autosave:
+            self._autosave.linkAdded(link)
 
     def removeLink(self, link):
         """
@@ -95,8 +156,18 @@ class Topology(object):
         :param link: Link instance
         """
 
-        if link in self._links:
-            self._links.remove(link)
+        if self._links.get(link.id()) is not link:
+            return
+        del self._links[link.id()]
+        self._graph.removeLink(link.id())
+        for node in (link.sourceNode(), link.destinationNode()):
+            node_links = self._node_links.get(node.id())
+            if node_links is not None:
+                node_links.pop(link.id(), None)
+                if not node_links:
+                    del self._node_links[node.id()]
+        if self._autosave:
+            self._autosave.linkRemoved(link)
 
     def getLink(self, link_id):
         """
@@ -105,34 +176,111 @@ class Topology(object):
         :returns: Link instance or None
         """
 
-        for link in self._links:
-            if link.id() == link_id:
-                return link
-        return None
+        return self._links.get(link_id)
+
+    def nodeLinks(self, node):
+        """
+        Returns the links connected to a node.
+
+        :param node: Node instance
+
+        :returns: list of Link instances
+        """
+
+        return list(self._node_links.get(node.id(), {}).values())
+
+    def graph(self):
+        """
+        Returns the graph of this topology.
+
+        :returns: TopologyGraph instance
+        """
+
+        return self._graph
+
+    def _countNode(self, node):
+        """
+        Counts what a node uses on its server.
+
+        :param node: Node instance
+        """
+
+        self._uncountNode(node.id())
+        server_id = node.server().id()
+        ram = node.settings().get("ram") or 0
+        node_type = node.__class__.__name__
+        if server_id not in self._server_usage:
+            self._server_usage[server_id] = [0, 0, Counter()]
+        server_usage = self._server_usage[server_id]
+        server_usage[0] += 1
+        server_usage[1] += ram
+        server_usage[2][node_type] += 1
+        self._node_usage[node.id()] = (server_id, ram, node_type)
+
+    def _uncountNode(self, node_id):
+        """
+        Forgets what a node uses on its server.
+
+        :param node_id: node identifier
+        """
+
+        counted = self._node_usage.pop(node_id, None)
+        if counted is None:
+            return
+        server_id, ram, node_type = counted
+        server_usage = self._server_usage[server_id]
+        server_usage[0] -= 1
+        server_usage[1] -= ram
+        server_usage[2][node_type] -= 1
+        if not server_usage[2][node_type]:
+            del server_usage[2][node_type]
+        if not server_usage[0]:
+            del self._server_usage[server_id]
+
+    def serverUsage(self):
+        """
+        Returns what the nodes use on each server.
+
+        :returns: dictionary (server ID -> tuple (number of nodes, RAM in MB, Counter of node types))
+        """
+
+        return {server_id: (node_count, ram, Counter(node_types))
+                for server_id, (node_count, ram, node_types) in self._server_usage.items()}
 
     def nodes(self):
         """
         Returns all the nodes in this topology.
         """
 
-        return self._nodes
+        return list(self._nodes.values())
 
     def links(self):
         """
         Returns all the links in this topology.
         """
 
-        return self._links
+        return list(self._links.values())
 
     def reset(self):
         """
         Resets this topology.
         """
 
-        #self._topology.clear()
+        if self._loader:
+            # a canceled load may still be waiting for nodes or links
+            self._loader.settled.disconnect(self._loadSettledSlot)
+            self._loadSettledSlot()
+
+        self._graph.clear()
         self._links.clear()
         self._nodes.clear()
+        self._node_links.clear()
+        self._server_usage.clear()
+        self._node_usage.clear()
         self._initialized_nodes.clear()
+        self._node_to_links_mapping.clear()
+        self._pending_links.clear()
+        self._node_ports.clear()
         log.info("topology has been reset")
 
     def _dump_gui_settings(self, topology):
@@ -146,14 +294,24 @@ class Topology(object):
         view = MainWindow.instance().uiGraphicsView
 
         if "nodes" in topology["topology"]:
-            for item in view.scene().items():
-                if isinstance(item, NodeItem):
-                    for node in topology["topology"]["nodes"]:
-                        if node["id"] == item.node().id():
-                            node["x"] = item.x()
-                            node["y"] = item.y()
-                            if item.zValue() != 1.0:
-                                node["z"] = item.zValue()
+            self.mergeGuiSettings(topology["topology"]["nodes"], view.nodeItems())
+
+    @staticmethod
+    def mergeGuiSettings(topology_nodes, node_items):
+        """
+        Adds the position of the node items to node representations.
+
+        :param topology_nodes: list of node representations
+        :param node_items: dictionary of node items (node ID -> NodeItem instance)
+        """
+
+        for node in topology_nodes:
+            item = node_items.get(node["id"])
+            if item:
+                node["x"] = item.x()
+                node["y"] = item.y()
+                if item.zValue() != 1.0:
+                    node["z"] = item.zValue()
 
     def dump(self, include_gui_data=True):
         """
@@ -176,7 +334,7 @@ class Topology(object):
         # first the nodes
         if self._nodes:
             topology_nodes = topology["topology"]["nodes"] = []
-            for node in self._nodes:
+            for node in self._nodes.values():
                 if node.server().id() not in servers:
                     servers[node.server().id()] = node.server()
                 log.info("saving node: {}".format(node.name()))
@@ -185,7 +343,7 @@ class Topology(object):
         # then the links
         if self._links:
             topology_links = topology["topology"]["links"] = []
-            for link in self._links:
+            for link in self._links.values():
                 log.info("saving {}".format(link.description()))
                 topology_links.append(link.dump())
 
@@ -208,110 +366,239 @@ class Topology(object):
         :param topology: topology representation
         """
 
+        if "topology" not in topology:
+            log.warn("not a topology file")
+            return
+
         from .main_window import MainWindow
-        main_window = MainWindow.instance()
-        view = main_window.uiGraphicsView
+        node_placement = None
+        topology = topology["topology"]
+        nodes = topology.get("nodes", [])
+        if MainWindow.instance().settings()["optimize_placement_on_load"]:
+            node_placement = OrderedDict((node["id"], (node["server_id"], node["type"])) for node in nodes)
+        self._load(topology.get("servers", []), topology.get("links", []), nodes, len(nodes), node_placement)
+
+    def loadFile(self, path):
+        """
+        Loads a topology file. The nodes of a JSON file are
+        read from the file while they are being created.
 
-        # deactivate the unsaved state support
-        main_window.ignoreUnsavedState(True)
-        # trick: no matter what, reactivate the unsaved state support after 3 seconds
-        QtCore.QTimer.singleShot(3000, self._reactivateUnsavedState)
+        :param path: path to the topology file
+        """
 
-        if "topology" not in topology:
+        if isBinaryProjectFile(path):
+            self.load(readProjectFile(path))
+            return
+
+        from .main_window import MainWindow
+        optimize_placement = MainWindow.instance().settings()["optimize_placement_on_load"]
+
+        topology_file = TopologyFile(path)
+        topology_file.scan(node_placement=optimize_placement)
+        if not topology_file.isTopology():
             log.warn("not a topology file")
             return
 
+        self._load(topology_file.servers(),
+                   topology_file.links(),
+                   topology_file.nodes(),
+                   topology_file.nodeCount(),
+                   topology_file.nodePlacement())
+
+    def _load(self, servers, links, topology_nodes, node_count, node_placement=None):
+        """
+        Loads the servers, nodes and links of a topology.
+
+        :param servers: list of server representations
+        :param links: list of link representations
+        :param topology_nodes: iterable of node representations
+        :param node_count: number of nodes
+        :param node_placement: node ID -> tuple (server ID, node type), to optimize the placement
+        """
+
+        from .main_window import MainWindow
+        main_window = MainWindow.instance()
+
+        # deactivate the unsaved state support until all the nodes and links have been created
+        main_window.ignoreUnsavedState(True)
+
         self._node_to_links_mapping = {}
-        # first create a mapping node ID to links
-        if "links" in topology["topology"]:
-            links = topology["topology"]["links"]
-            for topology_link in links:
-                log.debug("mapping node to link with ID {}".format(topology_link["id"]))
-                source_id = topology_link["source_node_id"]
-                destination_id = topology_link["destination_node_id"]
-                if source_id not in self._node_to_links_mapping:
-                    self._node_to_links_mapping[source_id] = []
-                if destination_id not in self._node_to_links_mapping:
-                    self._node_to_links_mapping[destination_id] = []
-                self._node_to_links_mapping[source_id].append(topology_link)
-                self._node_to_links_mapping[destination_id].append(topology_link)
+        self._pending_links = {}
+        self._node_ports = {}
+        # first create a mapping node ID to links, each link is created
+        # once, when the second of its nodes has initialized.
+        for topology_link in links:
+            log.debug("mapping node to link with ID {}".format(topology_link["id"]))
+            self._pending_links[topology_link["id"]] = topology_link
+            source_id = topology_link["source_node_id"]
+            destination_id = topology_link["destination_node_id"]
+            self._node_to_links_mapping.setdefault(source_id, []).append(topology_link)
+            if destination_id != source_id:
+                self._node_to_links_mapping.setdefault(destination_id, []).append(topology_link)
 
         # then load the servers
         self._servers = {}
         server_manager = Servers.instance()
-        if "servers" in topology["topology"]:
-            servers = topology["topology"]["servers"]
-            for topology_server in servers:
-                if "local" in topology_server and topology_server["local"]:
-                    self._servers[topology_server["id"]] = server_manager.localServer()
-                else:
-                    host = topology_server["host"]
-                    port = topology_server["port"]
-                    self._servers[topology_server["id"]] = server_manager.getRemoteServer(host, port)
-
-        # finally load the nodes
-        node_errors = []
-        if "nodes" in topology["topology"]:
-            topology_nodes = {}
-            nodes = topology["topology"]["nodes"]
-            for topology_node in nodes:
-                # check for duplicate node IDs
-                if topology_node["id"] in topology_nodes:
-                    node_errors.append("Duplicated node ID {} for {}".format(topology_node["id"],
-                                                                             topology_node["description"]))
-                    continue
-                topology_nodes[topology_node["id"]] = topology_node
-
-            for topology_node in topology_nodes.values():
-                log.debug("loading node with ID {}".format(topology_node["id"]))
-
+        for topology_server in servers:
+            if "local" in topology_server and topology_server["local"]:
+                self._servers[topology_server["id"]] = server_manager.localServer()
+            else:
+                host = topology_server["host"]
+                port = topology_server["port"]
+                self._servers[topology_server["id"]] = server_manager.getRemoteServer(host, port)
+
+        # connect to all the servers at the same time (non-blocking)
+        for server in self._servers.values():
+            if not server.connected() and not server.connecting():
                 try:
-                    node_module = None
-                    for module in MODULES:
-                        instance = module.instance()
-                        node_class = module.getNodeClass(topology_node["type"])
-                        if node_class:
-                            node_module = instance
-                            break
-                    if not node_module:
-                        raise ModuleError("Could not find any module for {}".format(topology_node["type"]))
-
-                    server = None
-                    if topology_node["server_id"] in self._servers:
-                        server = self._servers[topology_node["server_id"]]
-
-                    if not server:
-                        node_errors.append("No server reference for node ID {}".format(topology_node["id"]))
-                        continue
-
-                    node = node_module.createNode(node_class, server)
-                    node.error_signal.connect(main_window.uiConsoleTextEdit.writeError)
-                    node.warning_signal.connect(main_window.uiConsoleTextEdit.writeWarning)
-                    node.server_error_signal.connect(main_window.uiConsoleTextEdit.writeServerError)
-
-                except ModuleError as e:
-                    node_errors.append(str(e))
-                    continue
-
-                node.setId(topology_node["id"])
-
-                # we want to know when the node has been created
-                node.created_signal.connect(self._nodeCreatedSlot)
-
-                # load the settings
-                node.load(topology_node)
-
-                # create the node item and restore GUI settings
-                node_item = NodeItem(node)
-                node_item.setPos(topology_node["x"], topology_node["y"])
-                view.scene().addItem(node_item)
-                self.addNode(node)
-                main_window.uiTopologySummaryTreeWidget.addNode(node)
-
+                    server.reconnect()
+                except OSError as e:
+                    log.warning("could not connect to server {}:{}: {}".format(server.host, server.port, e))
+
+        if node_placement:
+            assignment = self._optimizePlacement(servers, links, node_placement)
+            if assignment:
+                topology_nodes = applyAssignment(topology_nodes, assignment)
+
+        # finally load the nodes, on all the servers at the same time
+        window = main_window.settings()["topology_load_window"]
+        self._loader = TopologyLoader(self, topology_nodes, self._servers, node_count, len(self._pending_links), window)
+        self._loader.settled.connect(self._loadSettledSlot)
+        progress_dialog = ProgressDialog(self._loader, "Topology", "Loading topology...", "Cancel", busy=False, parent=main_window)
+        progress_dialog.show()
+        progress_dialog.exec_()
+
+        node_errors = progress_dialog.errors()
         if node_errors:
             errors = "\n".join(node_errors)
             MessageBox(main_window, "Topology", "Errors detected while importing the topology", errors)
 
+    @staticmethod
+    def _serverCapacities(servers):
+        """
+        Returns the declared capacity of remote servers.
+
+        :param servers: server ID -> WebSocketClient instance
+
+        :returns: dictionary (server ID -> ServerCapacity instance)
+        """
+
+        server_manager = Servers.instance()
+        capacities = {}
+        for server_id, server in servers.items():
+            capacity = server_manager.serverCapacity("{}:{}".format(server.host, server.port))
+            if capacity:
+                capacities[server_id] = capacity
+        return capacities
+
+    def _optimizePlacement(self, servers, links, node_placement):
+        """
+        Moves the nodes of a topology being loaded between its remote
+        servers when this reduces the links between servers.
+
+        :param servers: list of server representations
+        :param links: list of link representations
+        :param node_placement: node ID -> tuple (server ID, node type)
+
+        :returns: new placement (node ID -> server ID) or None
+        """
+
+        remote_servers = [server["id"] for server in servers if not server.get("local")]
+        if len(remote_servers) < 2:
+            return None
+
+        graph = TopologyGraph()
+        fixed = {}
+        for node_id, (server_id, node_type) in node_placement.items():
+            graph.addNode(node_id, server_id)
+            if server_id not in remote_servers or node_type in PINNED_NODE_TYPES:
+                fixed[node_id] = server_id
+        for link in links:
+            if link["source_node_id"] in node_placement and link["destination_node_id"] in node_placement:
+                graph.addLink(link["id"], link["source_node_id"], link["destination_node_id"])
+
+        capacities = self._serverCapacities({server_id: self._servers[server_id] for server_id in remote_servers})
+        try:
+            plan = PlacementAdvisor(graph, remote_servers, capacities, fixed).rebalance()
+        except ValueError as e:
+            log.warning("could not optimize the node placement: {}".format(e))
+            return None
+        if not plan:
+            return None
+        log.info("moving {} node(s) to other servers, links between servers: {} -> {}".format(len(plan),
+                                                                                             plan.cut_links_before,
+                                                                                             plan.cut_links_after))
+        return plan.assignment()
+
+    def rebalancePlan(self):
+        """
+        Produces a migration plan spreading the nodes on the connected
+        remote servers with as few links between servers as possible.
+
+        :returns: tuple (MigrationPlan instance, dictionary server ID -> WebSocketClient instance)
+        """
+
+        servers = OrderedDict()
+        fixed = {}
+        for node in self._nodes.values():
+            server = node.server()
+            servers[server.id()] = server
+            if server.isLocal() or node.__class__.__name__ in PINNED_NODE_TYPES:
+                fixed[node.id()] = server.id()
+        for server in Servers.instance().remoteServers().values():
+            if server.connected():
+                servers[server.id()] = server
+
+        remote_servers = OrderedDict((server_id, server) for server_id, server in servers.items() if not server.isLocal())
+        advisor = PlacementAdvisor(self._graph, list(remote_servers), self._serverCapacities(remote_servers), fixed)
+        return advisor.rebalance(), servers
+
+    def loadNode(self, topology_node, server):
+        """
+        Creates a node from its topology representation
+        and starts loading its settings on a server.
+
+        :param topology_node: node representation
+        :param server: WebSocketClient instance
+
+        :returns: Node instance
+        """
+
+        from .main_window import MainWindow
+        main_window = MainWindow.instance()
+        view = main_window.uiGraphicsView
+
+        log.debug("loading node with ID {}".format(topology_node["id"]))
+        node_module = None
+        for module in MODULES:
+            instance = module.instance()
+            node_class = module.getNodeClass(topology_node["type"])
+            if node_class:
+                node_module = instance
+                break
+        if not node_module:
+            raise ModuleError("Could not find any module for {}".format(topology_node["type"]))
+
+        node = node_module.createNode(node_class, server)
+        node.error_signal.connect(main_window.uiConsoleTextEdit.writeError)
+        node.warning_signal.connect(main_window.uiConsoleTextEdit.writeWarning)
+        node.server_error_signal.connect(main_window.uiConsoleTextEdit.writeServerError)
+        node.setId(topology_node["id"])
+
+        # we want to know when the node has been created
+        node.created_signal.connect(self._nodeCreatedSlot)
+
+        # load the settings
+        node.load(topology_node)
+
+        # create the node item and restore GUI settings
+        node_item = NodeItem(node)
+        node_item.setPos(topology_node["x"], topology_node["y"])
+        view.addNodeItem(node_item)
+        self.addNode(node)
+        main_window.uiTopologySummaryTreeWidget.addNode(node)
+        return node
+
     def _nodeCreatedSlot(self, node_id):
         """
         Slot to know when a node has been created.
@@ -329,45 +616,51 @@ class Topology(object):
         view = MainWindow.instance().uiGraphicsView
 
         log.debug("node {} has initialized".format(node.name()))
-        self._initialized_nodes.append(node_id)
-
-        if node_id in self._node_to_links_mapping:
-            topology_link = self._node_to_links_mapping[node_id]
-            for link in topology_link:
-                source_node_id = link["source_node_id"]
-                destination_node_id = link["destination_node_id"]
-                if source_node_id in self._initialized_nodes and destination_node_id in self._initialized_nodes:
-
-                    source_node = self.getNode(source_node_id)
-                    destination_node = self.getNode(destination_node_id)
-
-                    log.debug("creating link from {} to {}".format(source_node.name(), destination_node.name()))
-
-                    source_port = None
-                    destination_port = None
-
-                    # find the source port
-                    for port in source_node.ports():
-                        if port.id() == link["source_port_id"]:
-                            source_port = port
-                            break
-
-                    # find the destination port
-                    for port in destination_node.ports():
-                        if port.id() == link["destination_port_id"]:
-                            destination_port = port
-                            break
-
-                    if source_port and destination_port:
-                        view.addLink(source_node, source_port, destination_node, destination_port)
-
-    def _reactivateUnsavedState(self):
+        self._initialized_nodes.add(node_id)
+        self._node_ports[node_id] = {port.id(): port for port in node.ports()}
+
+        for link in self._node_to_links_mapping.pop(node_id, []):
+            source_node_id = link["source_node_id"]
+            destination_node_id = link["destination_node_id"]
+            if source_node_id not in self._initialized_nodes or destination_node_id not in self._initialized_nodes:
+                # created when the other node has initialized
+                continue
+            if self._pending_links.pop(link["id"], None) is None:
+                # already created
+                continue
+
+            source_node = self.getNode(source_node_id)
+            destination_node = self.getNode(destination_node_id)
+            log.debug("creating link from {} to {}".format(source_node.name(), destination_node.name()))
+
+            source_port = self._node_ports[source_node_id].get(link["source_port_id"])
+            destination_port = self._node_ports[destination_node_id].get(link["destination_port_id"])
+            if source_port and destination_port:
+                link = view.addLink(source_node, source_port, destination_node, destination_port)
+                if self._loader:
+                    self._loader.trackLink(link)
+            else:
+                log.warning("could not find the ports for link with ID {}".format(link["id"]))
+
+        if not self._pending_links:
+            # all the links have been created
+            self._node_ports.clear()
+
+    def _loadSettledSlot(self):
         """
-        Slots to reactivate the unsaved state support
-        when the QTimer timeouts
+        Slot called when all the nodes and links of
+        a loaded topology have been created (or have failed).
         """
 
         from .main_window import MainWindow
+        if self._pending_links:
+            log.warning("{} link(s) could not be created".format(len(self._pending_links)))
+            self._pending_links.clear()
+        self._node_to_links_mapping.clear()
+        self._node_ports.clear()
+        self._loader = None
+
+        # reactivate the unsaved state support
         MainWindow.instance().ignoreUnsavedState(False)
 
     def __str__(self):
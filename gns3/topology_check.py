@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Checks and statistics of topology representations, without Qt.
+"""
+
+from collections import Counter, OrderedDict
+
+# node type -> module, this must follow the nodes() of the modules in gns3.modules
+# (checked by the tests, the modules cannot be imported here since they need Qt)
+NODE_TYPES = {"Cloud": "builtin",
+              "C1700": "dynamips",
+              "C2600": "dynamips",
+              "C2691": "dynamips",
+              "C3600": "dynamips",
+              "C3725": "dynamips",
+              "C3745": "dynamips",
+              "C7200": "dynamips",
+              "EthernetSwitch": "dynamips",
+              "EthernetHub": "dynamips",
+              "FrameRelaySwitch": "dynamips",
+              "ATMSwitch": "dynamips",
+              "IOUDevice": "iou",
+              "VPCSDevice": "vpcs"}
+
+
+class TopologyReport(object):
+    """
+    Result of the checks of a topology.
+    """
+
+    def __init__(self):
+
+        self.problems = []
+        self.node_count = 0
+        self.link_count = 0
+        self.server_count = 0
+        self.nodes_by_module = Counter()
+        self.links_by_server = Counter()
+        self.cross_server_links = 0
+
+    def valid(self):
+        """
+        Returns if no problem has been found.
+
+        :returns: True or False
+        """
+
+        return not self.problems
+
+    def dump(self):
+        """
+        Returns a representation of this report.
+
+        :returns: dictionary
+        """
+
+        return OrderedDict([("problems", self.problems),
+                            ("nodes", self.node_count),
+                            ("links", self.link_count),
+                            ("servers", self.server_count),
+                            ("nodes_by_module", OrderedDict(sorted(self.nodes_by_module.items()))),
+                            ("links_by_server", OrderedDict(sorted(self.links_by_server.items()))),
+                            ("cross_server_links", self.cross_server_links)])
+
+
+def _serverName(server):
+    """
+    Returns a displayable name for a server representation.
+    """
+
+    if "host" in server and "port" in server:
+        return "{}:{}".format(server["host"], server["port"])
+    return "server {}".format(server.get("id"))
+
+
+def checkTopology(topology):
+    """
+    Checks a topology representation and collects statistics:
+    duplicate node IDs, unknown node types, unknown servers,
+    port ID collisions and links with a missing node or port.
+
+    :param topology: topology representation
+
+    :returns: TopologyReport instance
+    """
+
+    report = TopologyReport()
+    problems = report.problems
+    if not isinstance(topology, dict) or topology.get("type") != "topology" or not isinstance(topology.get("topology"), dict):
+        problems.append("not a topology")
+        return report
+
+    content = topology["topology"]
+    servers = {}
+    for server in content.get("servers", []):
+        if server.get("id") in servers:
+            problems.append("duplicate server ID {}".format(server.get("id")))
+        servers[server.get("id")] = server
+    report.server_count = len(servers)
+
+    nodes = {}
+    port_owners = {}
+    for node in content.get("nodes", []):
+        report.node_count += 1
+        node_id = node.get("id")
+        name = node.get("properties", {}).get("name", node_id)
+        if node_id in nodes:
+            # like when loading, the first node with this ID is kept
+            problems.append("duplicate node ID {} ({})".format(node_id, name))
+            continue
+        module = NODE_TYPES.get(node.get("type"))
+        if module:
+            report.nodes_by_module[module] += 1
+        else:
+            report.nodes_by_module["unknown"] += 1
+            problems.append("node {} has an unknown type: {}".format(name, node.get("type")))
+        if node.get("server_id") not in servers:
+            problems.append("node {} is on an unknown server: {}".format(name, node.get("server_id")))
+
+        ports = set()
+        for port in node.get("ports", []):
+            port_id = port.get("id")
+            if port_id in port_owners:
+                problems.append("port ID {} of node {} is also used by node {}".format(port_id, name, port_owners[port_id]))
+            else:
+                port_owners[port_id] = name
+            ports.add(port_id)
+        nodes[node_id] = (node, ports)
+
+    link_ids = set()
+    used_ports = {}
+    for link in content.get("links", []):
+        report.link_count += 1
+        link_id = link.get("id")
+        if link_id in link_ids:
+            problems.append("duplicate link ID {}".format(link_id))
+        link_ids.add(link_id)
+
+        endpoints = []
+        for side in ("source", "destination"):
+            node_id = link.get("{}_node_id".format(side))
+            port_id = link.get("{}_port_id".format(side))
+            if node_id not in nodes:
+                problems.append("link {} has an unknown {} node: {}".format(link_id, side, node_id))
+                continue
+            node, ports = nodes[node_id]
+            if port_id not in ports:
+                problems.append("link {} has an unknown {} port on node {}: {}".format(link_id, side, node_id, port_id))
+            elif (node_id, port_id) in used_ports:
+                problems.append("port {} of node {} is used by links {} and {}".format(port_id, node_id,
+                                                                                      used_ports[(node_id, port_id)], link_id))
+            else:
+                used_ports[(node_id, port_id)] = link_id
+            endpoints.append(node.get("server_id"))
+
+        if len(endpoints) == 2:
+            if endpoints[0] == endpoints[1]:
+                server = servers.get(endpoints[0], {"id": endpoints[0]})
+                report.links_by_server[_serverName(server)] += 1
+            else:
+                report.cross_server_links += 1
+
+    return report
@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Graph model of a topology: nodes and the links between them, with the
+analyses used on big labs (components, paths, bridges, partitions).
+Nodes and links are identified by their IDs, more than one link can
+connect the same two nodes.
+"""
+
+import heapq
+import math
+from collections import OrderedDict, deque
+
+
+class TopologyGraph(object):
+    """
+    Undirected multigraph of a topology.
+    """
+
+    def __init__(self):
+
+        # node ID -> server ID
+        self._nodes = OrderedDict()
+        # node ID -> links of this node (link ID -> ID of the node at the other end)
+        self._adjacency = {}
+        # link ID -> (source node ID, destination node ID)
+        self._links = OrderedDict()
+
+    def addNode(self, node_id, server_id=None):
+        """
+        Adds a node.
+
+        :param node_id: node identifier
+        :param server_id: identifier of the server hosting the node
+        """
+
+        self._nodes[node_id] = server_id
+        self._adjacency.setdefault(node_id, OrderedDict())
+
+    def removeNode(self, node_id):
+        """
+        Removes a node and its links.
+
+        :param node_id: node identifier
+        """
+
+        if node_id not in self._nodes:
+            return
+        for link_id in list(self._adjacency[node_id]):
+            self.removeLink(link_id)
+        del self._nodes[node_id]
+        del self._adjacency[node_id]
+
+    def addLink(self, link_id, source_node_id, destination_node_id):
+        """
+        Adds a link, the nodes are added if needed.
+
+        :param link_id: link identifier
+        :param source_node_id: source node identifier
+        :param destination_node_id: destination node identifier
+        """
+
+        self.removeLink(link_id)
+        for node_id in (source_node_id, destination_node_id):
+            if node_id not in self._nodes:
+                self.addNode(node_id)
+        self._links[link_id] = (source_node_id, destination_node_id)
+        self._adjacency[source_node_id][link_id] = destination_node_id
+        self._adjacency[destination_node_id][link_id] = source_node_id
+
+    def removeLink(self, link_id):
+        """
+        Removes a link.
+
+        :param link_id: link identifier
+        """
+
+        endpoints = self._links.pop(link_id, None)
+        if endpoints:
+            for node_id in endpoints:
+                self._adjacency[node_id].pop(link_id, None)
+
+    def clear(self):
+        """
+        Removes all the nodes and links.
+        """
+
+        self._nodes.clear()
+        self._adjacency.clear()
+        self._links.clear()
+
+    def nodes(self):
+        """
+        Returns the node identifiers.
+
+        :returns: list of node identifiers
+        """
+
+        return list(self._nodes)
+
+    def links(self):
+        """
+        Returns the link identifiers.
+
+        :returns: list of link identifiers
+        """
+
+        return list(self._links)
+
+    def serverId(self, node_id):
+        """
+        Returns the server of a node.
+
+        :param node_id: node identifier
+
+        :returns: server identifier or None
+        """
+
+        return self._nodes.get(node_id)
+
+    def endpoints(self, link_id):
+        """
+        Returns the nodes connected by a link.
+
+        :param link_id: link identifier
+
+        :returns: tuple (source node ID, destination node ID) or None
+        """
+
+        return self._links.get(link_id)
+
+    def neighbors(self, node_id):
+        """
+        Returns the nodes connected to a node.
+
+        :param node_id: node identifier
+
+        :returns: list of node identifiers
+        """
+
+        return list(OrderedDict.fromkeys(self._adjacency.get(node_id, {}).values()))
+
+    def degree(self, node_id):
+        """
+        Returns the number of links of a node.
+
+        :param node_id: node identifier
+
+        :returns: integer
+        """
+
+        return len(self._adjacency.get(node_id, {}))
+
+    def _reachable(self, start, excluded_link_id=None):
+        """
+        Returns the nodes reachable from a node.
+        """
+
+        adjacency = self._adjacency
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            node_id = queue.popleft()
+            for link_id, neighbor in adjacency[node_id].items():
+                if neighbor not in seen and link_id != excluded_link_id:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+        return seen
+
+    def connectedComponents(self):
+        """
+        Returns the connected components.
+
+        :returns: list of sets of node identifiers
+        """
+
+        components = []
+        seen = set()
+        for node_id in self._nodes:
+            if node_id not in seen:
+                component = self._reachable(node_id)
+                seen.update(component)
+                components.append(component)
+        return components
+
+    def shortestPath(self, source_node_id, destination_node_id):
+        """
+        Returns a path with the fewest links between two nodes.
+
+        :param source_node_id: source node identifier
+        :param destination_node_id: destination node identifier
+
+        :returns: list of node identifiers (both nodes included) or None if there is no path
+        """
+
+        if source_node_id not in self._nodes or destination_node_id not in self._nodes:
+            return None
+        previous = {source_node_id: None}
+        queue = deque([source_node_id])
+        while queue and destination_node_id not in previous:
+            node_id = queue.popleft()
+            for neighbor in self._adjacency[node_id].values():
+                if neighbor not in previous:
+                    previous[neighbor] = node_id
+                    queue.append(neighbor)
+
+        if destination_node_id not in previous:
+            return None
+        path = [destination_node_id]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        path.reverse()
+        return path
+
+    def _lowPoints(self):
+        """
+        Depth-first search (Tarjan) finding the bridges and articulation points.
+
+        :returns: tuple (list of bridge link IDs, set of articulation point node IDs)
+        """
+
+        adjacency = self._adjacency
+        index = {}
+        low = {}
+        bridges = []
+        articulation_points = set()
+        for root in self._nodes:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            root_children = 0
+            # node ID, link used to reach it and its remaining links
+            stack = [(root, None, iter(adjacency[root].items()))]
+            while stack:
+                node_id, parent_link_id, links = stack[-1]
+                for link_id, neighbor in links:
+                    if link_id == parent_link_id:
+                        continue
+                    if neighbor in index:
+                        low[node_id] = min(low[node_id], index[neighbor])
+                    else:
+                        index[neighbor] = low[neighbor] = len(index)
+                        stack.append((neighbor, link_id, iter(adjacency[neighbor].items())))
+                        break
+                else:
+                    stack.pop()
+                    if not stack:
+                        continue
+                    parent = stack[-1][0]
+                    low[parent] = min(low[parent], low[node_id])
+                    if low[node_id] > index[parent]:
+                        bridges.append(parent_link_id)
+                    if parent == root:
+                        root_children += 1
+                    elif low[node_id] >= index[parent]:
+                        articulation_points.add(parent)
+            if root_children > 1:
+                articulation_points.add(root)
+        return bridges, articulation_points
+
+    def bridges(self):
+        """
+        Returns the links whose failure disconnects nodes.
+
+        :returns: list of link identifiers
+        """
+
+        return self._lowPoints()[0]
+
+    def articulationPoints(self):
+        """
+        Returns the nodes whose failure disconnects other nodes.
+
+        :returns: set of node identifiers
+        """
+
+        return self._lowPoints()[1]
+
+    def splitByLink(self, link_id):
+        """
+        Returns what breaks if a link fails.
+
+        :param link_id: link identifier
+
+        :returns: tuple (nodes on the source side, nodes on the destination side)
+        or None if the nodes stay connected
+        """
+
+        endpoints = self._links.get(link_id)
+        if endpoints is None:
+            return None
+        source_node_id, destination_node_id = endpoints
+        source_side = self._reachable(source_node_id, link_id)
+        if destination_node_id in source_side:
+            return None
+        return source_side, self._reachable(destination_node_id, link_id)
+
+    def cutLinks(self, assignment=None):
+        """
+        Returns the links between nodes on different servers.
+
+        :param assignment: node ID -> server ID, the current servers by default
+
+        :returns: list of link identifiers
+        """
+
+        if assignment is None:
+            assignment = self._nodes
+        return [link_id for link_id, (source_node_id, destination_node_id) in self._links.items()
+                if assignment.get(source_node_id) != assignment.get(destination_node_id)]
+
+    def partition(self, server_ids, capacities=None, assignment=None, fixed=None, imbalance=0.1, max_passes=20):
+        """
+        Suggests how to spread the nodes on servers with as few links
+        between servers as possible, while keeping the servers balanced.
+        Nodes are first grouped by growing regions along the links, then
+        moved one by one to the server of most of their neighbors (greedy
+        refinement, the result is not guaranteed to be the minimum cut).
+
+        :param server_ids: list of server identifiers
+        :param capacities: server ID -> maximum number of nodes (optional)
+        :param assignment: node ID -> server ID to start from, e.g. the current placement (optional)
+        :param fixed: node ID -> server ID of the nodes that cannot move, the server may be another one (optional)
+        :param imbalance: allowed load above an even spread when there are no capacities
+        :param max_passes: maximum number of refinement passes
+
+        :returns: dictionary (node ID -> server ID)
+        """
+
+        server_ids = list(server_ids)
+        if not server_ids:
+            raise ValueError("no server to place the nodes on")
+        fixed = {node_id: server_id for node_id, server_id in (fixed or {}).items() if node_id in self._nodes}
+        node_count = len([node_id for node_id in self._nodes if fixed.get(node_id, server_ids[0]) in server_ids])
+        if capacities is None:
+            even_load = math.ceil(node_count * (1 + imbalance) / len(server_ids))
+            capacities = {server_id: even_load for server_id in server_ids}
+        if sum(capacities.get(server_id, 0) for server_id in server_ids) < node_count:
+            raise ValueError("not enough server capacity for {} nodes".format(node_count))
+
+        loads = {server_id: 0 for server_id in server_ids}
+        result = {}
+        for node_id, server_id in fixed.items():
+            result[node_id] = server_id
+            if server_id in loads:
+                loads[server_id] += 1
+        if assignment:
+            for node_id in self._nodes:
+                if node_id in result:
+                    continue
+                server_id = assignment.get(node_id)
+                if server_id in loads and loads[server_id] < capacities.get(server_id, 0):
+                    result[node_id] = server_id
+                    loads[server_id] += 1
+
+        def room(server_id):
+            return capacities.get(server_id, 0) - loads[server_id]
+
+        # grow one region per server: the next node is the one with the most
+        # links to the region, the servers with the least room are filled first
+        adjacency = self._adjacency
+        order = {node_id: position for position, node_id in enumerate(self._nodes)}
+        unplaced = [node_id for node_id in self._nodes if node_id not in result]
+        next_unplaced = 0
+        remaining = len(unplaced)
+        servers_left = len(server_ids)
+        for server_id in sorted(server_ids, key=room):
+            target = min(room(server_id), math.ceil(remaining / servers_left))
+            servers_left -= 1
+            gains = {}
+            heap = []
+            for node_id, assigned_server_id in result.items():
+                if assigned_server_id == server_id:
+                    for neighbor in adjacency[node_id].values():
+                        if neighbor not in result:
+                            gains[neighbor] = gains.get(neighbor, 0) + 1
+            for node_id, gain in gains.items():
+                heapq.heappush(heap, (-gain, order[node_id], node_id))
+
+            placed = 0
+            while placed < target:
+                if heap:
+                    gain, _, node_id = heapq.heappop(heap)
+                    if node_id in result or -gain != gains.get(node_id):
+                        continue
+                else:
+                    # start a new region from the first unplaced node
+                    while unplaced[next_unplaced] in result:
+                        next_unplaced += 1
+                    node_id = unplaced[next_unplaced]
+                result[node_id] = server_id
+                loads[server_id] += 1
+                placed += 1
+                for neighbor in adjacency[node_id].values():
+                    if neighbor not in result:
+                        gains[neighbor] = gains.get(neighbor, 0) + 1
+                        heapq.heappush(heap, (-gains[neighbor], order[neighbor], neighbor))
+            remaining -= placed
+
+        # fixed nodes above the capacity of a server may leave nodes behind
+        for node_id in unplaced[next_unplaced:]:
+            if node_id not in result:
+                server_id = max(server_ids, key=room)
+                result[node_id] = server_id
+                loads[server_id] += 1
+
+        # refinement: move a node where most of its links go, or to a less loaded server
+        # when this does not add links between servers
+        for _ in range(max_passes):
+            moved = False
+            for node_id in self._nodes:
+                if node_id in fixed:
+                    continue
+                current = result[node_id]
+                weights = {}
+                for neighbor in adjacency[node_id].values():
+                    weights[result[neighbor]] = weights.get(result[neighbor], 0) + 1
+                best = current
+                best_key = (0, 0)
+                for server_id in server_ids:
+                    if server_id == current or room(server_id) <= 0:
+                        continue
+                    gain = weights.get(server_id, 0) - weights.get(current, 0)
+                    balance = loads[current] - loads[server_id] - 1
+                    key = (gain, balance)
+                    if (gain > 0 or (gain == 0 and balance > 0)) and key > best_key:
+                        best = server_id
+                        best_key = key
+                if best != current:
+                    result[node_id] = best
+                    loads[current] -= 1
+                    loads[best] += 1
+                    moved = True
+            if not moved:
+                break
+
+        return OrderedDict((node_id, result[node_id]) for node_id in self._nodes)
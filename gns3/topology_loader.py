@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Topology load scheduler (can be used with ProgressDialog).
+"""
+
+import collections
+import time
+from .qt import QtCore
+from .modules.module_error import ModuleError
+
+import logging
+log = logging.getLogger(__name__)
+
+# default number of nodes being created at the same time on each server
+DEFAULT_LOAD_WINDOW = 8
+
+# seconds to wait for a node or a link to be created, longer than the request
+# timeout of WebSocketClient so that the error of the server is reported first
+DEFAULT_CREATE_TIMEOUT = 150
+
+
+class TopologyLoader(QtCore.QObject):
+    """
+    Creates the nodes of a topology on all their servers concurrently,
+    with at most a window of nodes being created on each server.
+    Links are created by the topology as soon as both of their nodes
+    exist, the loader waits for them too.
+
+    Node representations are read from the iterable only when they can be
+    sent, so a topology file can be streamed while it is being loaded.
+
+    :param topology: Topology instance
+    :param topology_nodes: iterable of node representations to load
+    :param servers: dictionary (server ID in the topology -> WebSocketClient instance)
+    :param node_count: number of nodes in the topology
+    :param link_count: number of links in the topology
+    :param window: maximum number of nodes being created on a server
+    :param timeout: seconds to wait for a node or a link to be created
+    """
+
+    # signals to update the progress dialog.
+    error = QtCore.Signal(str, bool)
+    completed = QtCore.Signal()
+    update = QtCore.Signal(int)
+
+    # signal emitted once all the callbacks have completed, even after a cancellation
+    settled = QtCore.Signal()
+
+    def __init__(self, topology, topology_nodes, servers, node_count, link_count=0, window=DEFAULT_LOAD_WINDOW,
+                 timeout=DEFAULT_CREATE_TIMEOUT):
+
+        QtCore.QObject.__init__(self)
+        self._topology = topology
+        self._topology_nodes = iter(topology_nodes)
+        self._servers = servers
+        self._window = max(1, window)
+        self._total = node_count + link_count
+        self._done = 0
+        self._progress = -1
+        self._canceled = False
+        self._settled = False
+        self._dispatching = False
+        self._node_ids = set()
+
+        # nodes read but waiting for their server to be ready for more, per server
+        self._queues = collections.OrderedDict()
+        self._queued_count = 0
+        self._in_flight_count = collections.defaultdict(int)
+
+        # nodes and links being created (ID -> instance)
+        self._nodes = {}
+        self._node_servers = {}
+        self._links = {}
+
+        # creation deadlines, in the order they have been set: (kind, ID) -> time.monotonic() value
+        self._timeout = timeout
+        self._deadlines = collections.OrderedDict()
+        self._deadline_timer = QtCore.QTimer(self)
+        self._deadline_timer.setSingleShot(True)
+        self._deadline_timer.timeout.connect(self._deadlineSlot)
+
+    def start(self):
+        """
+        Starts loading once the event loop is running.
+        """
+
+        QtCore.QTimer.singleShot(0, self._dispatch)
+
+    def stop(self):
+        """
+        Cancels the load. Nothing new is sent to the servers and
+        the nodes and links already being created are not waited for.
+        """
+
+        if self._settled:
+            return
+        log.info("topology load canceled")
+        self._canceled = True
+        self._queues.clear()
+        self._queued_count = 0
+        self._closeTopologyNodes()
+        for node_id in list(self._node_servers):
+            self._forgetNode(node_id)
+        for link_id in list(self._links):
+            self._forgetLink(link_id)
+        self._checkSettled()
+
+    def trackLink(self, link):
+        """
+        Waits for a link created by the topology during the load.
+
+        :param link: Link instance
+        """
+
+        self._links[link.id()] = link
+        self._setDeadline(("link", link.id()))
+        link.add_link_signal.connect(self._linkCreatedSlot)
+        link.delete_link_signal.connect(self._linkCreatedSlot)
+
+    def _dispatch(self):
+        """
+        Sends node creations to each server, up to the window size.
+        """
+
+        if self._dispatching:
+            # a node failed while being sent, the running dispatch goes on
+            return
+        self._dispatching = True
+        try:
+            self._dispatchNodes()
+        finally:
+            self._dispatching = False
+        self._checkSettled()
+
+    def _dispatchNodes(self):
+        """
+        Sends the waiting nodes, then reads more nodes.
+        """
+
+        # first the nodes waiting for their server
+        for server, queue in self._queues.items():
+            while queue and self._in_flight_count[server] < self._window and not self._canceled:
+                self._queued_count -= 1
+                self._loadNode(queue.popleft(), server)
+
+        # then read more nodes, without keeping more than a window of them waiting
+        while self._topology_nodes is not None and self._queued_count < self._window and not self._canceled:
+            topology_node = self._nextTopologyNode()
+            if topology_node is None:
+                break
+            if topology_node["id"] in self._node_ids:
+                self.error.emit("Duplicated node ID {} for {}".format(topology_node["id"], topology_node["description"]), False)
+                self._progressed()
+                continue
+            self._node_ids.add(topology_node["id"])
+            server = self._servers.get(topology_node["server_id"])
+            if server is None:
+                self.error.emit("No server reference for node ID {}".format(topology_node["id"]), False)
+                self._progressed()
+                continue
+            if self._in_flight_count[server] < self._window:
+                self._loadNode(topology_node, server)
+            else:
+                self._queues.setdefault(server, collections.deque()).append(topology_node)
+                self._queued_count += 1
+
+    def _nextTopologyNode(self):
+        """
+        Reads the next node representation.
+
+        :returns: node representation or None when there are no more nodes
+        """
+
+        try:
+            return next(self._topology_nodes)
+        except StopIteration:
+            pass
+        except (OSError, ValueError) as e:
+            self.error.emit("Could not read the topology: {}".format(e), True)
+        self._closeTopologyNodes()
+        return None
+
+    def _closeTopologyNodes(self):
+        """
+        Stops reading node representations.
+        """
+
+        if self._topology_nodes is not None and hasattr(self._topology_nodes, "close"):
+            # closes the file of a streamed topology
+            self._topology_nodes.close()
+        self._topology_nodes = None
+
+    def _loadNode(self, topology_node, server):
+        """
+        Creates a node and waits for it.
+
+        :param topology_node: node representation
+        :param server: WebSocketClient instance
+        """
+
+        try:
+            node = self._topology.loadNode(topology_node, server)
+        except ModuleError as e:
+            self.error.emit(str(e), False)
+            self._progressed()
+            return
+        self._nodes[node.id()] = node
+        self._node_servers[node.id()] = server
+        self._in_flight_count[server] += 1
+        self._setDeadline(("node", node.id()))
+        node.created_signal.connect(self._nodeCreatedSlot)
+        node.error_signal.connect(self._nodeErrorSlot)
+        node.server_error_signal.connect(self._nodeServerErrorSlot)
+        if not server.connected() and not server.connecting():
+            # send_message() did not send the creation, the error
+            # reported later through its callback is ignored.
+            self._nodeFailed(node.id(), "connection with server {}:{} is down".format(server.host, server.port))
+
+    def _nodeCreatedSlot(self, node_id):
+        """
+        Slot called when a node has been created.
+
+        :param node_id: node identifier
+        """
+
+        self._nodeDone(node_id)
+
+    def _nodeErrorSlot(self, node_id, message):
+        """
+        Slot called when a node could not be created.
+
+        :param node_id: node identifier
+        :param message: error message
+        """
+
+        self._nodeFailed(node_id, message)
+
+    def _nodeServerErrorSlot(self, node_id, code, message):
+        """
+        Slot called when a server reports an error for a node.
+
+        :param node_id: node identifier
+        :param code: error code
+        :param message: error message
+        """
+
+        self._nodeFailed(node_id, message)
+
+    def _nodeFailed(self, node_id, message):
+        """
+        Handles an error reported by a node during the load.
+
+        :param node_id: node identifier
+        :param message: error message
+        """
+
+        node = self._nodes.get(node_id)
+        if node is None:
+            return
+        if node_id not in self._node_servers and not node.initialized():
+            # the creation of this node has already failed
+            return
+        self.error.emit("{}: {}".format(node.name(), message), False)
+
+        # the links of this node will not complete
+        for link in self._topology.nodeLinks(node):
+            self._linkCreatedSlot(link.id())
+
+        if node_id in self._node_servers:
+            self._nodeDone(node_id)
+
+    def _nodeDone(self, node_id):
+        """
+        Records a node that does not wait for a callback any more.
+
+        :param node_id: node identifier
+        """
+
+        if not self._forgetNode(node_id):
+            return
+        self._progressed()
+        if self._canceled:
+            self._checkSettled()
+        else:
+            self._dispatch()
+
+    def _linkCreatedSlot(self, link_id):
+        """
+        Slot called when a link has been created (or deleted).
+
+        :param link_id: link identifier
+        """
+
+        if not self._forgetLink(link_id):
+            return
+        self._progressed()
+        self._checkSettled()
+
+    def _forgetNode(self, node_id):
+        """
+        Stops waiting for a node to be created.
+
+        :param node_id: node identifier
+
+        :returns: False if the node was not being created
+        """
+
+        server = self._node_servers.pop(node_id, None)
+        if server is None:
+            return False
+        self._nodes[node_id].created_signal.disconnect(self._nodeCreatedSlot)
+        self._in_flight_count[server] -= 1
+        self._deadlines.pop(("node", node_id), None)
+        return True
+
+    def _forgetLink(self, link_id):
+        """
+        Stops waiting for a link to be created.
+
+        :param link_id: link identifier
+
+        :returns: False if the link was not being created
+        """
+
+        link = self._links.pop(link_id, None)
+        if link is None:
+            return False
+        link.add_link_signal.disconnect(self._linkCreatedSlot)
+        link.delete_link_signal.disconnect(self._linkCreatedSlot)
+        self._deadlines.pop(("link", link_id), None)
+        return True
+
+    def _setDeadline(self, key):
+        """
+        Starts the creation timeout of a node or a link.
+
+        :param key: ("node", node ID) or ("link", link ID)
+        """
+
+        self._deadlines.pop(key, None)
+        self._deadlines[key] = time.monotonic() + self._timeout
+        if not self._deadline_timer.isActive():
+            self._deadline_timer.start(self._timeout * 1000)
+
+    def _deadlineSlot(self):
+        """
+        Slot called when the earliest creation deadline is reached,
+        the nodes and links that are not created in time have failed.
+        """
+
+        now = time.monotonic()
+        expired = []
+        for key, deadline in self._deadlines.items():
+            if deadline > now:
+                break
+            expired.append(key)
+
+        for kind, item_id in expired:
+            if kind == "node":
+                self._nodeFailed(item_id, "not created after {} seconds".format(self._timeout))
+            elif item_id in self._links:
+                link = self._links[item_id]
+                self.error.emit("Link {} not created after {} seconds".format(link.description(), self._timeout), False)
+                self._linkCreatedSlot(item_id)
+
+        if self._deadlines:
+            # deadlines are set in order, the first one is the earliest
+            delay = max(0, next(iter(self._deadlines.values())) - time.monotonic())
+            self._deadline_timer.start(int(delay * 1000) + 1)
+
+    def _progressed(self):
+        """
+        Counts one more node or link and updates the progress.
+        """
+
+        self._done += 1
+        if self._total:
+            progress = min(100, self._done * 100 // self._total)
+            if progress != self._progress:
+                self._progress = progress
+                self.update.emit(progress)
+
+    def _checkSettled(self):
+        """
+        Finishes the load once nothing is queued or being created.
+        """
+
+        if self._settled or self._node_servers or self._links:
+            return
+        if self._queued_count or self._topology_nodes is not None:
+            return
+
+        self._settled = True
+        self._deadline_timer.stop()
+        self._deadlines.clear()
+        for node in self._nodes.values():
+            node.error_signal.disconnect(self._nodeErrorSlot)
+            node.server_error_signal.disconnect(self._nodeServerErrorSlot)
+        self._nodes.clear()
+        log.info("topology load {}".format("canceled" if self._canceled else "completed"))
+        self.settled.emit()
+        if not self._canceled:
+            self.completed.emit()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Synthetic topologies and server messages, used by the tests and the benchmarks.
+"""
+
+import base64
+import os
+
+from . import jsonrpc
+
+BASE_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ios_base_startup-config.txt")
+
+
+def generateTopology(node_count):
+    """
+    Builds a synthetic topology with VPCS devices connected in a chain.
+
+    :param node_count: number of nodes
+
+    :returns: topology representation
+    """
+
+    nodes = []
+    links = []
+    for node_id in range(1, node_count + 1):
+        nodes.append({"id": node_id,
+                      "type": "VPCSDevice",
+                      "description": "VPCS device",
+                      "server_id": 1,
+                      "x": node_id * 10.5,
+                      "y": -node_id * 3.25,
+                      "properties": {"name": "PC{}".format(node_id),
+                                     "console": 4000 + node_id,
+                                     "script_file": "/tmp/startup-{}.vpc".format(node_id)},
+                      "ports": [{"id": node_id * 2 + port_number,
+                                 "name": "Ethernet{}".format(port_number),
+                                 "port_number": port_number,
+                                 "link_id": node_id} for port_number in range(2)]})
+        if node_id > 1:
+            links.append({"id": node_id,
+                          "description": "Link from PC{} port Ethernet1 to PC{} port Ethernet0".format(node_id - 1, node_id),
+                          "source_node_id": node_id - 1,
+                          "source_port_id": (node_id - 1) * 2 + 1,
+                          "destination_node_id": node_id,
+                          "destination_port_id": node_id * 2})
+
+    return {"version": "1.0",
+            "type": "topology",
+            "topology": {"nodes": nodes,
+                         "links": links,
+                         "servers": [{"id": 1, "host": "127.0.0.1", "port": 8000, "local": True}]}}
+
+
+def frameSize(payload_length):
+    """
+    Returns the size of a masked client frame carrying a payload.
+
+    :param payload_length: size of the payload
+
+    :returns: frame size in bytes
+    """
+
+    if payload_length < 126:
+        return 2 + 4 + payload_length
+    if payload_length < 65536:
+        return 4 + 4 + payload_length
+    return 10 + 4 + payload_length
+
+
+def routerTopologyMessages(count):
+    """
+    Returns the JSON-RPC messages sent to create and configure a topology of routers.
+
+    :param count: number of routers
+
+    :returns: list of encoded messages (bytes)
+    """
+
+    with open(BASE_CONFIG_PATH) as f:
+        base_config = f.read()
+
+    messages = []
+    for router_id in range(1, count + 1):
+        name = "R{}".format(router_id)
+        messages.append(jsonrpc.JSONRPCRequest("dynamips.vm.create", {"name": name,
+                                                                     "platform": "c7200",
+                                                                     "image": "/home/user/GNS3/images/c7200-adventerprisek9-mz.124-24.T5.image",
+                                                                     "ram": 256}))
+        config = base_config.replace("%h", name)
+        for interface in range(4):
+            config += "interface FastEthernet{}/0\n ip address 10.{}.{}.1 255.255.255.0\n no shutdown\n!\n".format(interface,
+                                                                                                                router_id % 256,
+                                                                                                                interface)
+        config += "router ospf 1\n router-id {}.{}.{}.{}\n network 10.0.0.0 0.255.255.255 area 0\n!\n".format(router_id, router_id, router_id, router_id)
+        messages.append(jsonrpc.JSONRPCRequest("dynamips.vm.update", {"id": router_id,
+                                                                     "startup_config_base64": base64.b64encode(config.encode("utf-8")).decode("ascii"),
+                                                                     "idlepc": "0x606e0538",
+                                                                     "mmap": True}))
+        messages.append(jsonrpc.JSONRPCRequest("dynamips.vm.slot_add_binding", {"id": router_id, "slot": 1, "adapter": "PA-FE-TX"}))
+        messages.append(jsonrpc.JSONRPCRequest("dynamips.vm.add_nio", {"id": router_id,
+                                                                      "slot": 0,
+                                                                      "port": 0,
+                                                                      "port_id": router_id,
+                                                                      "nio": {"type": "nio_udp",
+                                                                              "lport": 10000 + router_id,
+                                                                              "rhost": "127.0.0.1",
+                                                                              "rport": 20000 + router_id}}))
+    return [bytes(message) for message in messages]
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Incremental reader for topology files: the nodes, links and servers
+arrays are parsed one element at a time instead of loading the whole
+JSON document in memory.
+"""
+
+import json
+import re
+from collections import OrderedDict
+
+# size of the blocks read from the file
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# arrays of the topology object that are read element by element
+STREAMED_SECTIONS = ("links", "nodes", "servers")
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NUMBER = re.compile(r"[-+0-9.eE]*")
+
+
+class TopologyStreamError(ValueError):
+    """
+    Invalid or truncated topology file.
+    """
+
+    pass
+
+
+class _Scanner(object):
+    """
+    Reads JSON tokens and values from a text file, keeping only
+    the part of the file that has not been parsed yet in memory.
+
+    :param f: file object (text mode)
+    :param chunk_size: size of the blocks read from the file
+    """
+
+    def __init__(self, f, chunk_size):
+
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._offset = 0
+        self._eof = False
+
+    def _fill(self):
+        """
+        Reads the next block from the file.
+
+        :returns: False at the end of the file
+        """
+
+        if self._eof:
+            return False
+        data = self._file.read(self._chunk_size)
+        if not data:
+            self._eof = True
+            return False
+        # drop what has already been parsed
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def _error(self, message):
+        """
+        Builds an error for the current position.
+
+        :param message: error message
+        """
+
+        return TopologyStreamError("{} at character {}".format(message, self._offset + self._pos))
+
+    def peek(self):
+        """
+        Skips white spaces and returns the next character.
+
+        :returns: character or an empty string at the end of the file
+        """
+
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        """
+        Consumes a structural character.
+
+        :param char: expected character
+        """
+
+        if self.peek() != char:
+            raise self._error("expected '{}'".format(char))
+        self._pos += 1
+
+    def value(self):
+        """
+        Parses a complete JSON value.
+
+        :returns: decoded value
+        """
+
+        if not self.peek():
+            raise self._error("unexpected end of file")
+        while True:
+            if NUMBER.match(self._buffer, self._pos).end() == len(self._buffer) and self._fill():
+                # a number could be cut at the end of the block
+                continue
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError as e:
+                # the value may continue in the next block
+                if self._fill():
+                    continue
+                raise self._error("invalid value ({})".format(e))
+            self._pos = end
+            return value
+
+    def members(self):
+        """
+        Iterates over the keys of an object, the caller
+        must consume the value of each key.
+        """
+
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self._error("expected a key")
+            key = self.value()
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                self._pos -= 1
+                raise self._error("expected ',' or '}'")
+
+    def elements(self):
+        """
+        Iterates over the values of an array.
+        """
+
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self._pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                self._pos -= 1
+                raise self._error("expected ',' or ']'")
+
+    def end(self):
+        """
+        Checks nothing follows the document.
+        """
+
+        if self.peek():
+            raise self._error("extra data")
+
+
+def iterTopology(f, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Parses a topology file incrementally.
+
+    Yields (path, value) tuples: "topology.nodes", "topology.links"
+    and "topology.servers" for each element of these arrays, ("topology", None)
+    when the topology object starts and the key for any other top level value.
+
+    :param f: file object (text mode)
+    :param chunk_size: size of the blocks read from the file
+    """
+
+    scanner = _Scanner(f, chunk_size)
+    for key in scanner.members():
+        if key == "topology" and scanner.peek() == "{":
+            yield key, None
+            for section in scanner.members():
+                path = "topology.{}".format(section)
+                if section in STREAMED_SECTIONS and scanner.peek() == "[":
+                    for element in scanner.elements():
+                        yield path, element
+                else:
+                    yield path, scanner.value()
+        else:
+            yield key, scanner.value()
+    scanner.end()
+
+
+class TopologyFile(object):
+    """
+    Topology file read in two passes: the first one keeps the servers
+    and links and counts the nodes, the second one streams the nodes.
+
+    :param path: path to the topology file
+    :param chunk_size: size of the blocks read from the file
+    """
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+
+        self._path = path
+        self._chunk_size = chunk_size
+        self._is_topology = False
+        self._properties = {}
+        self._servers = []
+        self._links = []
+        self._node_count = 0
+        self._node_placement = OrderedDict()
+
+    def scan(self, node_placement=False):
+        """
+        Reads everything but the nodes.
+
+        :param node_placement: also keep the server and type of each node
+        """
+
+        self._is_topology = False
+        self._properties = {}
+        self._servers = []
+        self._links = []
+        self._node_count = 0
+        self._node_placement = OrderedDict()
+        with open(self._path, "r") as f:
+            for path, value in iterTopology(f, self._chunk_size):
+                if path == "topology":
+                    self._is_topology = True
+                elif path == "topology.nodes":
+                    self._node_count += 1
+                    if node_placement:
+                        self._node_placement[value.get("id")] = (value.get("server_id"), value.get("type"))
+                elif path == "topology.links":
+                    self._links.append(value)
+                elif path == "topology.servers":
+                    self._servers.append(value)
+                elif not path.startswith("topology."):
+                    self._properties[path] = value
+
+    def isTopology(self):
+        """
+        Returns if the file contains a topology.
+
+        :returns: True or False
+        """
+
+        return self._is_topology
+
+    def properties(self):
+        """
+        Returns the top level values (version, type...).
+
+        :returns: dictionary
+        """
+
+        return self._properties
+
+    def servers(self):
+        """
+        Returns the servers.
+
+        :returns: list of server representations
+        """
+
+        return self._servers
+
+    def links(self):
+        """
+        Returns the links.
+
+        :returns: list of link representations
+        """
+
+        return self._links
+
+    def nodeCount(self):
+        """
+        Returns the number of nodes.
+
+        :returns: integer
+        """
+
+        return self._node_count
+
+    def nodePlacement(self):
+        """
+        Returns the server and type of each node, if
+        they have been kept by the scan.
+
+        :returns: dictionary (node ID -> tuple (server ID, node type))
+        """
+
+        return self._node_placement
+
+    def nodes(self):
+        """
+        Reads the nodes one by one.
+        """
+
+        with open(self._path, "r") as f:
+            for path, value in iterTopology(f, self._chunk_size):
+                if path == "topology.nodes":
+                    yield value
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Asynchronous connection to a GNS3 server (can be used with ProgressDialog).
+"""
+
+from ..qt import QtCore
+
+
+class ConnectToServer(QtCore.QObject):
+    """
+    Connects to a server without blocking the event loop.
+
+    :param server: WebSocketClient instance
+    """
+
+    # signals to update the progress dialog.
+    error = QtCore.Signal(str, bool)
+    completed = QtCore.Signal()
+    update = QtCore.Signal(int)
+
+    def __init__(self, server):
+
+        QtCore.QObject.__init__(self)
+        self._server = server
+
+    def start(self):
+        """
+        Starts the connection once the event loop is running.
+        """
+
+        self._server.connected_signal.connect(self._connectedSlot)
+        self._server.connection_error_signal.connect(self._connectionErrorSlot)
+        QtCore.QTimer.singleShot(0, self._connect)
+
+    def _connect(self):
+        """
+        Connects to the server.
+        """
+
+        if self._server.connected():
+            self._connectedSlot()
+            return
+
+        try:
+            self._server.reconnect()
+        except OSError as e:
+            self._disconnectSignals()
+            self.error.emit("Could not connect to {} on port {}: {}".format(self._server.host,
+                                                                            self._server.port,
+                                                                            e), True)
+
+    def _connectedSlot(self):
+        """
+        Slot called when the server is connected.
+        """
+
+        self._disconnectSignals()
+        self.completed.emit()
+
+    def _connectionErrorSlot(self, message, error_code):
+        """
+        Slot called when the connection has failed.
+
+        :param message: error message
+        :param error_code: errno value
+        """
+
+        self._disconnectSignals()
+        self.error.emit("Could not connect to {} on port {}: {}".format(self._server.host,
+                                                                        self._server.port,
+                                                                        message), True)
+
+    def _disconnectSignals(self):
+        """
+        Stops listening to the server signals.
+        """
+
+        try:
+            self._server.connected_signal.disconnect(self._connectedSlot)
+            self._server.connection_error_signal.disconnect(self._connectionErrorSlot)
+        except TypeError:
+            # already disconnected
+            pass
+
+    def stop(self):
+        """
+        Cancels the connection attempt.
+        """
+
+        self._disconnectSignals()
+        if self._server.connecting():
+            self._server.close_connection()
@@ -19,14 +19,15 @@
 Progress dialog that blocking tasks (file operations, network connections etc.)
 """
 
-from ..qt import QtGui
+from ..qt import QtCore, QtGui
 
 
 class ProgressDialog(QtGui.QProgressDialog):
     """
     Progress dialog implementation with thread support.
 
-    :param thread: thread to run
+    :param thread: thread to run (or any object with the same signals
+    and start()/stop() methods running asynchronously in the event loop)
     :param title: window title
     :param label_text: text to describe the progress bar
     :param cancel_button_text: text for the cancel button
@@ -70,7 +71,8 @@ class ProgressDialog(QtGui.QProgressDialog):
         Slot to close this dialog when the thread is finished.
         """
 
-        self._thread.wait()
+        if isinstance(self._thread, QtCore.QThread):
+            self._thread.wait()
         QtGui.QProgressDialog.accept(self)
 
     def _error(self, message, stop=False):
@@ -101,7 +103,7 @@ class ProgressDialog(QtGui.QProgressDialog):
         """
 
         self._thread.stop()
-        if not self._thread.wait(5000):
+        if isinstance(self._thread, QtCore.QThread) and not self._thread.wait(5000):
             self._thread.terminate()
             self._thread.wait()
         QtGui.QProgressDialog.cancel(self)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Thread to write a project file without blocking the GUI.
+"""
+
+from ..qt import QtCore
+from ..project_file import writeProjectFile
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class SaveProjectThread(QtCore.QThread):
+    """
+    Thread to serialize and write a topology snapshot.
+
+    :param path: path to the project file
+    :param topology: topology representation, owned by this thread
+    :param binary: use the binary format instead of JSON
+    """
+
+    error = QtCore.Signal(str, bool)
+    completed = QtCore.Signal()
+
+    def __init__(self, path, topology, binary=False):
+
+        QtCore.QThread.__init__(self)
+        self._path = path
+        self._topology = topology
+        self._binary = binary
+        self._saved = False
+        self._error_message = None
+
+    def path(self):
+        """
+        Returns the path to the project file.
+
+        :returns: path
+        """
+
+        return self._path
+
+    def topology(self):
+        """
+        Returns the topology snapshot being saved.
+
+        :returns: topology representation
+        """
+
+        return self._topology
+
+    def succeeded(self):
+        """
+        Returns if the project file has been written.
+
+        :returns: True or False
+        """
+
+        return self._saved
+
+    def errorMessage(self):
+        """
+        Returns why the project file could not be written.
+
+        :returns: error message or None
+        """
+
+        return self._error_message
+
+    def run(self):
+        """
+        Thread starting point.
+        """
+
+        try:
+            writeProjectFile(self._path, self._topology, self._binary)
+        except (OSError, ValueError, TypeError) as e:
+            log.error("could not save project to {}: {}".format(self._path, e))
+            self._error_message = "Could not save project to {}: {}".format(self._path, e)
+            self.error.emit(self._error_message, True)
+            return
+        log.info("project saved to {}".format(self._path))
+        self._saved = True
+        self.completed.emit()
+
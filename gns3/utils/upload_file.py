@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Streamed file upload to a server using binary WebSocket messages
+(can be used with ProgressDialog).
+"""
+
+import itertools
+import os
+
+from ..qt import QtCore
+from ..websocket_client import WebSocketClient
+from ..binary_transfer import BINARY_PROTOCOL, DEFAULT_CHUNK_SIZE, DEFAULT_WINDOW, MESSAGE_ACK, BinaryTransferError, FlowControl, \
+    decodeAck, encodeChunk
+from .progress_dialog import ProgressDialog
+
+import logging
+log = logging.getLogger(__name__)
+
+_transfer_ids = itertools.count(1)
+
+# uploads in progress (transfer ID -> UploadFile instance)
+_uploads = {}
+
+
+def _uploadNotification(method, params):
+    """
+    Dispatches the "upload.*" notifications sent by the servers.
+
+    :param method: JSON-RPC method
+    :param params: JSON-RPC params
+    """
+
+    upload = _uploads.get(params.get("transfer_id"))
+    if upload is None:
+        log.warning("{} received for unknown transfer {}".format(method, params.get("transfer_id")))
+        return
+    if method == "upload.ack":
+        upload.acknowledge(params.get("offset", 0))
+    elif method == "upload.error":
+        upload.fail(params.get("message", "unknown error"))
+
+
+
+def _uploadAck(message):
+    """
+    Dispatches the binary acknowledgments sent by the servers.
+
+    :param message: binary message (bytes)
+    """
+
+    try:
+        transfer_id, offset = decodeAck(message)
+    except BinaryTransferError as e:
+        log.warning("invalid binary acknowledgment: {}".format(e))
+        return
+    upload = _uploads.get(transfer_id)
+    if upload is None:
+        log.warning("acknowledgment received for unknown transfer {}".format(transfer_id))
+        return
+    upload.acknowledge(offset)
+
+WebSocketClient.registerNotificationHandler("upload", _uploadNotification)
+WebSocketClient.registerBinaryHandler(MESSAGE_ACK, _uploadAck)
+
+
+class UploadFile(QtCore.QObject):
+    """
+    Uploads a file to a server without loading it in memory.
+
+    :param server: WebSocketClient instance
+    :param path: path of the local file
+    :param destination: where the server must store the file (e.g. "configs/R1.cfg")
+    :param chunk_size: size of the binary messages
+    :param window: maximum number of bytes sent and not yet acknowledged
+    """
+
+    # signals to update the progress dialog.
+    error = QtCore.Signal(str, bool)
+    completed = QtCore.Signal()
+    update = QtCore.Signal(int)
+
+    def __init__(self, server, path, destination, chunk_size=DEFAULT_CHUNK_SIZE, window=DEFAULT_WINDOW):
+
+        QtCore.QObject.__init__(self)
+        self._server = server
+        self._path = path
+        self._destination = destination
+        self._chunk_size = chunk_size
+        self._window = window
+        self._transfer_id = next(_transfer_ids)
+        self._file = None
+        self._flow_control = None
+        self._request_id = None
+        self._progress = -1
+        self._stopped = False
+        self._server_path = None
+
+    @staticmethod
+    def supported(server):
+        """
+        Returns if a server accepts binary uploads.
+
+        :param server: WebSocketClient instance
+
+        :returns: True or False
+        """
+
+        return server.connected() and server.protocol() == BINARY_PROTOCOL
+
+    def path(self):
+        """
+        Returns the path of the local file.
+
+        :returns: path
+        """
+
+        return self._path
+
+    def destination(self):
+        """
+        Returns where the server stores the file.
+
+        :returns: destination
+        """
+
+        return self._destination
+
+    def serverPath(self):
+        """
+        Returns where the server has stored the file,
+        once the upload has completed.
+
+        :returns: path on the server or None
+        """
+
+        return self._server_path
+
+    def start(self):
+        """
+        Starts the upload once the event loop is running.
+        """
+
+        QtCore.QTimer.singleShot(0, self._start)
+
+    def _start(self):
+        """
+        Opens the file and the transfer.
+        """
+
+        if self._stopped:
+            return
+        if not self.supported(self._server):
+            self.error.emit("Server {}:{} does not support binary uploads".format(self._server.host, self._server.port), True)
+            return
+
+        try:
+            self._file = open(self._path, "rb")
+            size = os.fstat(self._file.fileno()).st_size
+        except OSError as e:
+            self.error.emit("Could not read {}: {}".format(self._path, e), True)
+            return
+
+        log.info("uploading {} ({} bytes) to {}:{}".format(self._path, size, self._server.host, self._server.port))
+        self._flow_control = FlowControl(size, self._window)
+        _uploads[self._transfer_id] = self
+        self._request_id = self._server.send_message("upload.start", {"transfer_id": self._transfer_id,
+                                                                      "destination": self._destination,
+                                                                      "size": size}, self._startCallback)
+
+    def _startCallback(self, result, error=False):
+        """
+        Callback for the upload.start request.
+
+        :param result: server response
+        :param error: indicates an error (boolean)
+        """
+
+        self._request_id = None
+        if self._flow_control is None:
+            # stopped or failed before the server replied
+            return
+        if error:
+            self.fail(result["message"])
+            return
+        if self._flow_control.done():
+            # empty file, nothing to send
+            self._finish()
+        else:
+            self._sendChunks()
+
+    def _sendChunks(self):
+        """
+        Sends as many chunks as the window allows.
+        """
+
+        flow_control = self._flow_control
+        try:
+            while flow_control.available():
+                data = self._file.read(min(self._chunk_size, flow_control.available()))
+                if not data:
+                    raise OSError("{} has been truncated".format(self._path))
+                self._server.send_binary(encodeChunk(self._transfer_id, flow_control.sentBytes(), data))
+                flow_control.recordSent(len(data))
+        except (OSError, RuntimeError) as e:
+            self.fail("Could not upload {}: {}".format(self._path, e))
+
+    def acknowledge(self, offset):
+        """
+        Called when the server has written data.
+
+        :param offset: number of bytes written by the server
+        """
+
+        if self._flow_control is None:
+            return
+        try:
+            if not self._flow_control.acknowledge(offset):
+                return
+        except BinaryTransferError as e:
+            self.fail(str(e))
+            return
+
+        progress = self._flow_control.progress()
+        if progress != self._progress:
+            self._progress = progress
+            self.update.emit(progress)
+
+        if self._flow_control.done():
+            self._finish()
+        else:
+            self._sendChunks()
+
+    def _finish(self):
+        """
+        Closes the transfer once all the data has been acknowledged.
+        """
+
+        self._cleanup()
+        self._server.send_message("upload.finish", {"transfer_id": self._transfer_id}, self._finishCallback)
+
+    def _finishCallback(self, result, error=False):
+        """
+        Callback for the upload.finish request.
+
+        :param result: server response
+        :param error: indicates an error (boolean)
+        """
+
+        if self._stopped:
+            return
+        if error:
+            self.error.emit("Could not upload {}: {}".format(self._path, result["message"]), True)
+            return
+        self._server_path = self._destination
+        if isinstance(result, dict) and "path" in result:
+            self._server_path = result["path"]
+        log.info("{} uploaded to {}:{} as {}".format(self._path, self._server.host, self._server.port, self._server_path))
+        self.completed.emit()
+
+    def fail(self, message):
+        """
+        Aborts the upload with an error.
+
+        :param message: error message
+        """
+
+        if self._flow_control is None:
+            return
+        log.error("upload of {} to {}:{} failed: {}".format(self._path, self._server.host, self._server.port, message))
+        self._cleanup()
+        self.error.emit(message, True)
+
+    def stop(self):
+        """
+        Cancels the upload.
+        """
+
+        self._stopped = True
+        if self._flow_control is None:
+            return
+        if self._request_id is not None:
+            # the server has not replied to upload.start yet
+            self._server.cancel_message(self._request_id)
+            self._request_id = None
+        if self._server.connected():
+            self._server.send_notification("upload.cancel", {"transfer_id": self._transfer_id})
+        self._cleanup()
+
+    def _cleanup(self):
+        """
+        Closes the file and forgets the transfer.
+        """
+
+        _uploads.pop(self._transfer_id, None)
+        self._flow_control = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def uploadImage(server, path, parent=None):
+    """
+    Uploads an image to a server, showing the progress.
+
+    :param server: WebSocketClient instance
+    :param path: path of the local image
+    :param parent: parent widget
+
+    :returns: path of the image on the server or None if it has not been uploaded
+    """
+
+    image = os.path.basename(path)
+    upload = UploadFile(server, path, "images/{}".format(image))
+    progress_dialog = ProgressDialog(upload,
+                                     "Image upload",
+                                     "Uploading {} to server {}:{}...".format(image, server.host, server.port),
+                                     "Cancel", parent=parent)
+    progress_dialog.show()
+    if progress_dialog.exec_() == False:
+        return None
+    return upload.serverPath()
+
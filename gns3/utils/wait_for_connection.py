@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Waits for a network resource to accept connections without blocking
+the event loop (can be used with ProgressDialog).
+"""
+
+import errno
+import os
+import socket
+import sys
+import time
+from ..qt import QtCore
+from ..websocket_client import CONNECT_IN_PROGRESS
+
+import logging
+log = logging.getLogger(__name__)
+
+# delays between two connection attempts in seconds, doubled after each failure
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+
+# maximum duration of a single connection attempt in seconds
+ATTEMPT_TIMEOUT = 2
+
+
+class WaitForConnection(QtCore.QObject):
+    """
+    Waits for a connection to be accepted. Each attempt is a non-blocking
+    connect monitored by a QSocketNotifier, failed attempts are retried
+    with an exponential backoff.
+
+    :param host: destination host or IP address
+    :param port: destination port
+    :param timeout: time to wait in seconds
+    :param ready_signal: optional signal emitted when the destination is
+    known to be ready (e.g. by the local server output), a connection is
+    attempted right away.
+    """
+
+    # signals to update the progress dialog.
+    error = QtCore.Signal(str, bool)
+    completed = QtCore.Signal()
+    update = QtCore.Signal(int)
+
+    def __init__(self, host, port, timeout=30, ready_signal=None):
+
+        QtCore.QObject.__init__(self)
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._ready_signal = ready_signal
+        self._sock = None
+        self._notifier = None
+        self._deadline = 0
+        self._delay = RETRY_BASE_DELAY
+        self._last_error = None
+
+        self._retry_timer = QtCore.QTimer(self)
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.timeout.connect(self._attempt)
+        self._attempt_timer = QtCore.QTimer(self)
+        self._attempt_timer.setSingleShot(True)
+        self._attempt_timer.timeout.connect(self._attemptTimeoutSlot)
+
+    def start(self):
+        """
+        Starts waiting once the event loop is running.
+        """
+
+        self._deadline = time.monotonic() + self._timeout
+        self._delay = RETRY_BASE_DELAY
+        if self._ready_signal is not None:
+            self._ready_signal.connect(self._readySlot)
+        self._retry_timer.start(0)
+
+    def stop(self):
+        """
+        Stops waiting.
+        """
+
+        self._retry_timer.stop()
+        self._closeSocket()
+        if self._ready_signal is not None:
+            try:
+                self._ready_signal.disconnect(self._readySlot)
+            except TypeError:
+                # already disconnected
+                pass
+
+    def _closeSocket(self):
+        """
+        Closes the socket of the current attempt.
+        """
+
+        self._attempt_timer.stop()
+        if self._notifier:
+            self._notifier.setEnabled(False)
+            self._notifier = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def _readySlot(self, *args):
+        """
+        Slot called when the destination is ready, skips the retry delay.
+        """
+
+        log.debug("{}:{} is ready".format(self._host, self._port))
+        if self._retry_timer.isActive():
+            self._retry_timer.stop()
+            self._attempt()
+
+    def _attempt(self):
+        """
+        Attempts to connect.
+        """
+
+        try:
+            family, socktype, proto, _, address = socket.getaddrinfo(self._host, self._port, 0, socket.SOCK_STREAM)[0]
+            self._sock = socket.socket(family, socktype, proto)
+            self._sock.setblocking(False)
+            error = self._sock.connect_ex(address)
+        except OSError as e:
+            self._failed(e)
+            return
+
+        if not error:
+            self._connected()
+        elif error in CONNECT_IN_PROGRESS:
+            # the socket becomes writable once the connection is established or has failed
+            self._notifier = QtCore.QSocketNotifier(self._sock.fileno(), QtCore.QSocketNotifier.Write)
+            self._notifier.activated.connect(self._connectSlot)
+            self._attempt_timer.start(ATTEMPT_TIMEOUT * 1000)
+        else:
+            self._failed(OSError(error, os.strerror(error)))
+
+    def _connectSlot(self, fd):
+        """
+        Slot called when the connection attempt has completed (or failed).
+        """
+
+        self._notifier.setEnabled(False)
+        try:
+            if sys.platform.startswith("win"):
+                # a failed connect() is not always reported by SO_ERROR on Windows
+                self._sock.getpeername()
+            error = self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        except OSError as e:
+            self._failed(e)
+            return
+        if error:
+            self._failed(OSError(error, os.strerror(error)))
+        else:
+            self._connected()
+
+    def _attemptTimeoutSlot(self):
+        """
+        Slot called when a connection attempt takes too long.
+        """
+
+        self._failed(OSError(errno.ETIMEDOUT, "connection attempt timed out"))
+
+    def _connected(self):
+        """
+        The connection has been accepted.
+        """
+
+        self.stop()
+        self.completed.emit()
+
+    def _failed(self, error):
+        """
+        A connection attempt has failed, retries unless it is too late.
+
+        :param error: OSError instance
+        """
+
+        self._closeSocket()
+        self._last_error = error
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            self.stop()
+            self.error.emit("Could not connect to {} on port {}: {}".format(self._host,
+                                                                            self._port,
+                                                                            self._last_error), True)
+            return
+        self._retry_timer.start(int(min(self._delay, remaining) * 1000))
+        self._delay = min(self._delay * 2, RETRY_MAX_DELAY)
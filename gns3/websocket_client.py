@@ -20,48 +20,146 @@ Non-blocking Websocket client with JSON-RPC support to connect to GNS3 servers.
 Based on the ws4py websocket client.
 """
 
+import sys
+import collections
+import errno
+import heapq
 import json
+import os
+import select
 import socket
-import urllib.request
+import struct
+import time
+from base64 import b64encode
+from hashlib import sha1
 
 from .version import __version__
 from . import jsonrpc
+from . import permessage_deflate
+from .rpc_statistics import RPCStatistics
+from ws4py import WS_KEY
 from ws4py.client import WebSocketBaseClient
-from .qt import QtCore
+from ws4py.websocket import WebSocket
+from ws4py.exc import HandshakeError
+from ws4py.framing import OPCODE_CONTINUATION, OPCODE_TEXT, OPCODE_BINARY, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG
+from ws4py.messaging import TextMessage, BinaryMessage, PongControlMessage
+from .qt import QtCore, QtNetwork
 
 import logging
 log = logging.getLogger(__name__)
 
+# errors returned by a non-blocking connect() still in progress
+CONNECT_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, "WSAEWOULDBLOCK", 10035))
 
-class WebSocketClient(WebSocketBaseClient):
+# size of the reusable receive buffer
+READ_BUFFER_SIZE = 65536
+
+# errors reported to the callbacks of requests that never got a reply
+REQUEST_TIMEOUT_ERROR = -32001
+CONNECTION_LOST_ERROR = -32002
+
+# actions that can safely be sent again after a reconnection
+IDEMPOTENT_ACTIONS = ("start", "stop", "suspend", "resume", "update")
+
+
+class WebSocketClient(QtCore.QObject, WebSocketBaseClient):
     """
     Websocket client.
 
     :param url: websocket URL to connect to the server
     """
 
+    # signals emitted when an asynchronous connection attempt completes
+    connected_signal = QtCore.Signal()
+    connection_error_signal = QtCore.Signal(str, int)
+
+    # signal emitted when an established connection is lost
+    connection_lost_signal = QtCore.Signal()
+
+    # signal emitted with the payload of a pong received from the server
+    pong_signal = QtCore.Signal(bytes)
+
     _instance_count = 1
 
+    # notification dispatch table: method namespace -> handler
+    _notification_handlers = {}
+
+    # binary message dispatch table: message type (first byte) -> handler
+    _binary_handlers = {}
+
     def __init__(self, url, protocols=None, extensions=None, heartbeat_freq=None,
                  ssl_options=None, headers=None):
 
+        QtCore.QObject.__init__(self)
         WebSocketBaseClient.__init__(self, url, protocols, extensions, heartbeat_freq,
                                      ssl_options, headers=headers)
 
         self.callbacks = {}
+
+        # the address lookup is done once, new sockets are created alike
+        self._socket_family = self.sock.family
+
+        # pending requests: deadlines are kept in a heap, the earliest
+        # one drives a single-shot timer. Entries of requests that have
+        # already been answered are skipped when they reach the top.
+        self._request_timeout = 120
+        self._pending_requests = {}
+        self._request_deadlines = []
+        self._deadline_timer = QtCore.QTimer(self)
+        self._deadline_timer.setSingleShot(True)
+        self._deadline_timer.timeout.connect(self._request_deadlines_slot)
+        self._statistics = RPCStatistics()
+
+        # idempotent requests sent while waiting to be reconnected,
+        # replayed once the connection is back.
+        self._reconnect_pending = False
+        self._replay_requests = collections.OrderedDict()
+        self._closing = False
         self._connected = False
+        self._connecting = False
         self._local = False
         self._version = ""
         self._fd_notifier = None
 
+        # requests and notifications queued during the current
+        # event loop iteration, sent together as one JSON-RPC batch.
+        self._batch = jsonrpc.JSONRPCBatch()
+
+        # asynchronous connection state
+        self._timeout = 10
+        self._connect_notifier = None
+        self._handshake_response = b""
+        self._handshake_body = b""
+        self._version_reply = None
+        self._network_manager = QtNetwork.QNetworkAccessManager(self)
+        self._connect_timer = QtCore.QTimer(self)
+        self._connect_timer.setSingleShot(True)
+        self._connect_timer.timeout.connect(self._connection_timeout_slot)
+
+        # incremental frame reader: data is received into a reusable buffer,
+        # complete frames are decoded and their messages dispatched in order.
+        self._read_buffer = bytearray(READ_BUFFER_SIZE)
+        self._read_view = memoryview(self._read_buffer)
+        self._frame_buffer = bytearray()
+        self._fragments = []
+        self._fragments_opcode = None
+        self._fragments_compressed = False
+        self._received_messages = collections.deque()
+
+        # data the socket could not take yet, sent once it is writable again
+        self._write_buffer = bytearray()
+        self._write_notifier = None
+
+        # permessage-deflate state, if the extension has been negotiated
+        self._deflate = None
+
+        # sub-protocol selected by the server during the handshake
+        self._protocol = None
+
         # create an unique ID
         self._id = WebSocketClient._instance_count
         WebSocketClient._instance_count += 1
 
-        # set a default timeout of 10 seconds
-        # for connecting to a server
-        socket.setdefaulttimeout(10)
-
     def id(self):
         """
         Returns this WebSocket identifier.
@@ -88,6 +186,28 @@ class WebSocketClient(WebSocketBaseClient):
 
         cls._instance_count = 1
 
+    @classmethod
+    def registerNotificationHandler(cls, namespace, handler):
+        """
+        Registers the handler for the notifications of a namespace.
+
+        :param namespace: JSON-RPC method namespace (e.g. "dynamips" for "dynamips.vm.report")
+        :param handler: callable accepting the method and params
+        """
+
+        cls._notification_handlers[namespace] = handler
+
+    @classmethod
+    def registerBinaryHandler(cls, message_type, handler):
+        """
+        Registers the handler for a type of binary messages.
+
+        :param message_type: first byte of the binary messages (integer)
+        :param handler: callable accepting the message (bytes)
+        """
+
+        cls._binary_handlers[message_type] = handler
+
     def setLocal(self, value):
         """
         Sets either this is a connection to a local server or not.
@@ -106,6 +226,95 @@ class WebSocketClient(WebSocketBaseClient):
 
         return self._local
 
+    def timeout(self):
+        """
+        Returns the connection timeout.
+
+        :returns: timeout in seconds (integer)
+        """
+
+        return self._timeout
+
+    def setTimeout(self, timeout):
+        """
+        Sets the connection timeout for this server only.
+
+        :param timeout: timeout in seconds (integer)
+        """
+
+        self._timeout = timeout
+
+    def requestTimeout(self):
+        """
+        Returns the default time to wait for a reply to a request.
+
+        :returns: timeout in seconds (integer)
+        """
+
+        return self._request_timeout
+
+    def setRequestTimeout(self, timeout):
+        """
+        Sets the default time to wait for a reply to a request.
+
+        :param timeout: timeout in seconds (integer)
+        """
+
+        self._request_timeout = timeout
+
+    def pendingRequestCount(self):
+        """
+        Returns the number of requests waiting for a reply.
+
+        :returns: integer
+        """
+
+        return len(self.callbacks)
+
+    def statistics(self):
+        """
+        Returns the JSON-RPC statistics for this server.
+
+        :returns: RPCStatistics instance
+        """
+
+        return self._statistics
+
+    def protocol(self):
+        """
+        Returns the WebSocket sub-protocol selected by the server.
+
+        :returns: protocol name or None
+        """
+
+        return self._protocol
+
+    def reconnectPending(self):
+        """
+        Returns if this server is waiting to be reconnected.
+
+        :returns: True or False
+        """
+
+        return self._reconnect_pending
+
+    def setReconnectPending(self, pending):
+        """
+        Sets if this server is waiting to be reconnected. While it is,
+        idempotent requests are kept to be replayed after the reconnection.
+
+        :param pending: True or False
+        """
+
+        self._reconnect_pending = pending
+        if not pending and self._replay_requests:
+            replay_requests = self._replay_requests
+            self._replay_requests = collections.OrderedDict()
+            message = "could not reconnect to server {}:{}".format(self.host, self.port)
+            log.warning("{}, {} request(s) failed".format(message, len(replay_requests)))
+            for request_id in replay_requests:
+                self._fail_request(request_id, message, CONNECTION_LOST_ERROR)
+
     def opened(self):
         """
         Called when the connection with the server is successful.
@@ -116,49 +325,279 @@ class WebSocketClient(WebSocketBaseClient):
 
     def connect(self):
         """
-        Connects to the server.
+        Connects to the server without blocking.
+
+        The TCP connection, the WebSocket handshake and the version check
+        are all driven by the Qt event loop; connected_signal is emitted
+        on success and connection_error_signal on failure.
         """
 
+        if self._connected or self._connecting:
+            return
+
+        if self.sock is None:
+            # the previous connection has been closed
+            self._reset_socket()
+
+        log.info("connecting to {}:{}".format(self.host, self.port))
+        self._connecting = True
+        self._handshake_response = b""
+        self._handshake_body = b""
+        self._reset_frame_reader()
+        self._reset_write_buffer()
+        self._connect_timer.start(self._timeout * 1000)
+
         try:
-            WebSocketBaseClient.connect(self)
-        except OSError:
-            raise
-        except Exception as e:
-            log.error("could to connect {}: {}".format(self.url, e))
-            raise OSError("Websocket exception {}: {}".format(type(e), e))
+            self.sock.setblocking(False)
+            error = self.sock.connect_ex(self.bind_addr)
+        except OSError as e:
+            self._connection_error("could not connect to {}: {}".format(self.url, e), e.errno or errno.EIO)
+            return
+
+        if error and error not in CONNECT_IN_PROGRESS:
+            self._connection_error("could not connect to {}: {}".format(self.url, os.strerror(error)), error)
+            return
+
+        # the socket becomes writable once the TCP connection is established or has failed
+        self._connect_notifier = QtCore.QSocketNotifier(self.sock.fileno(), QtCore.QSocketNotifier.Write)
+        self._connect_notifier.activated.connect(self._tcp_connected_slot)
+
+    def _reset_socket(self):
+        """
+        Creates a new socket and WebSocket stream to connect again,
+        without looking up the server address again (it may block).
+        """
+
+        sock = socket.socket(self._socket_family, socket.SOCK_STREAM, 0)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        WebSocket.__init__(self, sock, protocols=self.protocols, extensions=self.extensions, heartbeat_freq=self.heartbeat_freq)
+        self.stream.always_mask = True
+        self.stream.expect_masking = False
+        self.key = b64encode(os.urandom(16))
+
+    def _disable_connect_notifier(self):
+        """
+        Stops monitoring the socket for the connection handshake.
+        """
+
+        if self._connect_notifier:
+            self._connect_notifier.setEnabled(False)
+            self._connect_notifier = None
+
+    def _tcp_connected_slot(self, fd):
+        """
+        Slot called when the TCP connection has completed (or failed).
+        Sends the WebSocket upgrade request.
+        """
+
+        self._disable_connect_notifier()
+        if sys.platform.startswith("win"):
+            # a failed connect() is not always reported by SO_ERROR on Windows
+            try:
+                self.sock.getpeername()
+            except OSError as e:
+                self._connection_error("could not connect to {}: {}".format(self.url, e), e.errno or errno.ECONNREFUSED)
+                return
+
+        error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error:
+            self._connection_error("could not connect to {}: {}".format(self.url, os.strerror(error)), error)
+            return
+
+        try:
+            self._write(self.handshake_request)
+        except (OSError, RuntimeError) as e:
+            self._connection_error("could not send the WebSocket handshake to {}: {}".format(self.url, e), e.errno or errno.EIO)
+            return
+
+        self._connect_notifier = QtCore.QSocketNotifier(self.sock.fileno(), QtCore.QSocketNotifier.Read)
+        self._connect_notifier.activated.connect(self._handshake_data_slot)
+
+    def _handshake_data_slot(self, fd):
+        """
+        Slot called when the server replies to the WebSocket upgrade request.
+        """
+
+        try:
+            data = self.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self._connection_error("could not connect to {}: {}".format(self.url, e), e.errno or errno.EIO)
+            return
+
+        if not data:
+            self._connection_error("connection closed by {} during the WebSocket handshake".format(self.url), errno.ECONNRESET)
+            return
+
+        self._handshake_response += data
+        if b"\r\n\r\n" not in self._handshake_response:
+            if len(self._handshake_response) > 65536:
+                self._connection_error("invalid WebSocket handshake response from {}".format(self.url), 0)
+            return
+
+        self._disable_connect_notifier()
+        headers, _, self._handshake_body = self._handshake_response.partition(b"\r\n\r\n")
+        response_line, _, headers = headers.partition(b"\r\n")
+        try:
+            self.process_response_line(response_line)
+            response_headers = self._process_handshake_headers(headers)
+            self._protocol = response_headers.get("sec-websocket-protocol")
+            if self._protocol and self._protocol not in (self.protocols or []):
+                raise HandshakeError("server selected a sub-protocol that was not offered: {}".format(self._protocol))
+            self._deflate = None
+            if permessage_deflate.EXTENSION_NAME in (self.extensions or []):
+                self._deflate = permessage_deflate.negotiate(response_headers.get("sec-websocket-extensions"))
+                if self._deflate is None:
+                    log.info("server {}:{} does not support {}".format(self.host, self.port, permessage_deflate.EXTENSION_NAME))
+            elif "sec-websocket-extensions" in response_headers:
+                raise HandshakeError("server accepted extensions that were not offered: {}".format(response_headers["sec-websocket-extensions"]))
+        except (HandshakeError, ValueError, permessage_deflate.PerMessageDeflateError) as e:
+            self._connection_error("WebSocket handshake with {} failed: {}".format(self.url, e), 0)
+            return
 
         # once connected, get the GNS3 server version (over classic HTTP)
-        url = "http://{host}:{port}/version".format(host=self.host, port=self.port)
-        content = urllib.request.urlopen(url).read()
+        url = QtCore.QUrl("http://{host}:{port}/version".format(host=self.host, port=self.port))
+        self._version_reply = self._network_manager.get(QtNetwork.QNetworkRequest(url))
+        self._version_reply.finished.connect(self._version_received_slot)
+
+    @property
+    def handshake_headers(self):
+        """
+        List of headers for the upgrade handshake, with
+        the permessage-deflate offer if it is enabled.
+        """
+
+        headers = WebSocketBaseClient.handshake_headers.fget(self)
+        if permessage_deflate.EXTENSION_NAME in (self.extensions or []):
+            headers.append(("Sec-WebSocket-Extensions", permessage_deflate.offer()))
+        return headers
+
+    def _process_handshake_headers(self, headers):
+        """
+        Validates the WebSocket handshake response headers.
+
+        :param headers: raw response headers (bytes)
+
+        :returns: headers dictionary (lowercase names)
+        """
+
+        response_headers = {}
+        for header_line in headers.strip().split(b"\r\n"):
+            name, _, value = header_line.partition(b":")
+            response_headers[name.strip().decode("latin-1").lower()] = value.strip().decode("latin-1")
+
+        if response_headers.get("upgrade", "").lower() != "websocket":
+            raise HandshakeError("invalid Upgrade header: {}".format(response_headers.get("upgrade")))
+
+        if "upgrade" not in response_headers.get("connection", "").lower():
+            raise HandshakeError("invalid Connection header: {}".format(response_headers.get("connection")))
+
+        accept = b64encode(sha1(self.key + WS_KEY).digest()).decode("ascii")
+        if response_headers.get("sec-websocket-accept") != accept:
+            raise HandshakeError("invalid challenge response: {}".format(response_headers.get("sec-websocket-accept")))
+
+        return response_headers
+
+    def _version_received_slot(self):
+        """
+        Slot called when the server version has been received.
+        """
+
+        reply = self._version_reply
+        self._version_reply = None
+        if reply is None:
+            return
+        reply.deleteLater()
+
+        if reply.error() != QtNetwork.QNetworkReply.NoError:
+            self._connection_error("could not get the server version from {}: {}".format(self.url, reply.errorString()), 0)
+            return
+
         try:
-            json_data = json.loads(content.decode("utf-8"))
+            json_data = json.loads(bytes(reply.readAll()).decode("utf-8"))
             self._version = json_data.get("version")
-        except ValueError as e:
+        except (ValueError, AttributeError) as e:
             log.error("could not get the server version: {}".format(e))
 
         #FIXME: temporary version check
         if (self._version != __version__):
-            self.close_connection()
-            raise OSError("GUI version {} differs with the server version {}".format(__version__, self._version))
+            self._connection_error("GUI version {} differs with the server version {}".format(__version__, self._version), 0)
+            return
+
+        self._connect_timer.stop()
+        self._connecting = False
+        self.handshake_ok()
+        replay_requests = self._replay_requests
+        self._replay_requests = collections.OrderedDict()
+        # receivers may queue messages (e.g. module settings) that must be sent first
+        self.connected_signal.emit()
+        if replay_requests:
+            log.info("replaying {} request(s) to {}:{}".format(len(replay_requests), self.host, self.port))
+            for request_id, request in replay_requests.items():
+                if request_id in self.callbacks:
+                    self._queue_message(request)
+        self._flush_batch()
+        if self._handshake_body:
+            # frames sent by the server right after the handshake
+            self._frame_buffer += self._handshake_body
+            self._handshake_body = b""
+            self._process_frames()
+
+    def _connection_timeout_slot(self):
+        """
+        Slot called when the connection attempt takes too long.
+        """
+
+        self._connection_error("connection to {}:{} timed out after {} seconds".format(self.host, self.port, self._timeout), errno.ETIMEDOUT)
+
+    def _abort_connection(self):
+        """
+        Stops a pending connection attempt.
+        """
+
+        self._connecting = False
+        self._connect_timer.stop()
+        self._disable_connect_notifier()
+        self._reset_write_buffer()
+        if self._version_reply:
+            reply = self._version_reply
+            self._version_reply = None
+            reply.abort()
+            reply.deleteLater()
+
+    def _connection_error(self, message, error_code):
+        """
+        Ends a connection attempt with an error.
+
+        :param message: error message
+        :param error_code: errno value, 0 if this is not a socket error
+        """
+
+        log.error(message)
+        self._abort_connection()
+        WebSocketBaseClient.close_connection(self)
+        if self._batch:
+            log.warning("{} message(s) to {}:{} dropped".format(len(self._batch), self.host, self.port))
+            self._batch = jsonrpc.JSONRPCBatch()
+        self._fail_pending_requests(message)
+        self.connection_error_signal.emit(message, error_code)
 
     def reconnect(self):
         """
         Reconnects to the server.
         """
 
-        WebSocketBaseClient.__init__(self,
-                                     self.url,
-                                     self.protocols,
-                                     self.extensions,
-                                     self.heartbeat_freq,
-                                     self.ssl_options,
-                                     self.extra_headers)
+        if self._connected or self._connecting:
+            return
 
         if self._local:
             # check the local host address is still valid
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
                     sock.bind((self.host, 0))
 
+        self._reset_socket()
         self.connect()
 
     def connected(self):
@@ -170,6 +609,15 @@ class WebSocketClient(WebSocketBaseClient):
 
         return self._connected
 
+    def connecting(self):
+        """
+        Returns if a connection attempt is in progress.
+
+        :returns: True or False
+        """
+
+        return self._connecting
+
     def handshake_ok(self):
         """
         Called when the connection has been established with the server and
@@ -202,7 +650,7 @@ class WebSocketClient(WebSocketBaseClient):
 
         # TODO: WSAEWOULDBLOCK on Windows
         if not message.is_text:
-            log.warning("received data is not text")
+            self._handle_binary(bytes(message.data))
             return
 
         try:
@@ -211,13 +659,50 @@ class WebSocketClient(WebSocketBaseClient):
             log.warning("received data is not valid JSON")
             return
 
+        if isinstance(reply, list):
+            # This is a JSON-RPC batch reply
+            self._statistics.recordReceived(messages=len(reply))
+            for batch_reply in reply:
+                if isinstance(batch_reply, dict):
+                    self._handle_reply(batch_reply)
+                else:
+                    log.warning("received invalid JSON-RPC batch element")
+        elif isinstance(reply, dict):
+            self._statistics.recordReceived(messages=1)
+            self._handle_reply(reply)
+        else:
+            log.warning("received data is not a JSON-RPC message")
+
+    def _handle_binary(self, data):
+        """
+        Handles a binary message, dispatched on its first byte.
+
+        :param data: message (bytes)
+        """
+
+        if not data:
+            log.warning("received empty binary message")
+            return
+        handler = self._binary_handlers.get(data[0])
+        if handler:
+            handler(data)
+        else:
+            log.warning("no handler for binary message type {}".format(data[0]))
+
+    def _handle_reply(self, reply):
+        """
+        Handles a single JSON-RPC result, error or notification.
+
+        :param reply: JSON-RPC message (dictionary)
+        """
+
         if "result" in reply:
         # This is a JSON-RPC result
             request_id = reply.get("id")
             result = reply.get("result")
-            if request_id in self.callbacks:
-                self.callbacks[request_id](result)
-                del self.callbacks[request_id]
+            callback = self._pop_request(request_id)
+            if callback:
+                callback(result)
             else:
                 log.warning("unknown JSON-RPC request ID received {}".format(request_id))
 
@@ -226,9 +711,9 @@ class WebSocketClient(WebSocketBaseClient):
             error_message = reply["error"].get("message")
             error_code = reply["error"].get("code")
             request_id = reply.get("id")
-            if request_id in self.callbacks:
-                self.callbacks[request_id](reply["error"], True)
-                del self.callbacks[request_id]
+            callback = self._pop_request(request_id)
+            if callback:
+                callback(reply["error"], True)
             else:
                 log.warning("received JSON-RPC error {}: {} for request ID {}".format(error_code,
                                                                                       error_message,
@@ -239,29 +724,177 @@ class WebSocketClient(WebSocketBaseClient):
             params = reply.get("params")
 
             # let the responsible module know about the notification
-            from .modules import MODULES
-            for module in MODULES:
-                if method.startswith(module.__name__.lower()):
-                    instance = module.instance()
-                    instance.notification(method, params)
-                    break
+            handler = self._notification_handlers.get(method.split(".", 1)[0])
+            if handler:
+                handler(method, params)
+            else:
+                log.warning("no handler for JSON-RPC notification {}".format(method))
 
-    def send_message(self, destination, params, callback):
+    def send_message(self, destination, params, callback, timeout=None):
         """
         Sends a message to the server.
 
+        If no reply is received in time, or if the connection is lost,
+        the callback is called with an error.
+
         :param destination: server destination method
         :param params: params to send (dictionary)
         :param callback: callback method to call when the server replies.
+        :param timeout: time to wait for the reply in seconds, default is requestTimeout()
+
+        :returns: request ID, to be used with cancel_message(), or None if the
+        server is down (the callback is then called with an error once control
+        returns to the event loop)
         """
 
-        if not self.connected():
-            log.warning("connection with server {}:{} is down".format(self.host, self.port))
-            return
+        replay = False
+        if self._reconnect_pending and not self.connected():
+            replay = destination.rsplit(".", 1)[-1] in IDEMPOTENT_ACTIONS
 
+        if not self.connected() and not self.connecting() and not replay:
+            message = "connection with server {}:{} is down".format(self.host, self.port)
+            log.warning("{}, {} not sent".format(message, destination))
+            self._statistics.recordFailure()
+            error = {"code": CONNECTION_LOST_ERROR, "message": message}
+            QtCore.QTimer.singleShot(0, lambda: callback(error, True))
+            return None
+
+        if timeout is None:
+            timeout = self._request_timeout
         request = jsonrpc.JSONRPCRequest(destination, params)
+        now = time.monotonic()
         self.callbacks[request.id] = callback
-        self.send(str(request))
+        self._pending_requests[request.id] = (destination, now)
+        self._add_deadline(now + timeout, request.id)
+        if replay:
+            log.info("{} to {}:{} will be sent once reconnected".format(destination, self.host, self.port))
+            self._replay_requests[request.id] = request
+        else:
+            self._queue_message(request)
+        return request.id
+
+    def cancel_message(self, request_id):
+        """
+        Cancels a request, its callback will not be called.
+        The server may still process the request.
+
+        :param request_id: request ID returned by send_message()
+
+        :returns: True if the request was waiting for a reply
+        """
+
+        if request_id not in self.callbacks:
+            return False
+        del self.callbacks[request_id]
+        del self._pending_requests[request_id]
+        self._replay_requests.pop(request_id, None)
+        log.debug("request {} to {}:{} cancelled".format(request_id, self.host, self.port))
+        return True
+
+    def _pop_request(self, request_id):
+        """
+        Removes a pending request and records its round-trip latency.
+
+        :param request_id: request ID
+
+        :returns: callback or None if the request is unknown
+        """
+
+        callback = self.callbacks.pop(request_id, None)
+        if callback is None:
+            return None
+        method, sent_at = self._pending_requests.pop(request_id)
+        latency = time.monotonic() - sent_at
+        self._statistics.recordLatency(method, latency)
+        log.debug("{} replied by {}:{} in {:.3f} seconds".format(method, self.host, self.port, latency))
+        return callback
+
+    def _add_deadline(self, deadline, request_id):
+        """
+        Tracks the deadline of a request.
+
+        :param deadline: time.monotonic() value
+        :param request_id: request ID
+        """
+
+        if len(self._request_deadlines) > 2 * len(self._pending_requests) + 64:
+            # most entries belong to answered requests, drop them
+            self._request_deadlines = [entry for entry in self._request_deadlines if entry[1] in self._pending_requests]
+            heapq.heapify(self._request_deadlines)
+        heapq.heappush(self._request_deadlines, (deadline, request_id))
+        if self._request_deadlines[0][1] == request_id:
+            self._schedule_deadline_timer()
+
+    def _schedule_deadline_timer(self):
+        """
+        Arms the timer for the earliest deadline.
+        """
+
+        if not self._request_deadlines:
+            self._deadline_timer.stop()
+            return
+        delay = max(0, self._request_deadlines[0][0] - time.monotonic())
+        self._deadline_timer.start(int(delay * 1000) + 1)
+
+    def _request_deadlines_slot(self):
+        """
+        Slot called when the earliest request deadline is reached.
+        """
+
+        now = time.monotonic()
+        expired = []
+        while self._request_deadlines and self._request_deadlines[0][0] <= now:
+            _, request_id = heapq.heappop(self._request_deadlines)
+            if request_id in self._pending_requests:
+                expired.append(request_id)
+
+        for request_id in expired:
+            if request_id not in self._pending_requests:
+                # cancelled by the callback of another expired request
+                continue
+            method, sent_at = self._pending_requests[request_id]
+            message = "no reply from {}:{} for {} after {:.0f} seconds".format(self.host, self.port, method, now - sent_at)
+            log.warning(message)
+            self._fail_request(request_id, message, REQUEST_TIMEOUT_ERROR)
+        self._schedule_deadline_timer()
+
+    def _fail_request(self, request_id, message, code):
+        """
+        Calls the callback of a pending request with an error.
+
+        :param request_id: request ID
+        :param message: error message
+        :param code: error code
+        """
+
+        callback = self.callbacks.pop(request_id, None)
+        if callback is None:
+            return
+        del self._pending_requests[request_id]
+        self._replay_requests.pop(request_id, None)
+        self._statistics.recordFailure()
+        callback({"code": code, "message": message}, True)
+
+    def _fail_pending_requests(self, message):
+        """
+        Fails every request still waiting for a reply.
+
+        :param message: error message
+        """
+
+        # requests kept for replay survive until the reconnection succeeds or is abandoned
+        request_ids = [request_id for request_id in self.callbacks if request_id not in self._replay_requests]
+        if self._replay_requests:
+            self._request_deadlines = [entry for entry in self._request_deadlines if entry[1] in self._replay_requests]
+            heapq.heapify(self._request_deadlines)
+            self._schedule_deadline_timer()
+        else:
+            self._request_deadlines = []
+            self._deadline_timer.stop()
+        if request_ids:
+            log.warning("{} request(s) to {}:{} failed: {}".format(len(request_ids), self.host, self.port, message))
+        for request_id in request_ids:
+            self._fail_request(request_id, message, CONNECTION_LOST_ERROR)
 
     def send_notification(self, destination, params=None):
         """
@@ -271,12 +904,230 @@ class WebSocketClient(WebSocketBaseClient):
         :param params: params to send (dictionary)
         """
 
-        if not self.connected():
+        if not self.connected() and not self.connecting():
             log.warning("connection with server {}:{} is down".format(self.host, self.port))
             return
 
         request = jsonrpc.JSONRPCNotification(destination, params)
-        self.send(str(request))
+        self._queue_message(request)
+
+    def _queue_message(self, message):
+        """
+        Queues a request or a notification. Everything queued
+        before control returns to the Qt event loop is sent as
+        a single JSON-RPC batch. While connecting, messages are
+        kept until the connection is ready.
+
+        :param message: JSONRPCRequest or JSONRPCNotification instance
+        """
+
+        if not self._batch:
+            QtCore.QTimer.singleShot(0, self._flush_batch)
+        self._batch.add(message)
+
+    def _flush_batch(self):
+        """
+        Sends the queued requests and notifications to the server.
+        """
+
+        batch = self._batch
+        if not batch or self._connecting:
+            # sent once the connection is ready
+            return
+        self._batch = jsonrpc.JSONRPCBatch()
+
+        if not self.connected():
+            log.warning("connection with server {}:{} is down, {} message(s) dropped".format(self.host,
+                                                                                           self.port,
+                                                                                           len(batch)))
+            self._fail_pending_requests("connection with server {}:{} is down".format(self.host, self.port))
+            return
+
+        try:
+            if len(batch) == 1:
+                # no need for a batch when there is only one message
+                payload = bytes(batch[0])
+            else:
+                log.debug("sending JSON-RPC batch of {} messages to {}:{}".format(len(batch), self.host, self.port))
+                payload = bytes(batch)
+            self._statistics.recordSent(self._send_text(payload), len(batch))
+        except (OSError, RuntimeError) as e:
+            log.error("could not send data to server {}:{}: {}".format(self.host, self.port, e))
+            for message in batch:
+                if isinstance(message, jsonrpc.JSONRPCRequest):
+                    self._fail_request(message.id,
+                                       "could not send {} to server {}:{}: {}".format(message.method, self.host, self.port, e),
+                                       CONNECTION_LOST_ERROR)
+            if not self._closing:
+                self._connection_lost()
+
+    def _connection_lost(self):
+        """
+        Closes a connection that has been lost and lets the
+        receivers of connection_lost_signal know about it.
+        """
+
+        log.warning("lost connection with server {}:{}".format(self.host, self.port))
+        self.close_connection()
+        self.connection_lost_signal.emit()
+
+    def connectionLost(self):
+        """
+        Drops a connection that is established but does not work anymore,
+        for instance when the server stopped answering pings.
+        """
+
+        if self.connected() and not self._closing:
+            self._connection_lost()
+
+    def ping(self, payload=b""):
+        """
+        Sends a ping to the server, which answers with a pong
+        carrying the same payload (see pong_signal).
+
+        :param payload: ping payload (bytes, 125 bytes at most)
+        """
+
+        if not self.connected():
+            raise OSError(errno.ENOTCONN, "connection with server {}:{} is down".format(self.host, self.port))
+        try:
+            self._write_frame(OPCODE_PING, payload)
+        except (OSError, RuntimeError):
+            if not self._closing:
+                self._connection_lost()
+            raise
+
+    def ponged(self, pong):
+        """
+        Called when a pong has been received.
+
+        :param pong: PongControlMessage instance
+        """
+
+        self.pong_signal.emit(bytes(pong.data))
+
+    def _send_text(self, payload):
+        """
+        Sends a text message, compressed if permessage-deflate
+        has been negotiated and it is worth it.
+
+        :param payload: UTF-8 encoded message (bytes)
+
+        :returns: number of payload bytes sent
+        """
+
+        if self._deflate and self._deflate.canCompress() and len(payload) >= permessage_deflate.MIN_COMPRESS_SIZE:
+            compressed = self._deflate.compress(payload)
+            self._write_frame(OPCODE_TEXT, compressed, rsv1=True)
+            return len(compressed)
+
+        self._write_frame(OPCODE_TEXT, payload)
+        return len(payload)
+
+    def send_binary(self, data):
+        """
+        Sends a binary message to the server.
+
+        :param data: message (bytes)
+        """
+
+        if not self.connected():
+            raise OSError(errno.ENOTCONN, "connection with server {}:{} is down".format(self.host, self.port))
+        try:
+            self._write_frame(OPCODE_BINARY, data)
+        except (OSError, RuntimeError):
+            if not self._closing:
+                self._connection_lost()
+            raise
+        self._statistics.recordSent(len(data))
+
+    def _write_frame(self, opcode, payload, rsv1=False):
+        """
+        Sends a single masked frame.
+
+        :param opcode: frame opcode
+        :param payload: frame payload (bytes)
+        :param rsv1: set the RSV1 bit (compressed message)
+        """
+
+        length = len(payload)
+        first_byte = 0x80 | opcode
+        if rsv1:
+            first_byte |= 0x40
+        if length < 126:
+            header = struct.pack("!BB", first_byte, 0x80 | length)
+        elif length < 65536:
+            header = struct.pack("!BBH", first_byte, 0x80 | 126, length)
+        else:
+            header = struct.pack("!BBQ", first_byte, 0x80 | 127, length)
+
+        # clients must mask their frames, XOR the whole payload as one integer
+        masking_key = os.urandom(4)
+        if length:
+            mask = (masking_key * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, "big") ^ int.from_bytes(mask, "big")).to_bytes(length, "big")
+        self._write(header + masking_key + payload)
+
+    def _write(self, data):
+        """
+        Sends data without blocking. What the socket cannot take
+        is buffered and sent once the socket is writable again.
+
+        :param data: data to send (bytes)
+        """
+
+        if self.terminated or self.sock is None:
+            raise RuntimeError("Cannot send on a terminated websocket")
+
+        if self._write_buffer:
+            # keep the order, the socket is not writable yet
+            self._write_buffer += data
+            return
+
+        try:
+            sent = self.sock.send(data)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        if sent < len(data):
+            self._write_buffer += data[sent:]
+            self._write_notifier = QtCore.QSocketNotifier(self.sock.fileno(), QtCore.QSocketNotifier.Write)
+            self._write_notifier.activated.connect(self._ready_to_write_slot)
+
+    def _ready_to_write_slot(self, fd):
+        """
+        Slot called when the socket can take more data.
+        """
+
+        if self.sock is None:
+            self._reset_write_buffer()
+            return
+
+        try:
+            sent = self.sock.send(self._write_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            log.warning("could not send data to server {}:{}: {}".format(self.host, self.port, e))
+            self._reset_write_buffer()
+            if self._connecting:
+                self._connection_error("could not connect to {}: {}".format(self.url, e), e.errno or errno.EIO)
+            elif not self._closing:
+                self._connection_lost()
+            return
+
+        del self._write_buffer[:sent]
+        if not self._write_buffer:
+            self._reset_write_buffer()
+
+    def _reset_write_buffer(self):
+        """
+        Forgets the data not sent yet and stops waiting for the socket to be writable.
+        """
+
+        self._write_buffer = bytearray()
+        if self._write_notifier:
+            self._write_notifier.setEnabled(False)
+            self._write_notifier = None
 
     def close_connection(self):
         """
@@ -284,6 +1135,18 @@ class WebSocketClient(WebSocketBaseClient):
         the QSocketNotifier.
         """
 
+        if self._connecting:
+            self._abort_connection()
+        if self._connected and self.sock:
+            # send what is still queued before closing
+            self._closing = True
+            try:
+                self._flush_batch()
+            finally:
+                self._closing = False
+        if self._write_buffer:
+            log.warning("{} byte(s) to {}:{} dropped".format(len(self._write_buffer), self.host, self.port))
+        self._reset_write_buffer()
         self._connected = False
         self._version = ""
         WebSocketBaseClient.close_connection(self)
@@ -291,16 +1154,217 @@ class WebSocketClient(WebSocketBaseClient):
             self._fd_notifier.setEnabled(False)
             self._fd_notifier = None
         log.info("connection closed with server {}:{}".format(self.host, self.port))
+        self._fail_pending_requests("connection closed with server {}:{}".format(self.host, self.port))
 
     def data_received(self, fd):
         """
         Callback called when data is received from the server.
+
+        Everything already buffered by the socket is read in one go,
+        then all the complete frames are decoded and their messages
+        dispatched in order.
+        """
+
+        if self.sock is None:
+            return
+
+        was_connected = self._connected
+        lost = False
+        while True:
+            try:
+                nbytes = self.sock.recv_into(self._read_buffer)
+            except (BlockingIOError, InterruptedError, socket.timeout):
+                break
+            except OSError as e:
+                log.warning("could not read data from server {}:{}: {}".format(self.host, self.port, e))
+                lost = True
+                break
+            if nbytes == 0:
+                lost = True
+                break
+            self._frame_buffer += self._read_view[:nbytes]
+            self._statistics.recordReceived(nbytes)
+            if nbytes < READ_BUFFER_SIZE:
+                break
+            # the buffer was filled, check if there is more data to read without blocking
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            if not readable:
+                break
+
+        if not self._process_frames() or lost:
+            if was_connected and self.sock is not None:
+                self._connection_lost()
+            else:
+                self.close_connection()
+
+    def _reset_frame_reader(self):
+        """
+        Forgets any partial frame or message from a previous connection.
+        """
+
+        self._frame_buffer = bytearray()
+        self._fragments = []
+        self._fragments_opcode = None
+        self._fragments_compressed = False
+        self._received_messages.clear()
+
+    def _process_frames(self):
+        """
+        Decodes the complete frames waiting in the frame buffer and
+        dispatches the resulting messages.
+
+        :returns: False if the connection must be closed, True otherwise
+        """
+
+        buffer = self._frame_buffer
+        buffer_length = len(buffer)
+        offset = 0
+        keep_open = True
+        with memoryview(buffer) as view:
+            while buffer_length - offset >= 2:
+                first_byte = buffer[offset]
+                second_byte = buffer[offset + 1]
+                payload_length = second_byte & 0x7f
+                header_length = 2
+                if payload_length == 126:
+                    header_length = 4
+                    if buffer_length - offset < header_length:
+                        break
+                    payload_length = struct.unpack_from("!H", buffer, offset + 2)[0]
+                elif payload_length == 127:
+                    header_length = 10
+                    if buffer_length - offset < header_length:
+                        break
+                    payload_length = struct.unpack_from("!Q", buffer, offset + 2)[0]
+
+                masking_key = None
+                if second_byte & 0x80:
+                    # servers should not mask their frames but accept it anyway
+                    header_length += 4
+                    if buffer_length - offset < header_length:
+                        break
+                    masking_key = bytes(view[offset + header_length - 4:offset + header_length])
+
+                frame_end = offset + header_length + payload_length
+                if frame_end > buffer_length:
+                    # incomplete frame, wait for more data
+                    break
+
+                payload = bytes(view[offset + header_length:frame_end])
+                if masking_key:
+                    payload = bytes(byte ^ masking_key[index % 4] for index, byte in enumerate(payload))
+                offset = frame_end
+                if not self._process_frame(first_byte, payload):
+                    keep_open = False
+                    break
+
+        # the memoryview must be released before resizing the buffer
+        del buffer[:offset]
+
+        # received_message() may trigger another read (e.g. a modal dialog
+        # running its own event loop), the queue keeps the order intact.
+        while self._received_messages:
+            self.received_message(self._received_messages.popleft())
+        return keep_open
+
+    def _process_frame(self, first_byte, payload):
+        """
+        Handles one decoded frame.
+
+        :param first_byte: first byte of the frame header (FIN, RSV and opcode bits)
+        :param payload: unmasked frame payload
+
+        :returns: False if the connection must be closed, True otherwise
+        """
+
+        fin = first_byte & 0x80
+        rsv1 = first_byte & 0x40
+        opcode = first_byte & 0x0f
+
+        # RSV1 marks the first frame of a compressed message (permessage-deflate)
+        if first_byte & 0x30 or (rsv1 and (self._deflate is None or opcode not in (OPCODE_TEXT, OPCODE_BINARY))):
+            return self._protocol_error("received a frame with reserved bits set")
+
+        if opcode == OPCODE_CONTINUATION:
+            if self._fragments_opcode is None:
+                return self._protocol_error("received an unexpected continuation frame")
+            self._fragments.append(payload)
+            if fin:
+                opcode, compressed = self._fragments_opcode, self._fragments_compressed
+                payload = b"".join(self._fragments)
+                self._fragments = []
+                self._fragments_opcode = None
+                return self._queue_received_message(opcode, payload, compressed)
+        elif opcode in (OPCODE_TEXT, OPCODE_BINARY):
+            if self._fragments_opcode is not None:
+                return self._protocol_error("received a new message before the end of a fragmented one")
+            if fin:
+                return self._queue_received_message(opcode, payload, rsv1)
+            else:
+                self._fragments_opcode = opcode
+                self._fragments_compressed = rsv1
+                self._fragments = [payload]
+        elif opcode == OPCODE_CLOSE:
+            code = 1000
+            reason = ""
+            if len(payload) >= 2:
+                code = struct.unpack("!H", payload[:2])[0]
+                reason = payload[2:].decode("utf-8", errors="replace")
+            try:
+                self.close(code, reason)
+            except (OSError, RuntimeError):
+                pass
+            self.closed(code, reason)
+            return False
+        elif opcode == OPCODE_PING:
+            try:
+                self._write(self.stream.pong(payload))
+            except (OSError, RuntimeError) as e:
+                log.warning("could not answer ping from server {}:{}: {}".format(self.host, self.port, e))
+        elif opcode == OPCODE_PONG:
+            self.ponged(PongControlMessage(payload))
+        else:
+            return self._protocol_error("received a frame with unknown opcode {}".format(opcode))
+        return True
+
+    def _queue_received_message(self, opcode, data, compressed=False):
+        """
+        Queues a complete message to be dispatched in order.
+
+        :param opcode: OPCODE_TEXT or OPCODE_BINARY
+        :param data: message payload
+        :param compressed: True if the payload is compressed with permessage-deflate
+
+        :returns: False if the connection must be closed, True otherwise
+        """
+
+        if compressed:
+            try:
+                data = self._deflate.decompress(data)
+            except permessage_deflate.PerMessageDeflateError as e:
+                return self._protocol_error(str(e))
+
+        if opcode == OPCODE_TEXT:
+            self._received_messages.append(TextMessage(data))
+        else:
+            self._received_messages.append(BinaryMessage(data))
+        return True
+
+    def _protocol_error(self, message):
         """
+        Closes the WebSocket with a protocol error.
+
+        :param message: error message
 
-        # read the data, if successful received_message() is called by once()
-        if self.once() == False:
-            log.warning("lost connection with server {}:{}".format(self.host, self.port))
-            self.close_connection()
+        :returns: False
+        """
+
+        log.error("WebSocket protocol error with server {}:{}: {}".format(self.host, self.port, message))
+        try:
+            self.close(1002, message)
+        except (OSError, RuntimeError):
+            pass
+        return False
 
     def dump(self):
         """
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+"""
+Script to measure the performance of the project file formats, the topology
+loading and the server protocol. The results are printed, nothing is asserted.
+
+Usage: python3 scripts/benchmarks.py
+"""
+
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gns3 import jsonrpc
+from gns3.permessage_deflate import PerMessageDeflate, MIN_COMPRESS_SIZE
+from gns3.project_file import readProjectFile, writeProjectFile
+from gns3.topology_graph import TopologyGraph
+from gns3.topology_samples import frameSize, generateTopology, routerTopologyMessages
+from gns3.topology_stream import TopologyFile
+
+
+class ReflectionRequest(object):
+    """
+    JSON-RPC request built the way it was before the __slots__
+    fast path: one dir() + getattr() pass per message and a uuid4 identifier.
+    """
+
+    def __init__(self, method, params=None):
+        self.id = str(uuid.uuid4())
+        self.method = method
+        if params:
+            self.params = params
+
+
+class ReflectionEncoder(json.JSONEncoder):
+
+    def default(self, obj):
+        if isinstance(obj, ReflectionRequest):
+            message = {"jsonrpc": 2.0}
+            for field in dir(obj):
+                if not field.startswith('_'):
+                    message[field] = getattr(obj, field)
+            return message
+        return json.JSONEncoder.default(self, obj)
+
+
+def messages_per_second(build, count):
+
+    begin = time.perf_counter()
+    for index in range(count):
+        build(index)
+    return count / (time.perf_counter() - begin)
+
+
+def jsonrpc_serialization(count=20000):
+
+    params = {"id": 1, "port_id": 2, "nio": {"type": "nio_udp", "lport": 20000, "rhost": "127.0.0.1", "rport": 20001}}
+    before = messages_per_second(lambda index: json.dumps(ReflectionRequest("vpcs.add_nio", params), cls=ReflectionEncoder), count)
+    after = messages_per_second(lambda index: str(jsonrpc.JSONRPCRequest("vpcs.add_nio", params)), count)
+    print("JSON-RPC request serialization: {:.0f} msg/s before, {:.0f} msg/s after ({:.1f}x)".format(before, after, after / before))
+
+
+def permessage_deflate(router_count=200):
+
+    deflate = PerMessageDeflate()
+    uncompressed = 0
+    compressed = 0
+    for message in routerTopologyMessages(router_count):
+        uncompressed += frameSize(len(message))
+        if len(message) >= MIN_COMPRESS_SIZE:
+            message = deflate.compress(message)
+        compressed += frameSize(len(message))
+    print("{}-router topology load: {} bytes on the wire uncompressed, {} bytes with permessage-deflate ({:.1f}x)".format(router_count,
+                                                                                                                          uncompressed,
+                                                                                                                          compressed,
+                                                                                                                          uncompressed / compressed))
+
+
+def project_files(directory):
+
+    print("{:>6} | {:>10} {:>10} | {:>10} {:>10} | {:>10} {:>10}".format("nodes", "JSON size", "bin size",
+                                                                          "JSON save", "bin save",
+                                                                          "JSON load", "bin load"))
+    for node_count in (100, 1000, 10000):
+        topology = generateTopology(node_count)
+        results = {}
+        for binary in (False, True):
+            path = os.path.join(directory, "{}.gns3".format(node_count))
+            start = time.perf_counter()
+            writeProjectFile(path, topology, binary)
+            save_time = time.perf_counter() - start
+            start = time.perf_counter()
+            readProjectFile(path)
+            load_time = time.perf_counter() - start
+            results[binary] = (os.path.getsize(path), save_time, load_time)
+            os.remove(path)
+        print("{:>6} | {:>9}K {:>9}K | {:>9.1f}ms {:>8.1f}ms | {:>8.1f}ms {:>8.1f}ms".format(node_count,
+                                                                                           results[False][0] // 1024,
+                                                                                           results[True][0] // 1024,
+                                                                                           results[False][1] * 1000,
+                                                                                           results[True][1] * 1000,
+                                                                                           results[False][2] * 1000,
+                                                                                           results[True][2] * 1000))
+
+
+def peak_memory(function):
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def topology_stream(directory, node_count=10000):
+
+    path = os.path.join(directory, "stream.gns3")
+    with open(path, "w") as f:
+        json.dump(generateTopology(node_count), f, sort_keys=True, indent=4)
+
+    def load():
+        with open(path) as f:
+            topology = json.load(f)
+        return {node["id"]: node for node in topology["topology"]["nodes"]}
+
+    def stream():
+        topology_file = TopologyFile(path)
+        topology_file.scan()
+        return sum(1 for _ in topology_file.nodes())
+
+    file_size = os.path.getsize(path)
+    load_peak = peak_memory(load)
+    stream_peak = peak_memory(stream)
+    os.remove(path)
+    print("{} nodes, {} KiB file: json.load peak {} KiB, streamed peak {} KiB".format(node_count,
+                                                                                      file_size // 1024,
+                                                                                      load_peak // 1024,
+                                                                                      stream_peak // 1024))
+
+
+def topology_dump():
+
+    # mergeGuiSettings is the part of Topology.dump() that depends on the node count
+    from gns3.topology import Topology
+
+    class NodeItem(object):
+
+        def __init__(self, x):
+            self._x = x
+
+        def x(self):
+            return self._x
+
+        def y(self):
+            return 0.0
+
+        def zValue(self):
+            return 1.0
+
+    for node_count in (1000, 10000, 50000):
+        topology_nodes = generateTopology(node_count)["topology"]["nodes"]
+        node_items = {node["id"]: NodeItem(float(node["id"])) for node in topology_nodes}
+        start = time.perf_counter()
+        Topology.mergeGuiSettings(topology_nodes, node_items)
+        elapsed = time.perf_counter() - start
+        print("topology dump, {:>6} nodes: {:.1f}ms ({:.2f}us per node)".format(node_count, elapsed * 1000, elapsed / node_count * 1e6))
+
+
+def topology_graph():
+
+    # 100 pods of 100 nodes in a ring, the pods are chained
+    graph = TopologyGraph()
+    link_id = 0
+    for pod in range(100):
+        first = pod * 100
+        links = [(first + index, first + (index + 1) % 100) for index in range(100)]
+        if pod:
+            links.append((first - 100, first))
+        for source_node_id, destination_node_id in links:
+            link_id += 1
+            graph.addNode(source_node_id, 1)
+            graph.addNode(destination_node_id, 1)
+            graph.addLink(link_id, source_node_id, destination_node_id)
+
+    start = time.perf_counter()
+    graph.bridges()
+    graph.connectedComponents()
+    graph.shortestPath(50, 9950)
+    assignment = graph.partition(range(4))
+    elapsed = time.perf_counter() - start
+    print("topology graph, 10000 nodes, {} links: {:.0f}ms, {} links between 4 servers".format(link_id, elapsed * 1000,
+                                                                                               len(graph.cutLinks(assignment))))
+
+
+if __name__ == '__main__':
+
+    jsonrpc_serialization()
+    permessage_deflate()
+    with tempfile.TemporaryDirectory() as directory:
+        project_files(directory)
+        topology_stream(directory)
+    topology_graph()
+    try:
+        topology_dump()
+    except ImportError as e:
+        print("topology dump: skipped ({})".format(e))
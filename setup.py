@@ -46,10 +46,15 @@ setup(
     long_description=open("README.rst", "r").read(),
     install_requires=[
         "ws4py==0.3.4",
-        "apache-libcloud==0.14.1"],
+        "apache-libcloud==0.14.1",
+        "msgpack>=0.5.2"],
     entry_points={
         "gui_scripts": [
             "gns3 = gns3.main:main",
+            ],
+        "console_scripts": [
+            "gns3-convert = gns3.convert:main",
+            "gns3-topo = gns3.topo:main",
             ]
         },
     packages=find_packages(),
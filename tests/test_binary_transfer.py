@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from gns3.binary_transfer import BinaryTransferError, FlowControl, decodeAck, decodeChunk, encodeAck, encodeChunk
+
+
+class TestChunks(TestCase):
+
+    def test_round_trip(self):
+        message = encodeChunk(7, 65536, b"interface FastEthernet0/0\n")
+        self.assertEqual(decodeChunk(message), (7, 65536, b"interface FastEthernet0/0\n"))
+
+    def test_invalid(self):
+        with self.assertRaises(BinaryTransferError):
+            decodeChunk(b"\x01\x00")
+        with self.assertRaises(BinaryTransferError):
+            decodeChunk(b"\x09" + encodeChunk(1, 0, b"")[1:])
+
+    def test_ack(self):
+        self.assertEqual(decodeAck(encodeAck(3, 2 ** 40)), (3, 2 ** 40))
+        with self.assertRaises(BinaryTransferError):
+            decodeAck(encodeAck(3, 0) + b"\x00")
+        with self.assertRaises(BinaryTransferError):
+            decodeAck(encodeChunk(3, 0, b""))
+
+
+class TestFlowControl(TestCase):
+
+    def test_window(self):
+        flow_control = FlowControl(100, window=30)
+        self.assertEqual(flow_control.available(), 30)
+        flow_control.recordSent(30)
+        self.assertEqual(flow_control.available(), 0)
+        self.assertTrue(flow_control.acknowledge(20))
+        self.assertEqual(flow_control.available(), 20)
+        self.assertEqual(flow_control.progress(), 20)
+
+    def test_end_of_file(self):
+        flow_control = FlowControl(50, window=40)
+        flow_control.recordSent(40)
+        flow_control.acknowledge(40)
+        self.assertEqual(flow_control.available(), 10)
+        flow_control.recordSent(10)
+        self.assertTrue(flow_control.sendingDone())
+        self.assertFalse(flow_control.done())
+        flow_control.acknowledge(50)
+        self.assertTrue(flow_control.done())
+
+    def test_acknowledgments(self):
+        flow_control = FlowControl(100, window=50)
+        flow_control.recordSent(50)
+        flow_control.acknowledge(30)
+        self.assertFalse(flow_control.acknowledge(10))
+        with self.assertRaises(BinaryTransferError):
+            flow_control.acknowledge(60)
+
+    def test_empty_file(self):
+        flow_control = FlowControl(0)
+        self.assertEqual(flow_control.available(), 0)
+        self.assertTrue(flow_control.done())
+        self.assertEqual(flow_control.progress(), 100)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+import json
+
+from gns3 import jsonrpc
+
+
+class TestJSONRPC(TestCase):
+
+    def test_request(self):
+        request = jsonrpc.JSONRPCRequest("vpcs.start", {"id": 42})
+        message = json.loads(str(request))
+        self.assertEqual(message, {"jsonrpc": 2.0, "id": request.id, "method": "vpcs.start", "params": {"id": 42}})
+        self.assertEqual(json.loads(bytes(request).decode("utf-8")), message)
+
+    def test_request_without_params(self):
+        message = jsonrpc.JSONRPCRequest("dynamips.reset")()
+        self.assertNotIn("params", message)
+
+    def test_request_ids(self):
+        first = jsonrpc.JSONRPCRequest("iou.create")
+        second = jsonrpc.JSONRPCRequest("iou.create")
+        self.assertGreater(second.id, first.id)
+        self.assertEqual(jsonrpc.JSONRPCRequest("iou.create", request_id="custom").id, "custom")
+
+    def test_request_slots(self):
+        request = jsonrpc.JSONRPCRequest("vpcs.stop")
+        with self.assertRaises(AttributeError):
+            request.extra = True
+
+    def test_notification(self):
+        message = json.loads(str(jsonrpc.JSONRPCNotification("dynamips.settings", {"ghost_ios": True})))
+        self.assertEqual(message, {"jsonrpc": 2.0, "method": "dynamips.settings", "params": {"ghost_ios": True}})
+
+    def test_errors(self):
+        self.assertEqual(jsonrpc.JSONRPCMethodNotFound(7)(), {"jsonrpc": 2.0, "id": 7, "error": {"code": -32601, "message": "Method not found"}})
+        self.assertEqual(jsonrpc.JSONRPCCustomError(-3200, "boom")()["error"], {"code": -3200, "message": "boom"})
+        self.assertIsNone(jsonrpc.JSONRPCParseError()()["id"])
+
+    def test_encoder(self):
+        response = jsonrpc.JSONRPCResponse({"id": 1}, 3)
+        message = json.loads(json.dumps({"reply": response}, cls=jsonrpc.JSONRPCEncoder))
+        self.assertEqual(message["reply"], {"jsonrpc": 2.0, "id": 3, "result": {"id": 1}})
+
+    def test_batch(self):
+        batch = jsonrpc.JSONRPCBatch()
+        batch.add(jsonrpc.JSONRPCRequest("vpcs.start", {"id": 1}))
+        batch.add(jsonrpc.JSONRPCNotification("vpcs.settings"))
+        messages = json.loads(str(batch))
+        self.assertEqual(len(batch), 2)
+        self.assertEqual([message["method"] for message in messages], ["vpcs.start", "vpcs.settings"])
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from gns3.permessage_deflate import PerMessageDeflate, PerMessageDeflateError, negotiate, offer, MIN_COMPRESS_SIZE
+from gns3.topology_samples import frameSize, routerTopologyMessages
+
+
+class TestNegotiation(TestCase):
+
+    def test_offer(self):
+        self.assertTrue(offer().startswith("permessage-deflate"))
+
+    def test_declined(self):
+        self.assertIsNone(negotiate(None))
+        self.assertIsNone(negotiate(""))
+
+    def test_accepted(self):
+        self.assertIsInstance(negotiate("permessage-deflate"), PerMessageDeflate)
+        deflate = negotiate("permessage-deflate; client_max_window_bits=10; server_no_context_takeover")
+        self.assertTrue(deflate.canCompress())
+        self.assertFalse(negotiate("permessage-deflate; client_max_window_bits=8").canCompress())
+
+    def test_invalid(self):
+        for header in ("x-webkit-deflate-frame",
+                       "permessage-deflate; client_max_window_bits=16",
+                       "permessage-deflate; server_no_context_takeover=1",
+                       "permessage-deflate; unknown",
+                       "permessage-deflate; client_no_context_takeover; client_no_context_takeover"):
+            with self.assertRaises(PerMessageDeflateError):
+                negotiate(header)
+
+
+class TestCompression(TestCase):
+
+    def _round_trip(self, client, server, messages):
+        for message in messages:
+            self.assertEqual(server.decompress(client.compress(message)), message)
+
+    def test_context_takeover(self):
+        messages = ['{{"method": "vpcs.start", "params": {{"id": {}}}}}'.format(index).encode("utf-8") for index in range(20)]
+        self._round_trip(PerMessageDeflate(), PerMessageDeflate(), messages)
+
+    def test_no_context_takeover(self):
+        messages = ['{{"method": "vpcs.stop", "params": {{"id": {}}}}}'.format(index).encode("utf-8") for index in range(20)]
+        self._round_trip(PerMessageDeflate(client_no_context_takeover=True),
+                         PerMessageDeflate(server_no_context_takeover=True),
+                         messages)
+
+    def test_corrupted(self):
+        with self.assertRaises(PerMessageDeflateError):
+            PerMessageDeflate().decompress(b"\xff\xff\xff\xff")
+
+    def test_topology_compression(self):
+        messages = routerTopologyMessages(200)
+        deflate = PerMessageDeflate()
+        peer = PerMessageDeflate()
+
+        uncompressed = sum(frameSize(len(message)) for message in messages)
+        compressed = 0
+        for message in messages:
+            if len(message) >= MIN_COMPRESS_SIZE:
+                payload = deflate.compress(message)
+                self.assertEqual(peer.decompress(payload), message)
+            else:
+                payload = message
+            compressed += frameSize(len(payload))
+
+        self.assertLess(compressed, uncompressed / 2)
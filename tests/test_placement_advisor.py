@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from gns3.placement_advisor import PlacementAdvisor, applyAssignment
+from gns3.server_placement import ServerCapacity
+from gns3.topology_graph import TopologyGraph
+
+
+def twoPods(placement):
+    """
+    Two rings of 4 nodes (1-4 and 5-8) joined by the link 100 between nodes 4 and 5.
+    """
+
+    graph = TopologyGraph()
+    for node_id, server_id in placement.items():
+        graph.addNode(node_id, server_id)
+    link_id = 0
+    for first in (1, 5):
+        for index in range(4):
+            link_id += 1
+            graph.addLink(link_id, first + index, first + (index + 1) % 4)
+    graph.addLink(100, 4, 5)
+    return graph
+
+
+class TestPlacementAdvisor(TestCase):
+
+    def test_rebalance(self):
+        # alternate placement: every link crosses servers
+        graph = twoPods({node_id: "A" if node_id % 2 else "B" for node_id in range(1, 9)})
+        plan = PlacementAdvisor(graph, ["A", "B"]).rebalance()
+        self.assertEqual(plan.cut_links_before, 9)
+        self.assertEqual(plan.cut_links_after, 1)
+        self.assertEqual(sorted(plan.loads_after.values()), [4, 4])
+        # half the nodes stay where they are
+        self.assertEqual(len(plan), 4)
+
+    def test_nothing_to_do(self):
+        graph = twoPods({node_id: "A" if node_id <= 4 else "B" for node_id in range(1, 9)})
+        plan = PlacementAdvisor(graph, ["A", "B"]).rebalance()
+        self.assertEqual(len(plan), 0)
+        self.assertEqual(plan.cut_links_after, 1)
+
+    def test_overloaded_server(self):
+        # all the nodes are on A and B can take half of them
+        graph = twoPods({node_id: "A" for node_id in range(1, 9)})
+        plan = PlacementAdvisor(graph, ["A", "B"]).rebalance()
+        self.assertEqual(plan.cut_links_after, 1)
+        self.assertEqual(len(plan), 4)
+
+    def test_fixed_nodes(self):
+        graph = twoPods({node_id: "A" if node_id % 2 else "B" for node_id in range(1, 9)})
+        graph.addNode(9, "local")
+        graph.addLink(101, 9, 1)
+        assignment = PlacementAdvisor(graph, ["A", "B"], fixed={9: "local", 3: "B"}).suggest()
+        self.assertEqual(assignment[9], "local")
+        self.assertEqual(assignment[3], "B")
+        self.assertEqual(assignment[1], "B")
+        self.assertEqual(len(graph.cutLinks(assignment)), 2)
+
+    def test_capacities(self):
+        graph = twoPods({node_id: "A" for node_id in range(1, 9)})
+        capacities = {"A": ServerCapacity(weight=3), "B": ServerCapacity(max_nodes=2)}
+        assignment = PlacementAdvisor(graph, ["A", "B"], capacities, imbalance=0).suggest()
+        self.assertEqual(list(assignment.values()).count("B"), 2)
+
+    def test_apply_assignment(self):
+        nodes = [{"id": 1, "server_id": 1}, {"id": 2, "server_id": 1}]
+        self.assertEqual(list(applyAssignment(nodes, {2: 3})), [{"id": 1, "server_id": 1}, {"id": 2, "server_id": 3}])
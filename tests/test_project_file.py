@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import TestCase
+
+import gns3.project_file
+from gns3.project_file import FORMAT_VERSION, HEADER, MAGIC, ProjectFileError, decodeBinary, encodeBinary, \
+    isBinaryProjectFile, readProjectFile, writeProjectFile
+from gns3.topology_samples import generateTopology
+
+
+class TestBinaryEncoding(TestCase):
+
+    def test_round_trip(self):
+        values = [0, 127, 128, 65536, 2 ** 64 - 1, -1, -33, -2 ** 63, 1.5, None, True, False,
+                  "", "é" * 40, "x" * 70000, list(range(20)), {"key": [{"nested": None}]}, b"\x00\xff"]
+        for value in values:
+            self.assertEqual(decodeBinary(encodeBinary(value)), value)
+
+    def test_msgpack_encoding(self):
+        data = encodeBinary({"id": 1, "name": "R1", "ports": [-1, 300, 1.0]})
+        self.assertEqual(data[:HEADER.size], MAGIC + bytes([FORMAT_VERSION]))
+        self.assertEqual(data[HEADER.size:], b"\x83\xa2id\x01\xa4name\xa2R1\xa5ports\x93\xff\xcd\x01\x2c\xcb\x3f\xf0\x00\x00\x00\x00\x00\x00")
+
+    def test_topology(self):
+        topology = generateTopology(50)
+        self.assertEqual(decodeBinary(encodeBinary(topology)), topology)
+
+    def test_invalid_data(self):
+        data = encodeBinary({"topology": {"nodes": [1, 2, 3]}})
+        for invalid in (b"", b"{}", data[:-1], data + b"\x00", b"\x00" + data[1:]):
+            with self.assertRaises(ProjectFileError):
+                decodeBinary(invalid)
+
+    def test_unsupported_version(self):
+        data = HEADER.pack(MAGIC, FORMAT_VERSION + 1) + b"\x80"
+        with self.assertRaises(ProjectFileError):
+            decodeBinary(data)
+
+    def test_cannot_encode(self):
+        with self.assertRaises(ProjectFileError):
+            encodeBinary({"value": object()})
+
+
+class TestPureEncoding(TestBinaryEncoding):
+    """
+    Same tests without the msgpack module.
+    """
+
+    def setUp(self):
+        self.msgpack = gns3.project_file.msgpack
+        gns3.project_file.msgpack = None
+
+    def tearDown(self):
+        gns3.project_file.msgpack = self.msgpack
+
+
+class TestProjectFile(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def test_auto_detect(self):
+        topology = generateTopology(10)
+        json_path = os.path.join(self.directory, "json.gns3")
+        binary_path = os.path.join(self.directory, "binary.gns3")
+        writeProjectFile(json_path, topology)
+        writeProjectFile(binary_path, topology, binary=True)
+        self.assertFalse(isBinaryProjectFile(json_path))
+        self.assertTrue(isBinaryProjectFile(binary_path))
+        self.assertEqual(readProjectFile(json_path), topology)
+        self.assertEqual(readProjectFile(binary_path), topology)
+
+    def test_binary_size(self):
+        topology = generateTopology(1000)
+        json_path = os.path.join(self.directory, "json.gns3")
+        binary_path = os.path.join(self.directory, "binary.gns3")
+        writeProjectFile(json_path, topology)
+        writeProjectFile(binary_path, topology, binary=True)
+        self.assertLess(os.path.getsize(binary_path) * 2, os.path.getsize(json_path))
+
+    def test_atomic_write(self):
+        path = os.path.join(self.directory, "lab.gns3")
+        writeProjectFile(path, generateTopology(10))
+        os.chmod(path, 0o600)
+        with self.assertRaises(ProjectFileError):
+            writeProjectFile(path, {"value": object()}, binary=True)
+        with self.assertRaises(TypeError):
+            writeProjectFile(path, {"value": object()})
+        # the project file is intact and no temporary file is left behind
+        self.assertEqual(readProjectFile(path), generateTopology(10))
+        self.assertEqual(os.listdir(self.directory), ["lab.gns3"])
+
+        writeProjectFile(path, generateTopology(20), binary=True)
+        self.assertEqual(readProjectFile(path), generateTopology(20))
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
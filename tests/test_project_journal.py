@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from gns3.project_file import writeProjectFile
+from gns3.project_journal import ProjectJournal, applyJournal, hasRecovery, journalPath, readJournal, recoverTopology, \
+    snapshotPath
+
+
+def node(node_id, name, x=None, server_id=1):
+    node_info = {"id": node_id, "type": "VPCSDevice", "description": "VPCS device",
+                 "server_id": server_id, "properties": {"name": name}}
+    if x is not None:
+        node_info["x"] = x
+        node_info["y"] = 0.0
+    return node_info
+
+
+def link(link_id, source_node_id, destination_node_id):
+    return {"id": link_id, "description": "Link {}".format(link_id),
+            "source_node_id": source_node_id, "source_port_id": 1,
+            "destination_node_id": destination_node_id, "destination_port_id": 2}
+
+
+SERVER = {"id": 1, "host": "127.0.0.1", "port": 8000, "local": True}
+
+
+class TestApplyJournal(TestCase):
+
+    def test_changes(self):
+        records = [{"op": "node_added", "node": node(1, "PC1", 10.0), "server": SERVER},
+                   {"op": "node_added", "node": node(2, "PC2", 20.0), "server": SERVER},
+                   {"op": "link_added", "link": link(1, 1, 2)},
+                   {"op": "node_moved", "id": 1, "x": 15.0, "y": 5.0},
+                   {"op": "node_updated", "node": node(2, "PC-2"), "server": SERVER}]
+        topology = applyJournal({"topology": {}}, records)
+        nodes = topology["topology"]["nodes"]
+        self.assertEqual([(n["id"], n["properties"]["name"], n["x"], n["y"]) for n in nodes],
+                         [(1, "PC1", 15.0, 5.0), (2, "PC-2", 20.0, 0.0)])
+        self.assertEqual(topology["topology"]["links"], [link(1, 1, 2)])
+        self.assertEqual(topology["topology"]["servers"], [SERVER])
+
+    def test_node_removed(self):
+        topology = {"topology": {"nodes": [node(1, "PC1", 0.0), node(2, "PC2", 0.0)],
+                                 "links": [link(1, 1, 2)],
+                                 "servers": [SERVER]}}
+        records = [{"op": "node_removed", "id": 1},
+                   {"op": "node_removed", "id": 2},
+                   {"op": "node_moved", "id": 2, "x": 1.0, "y": 1.0}]
+        topology = applyJournal(topology, records)
+        self.assertEqual(topology["topology"], {})
+
+    def test_replay_twice(self):
+        records = [{"op": "node_added", "node": node(1, "PC1", 10.0), "server": SERVER},
+                   {"op": "node_added", "node": node(2, "PC2", 20.0), "server": SERVER},
+                   {"op": "link_added", "link": link(1, 1, 2)},
+                   {"op": "link_removed", "id": 1},
+                   {"op": "node_removed", "id": 2}]
+        once = applyJournal({"topology": {}}, records)
+        twice = applyJournal(applyJournal({"topology": {}}, records), records)
+        self.assertEqual(once, twice)
+
+
+class TestProjectJournal(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.project_path = os.path.join(self.directory, "lab.gns3")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_append_and_recover(self):
+        writeProjectFile(self.project_path, {"type": "topology", "topology": {"nodes": [node(1, "PC1", 0.0)],
+                                                                              "servers": [SERVER]}})
+        journal = ProjectJournal(self.project_path)
+        self.assertFalse(hasRecovery(self.project_path))
+        journal.append([{"op": "node_moved", "id": 1, "x": 50.0, "y": 60.0}])
+        journal.append([{"op": "node_added", "node": node(2, "PC2", 1.0), "server": SERVER}])
+        self.assertEqual(journal.recordCount(), 2)
+        self.assertTrue(hasRecovery(self.project_path))
+
+        topology = recoverTopology(self.project_path)
+        self.assertEqual([(n["id"], n["x"]) for n in topology["topology"]["nodes"]], [(1, 50.0), (2, 1.0)])
+
+    def test_incomplete_record(self):
+        journal = ProjectJournal(self.project_path)
+        journal.append([{"op": "node_added", "node": node(1, "PC1", 0.0), "server": SERVER}])
+        with open(journalPath(self.project_path), "a") as f:
+            f.write('{"op": "node_removed", "id"')
+        self.assertEqual(len(readJournal(journalPath(self.project_path))), 1)
+        # a temporary project without any saved topology
+        topology = recoverTopology(self.project_path)
+        self.assertEqual(len(topology["topology"]["nodes"]), 1)
+
+    def test_compact(self):
+        journal = ProjectJournal(self.project_path)
+        journal.append([{"op": "node_added", "node": node(1, "PC1", 0.0), "server": SERVER}])
+        journal.compact({"type": "topology", "topology": {"nodes": [node(1, "PC1", 0.0)], "servers": [SERVER]}})
+        self.assertEqual(journal.recordCount(), 0)
+        self.assertEqual(os.path.getsize(journalPath(self.project_path)), 0)
+        journal.append([{"op": "node_moved", "id": 1, "x": 5.0, "y": 5.0}])
+
+        topology = recoverTopology(self.project_path)
+        self.assertEqual(topology["topology"]["nodes"][0]["x"], 5.0)
+
+        journal.discard()
+        self.assertFalse(os.path.exists(journalPath(self.project_path)))
+        self.assertFalse(os.path.exists(snapshotPath(self.project_path)))
+        self.assertFalse(hasRecovery(self.project_path))
+
+    def test_project_saved(self):
+        journal = ProjectJournal(self.project_path)
+        journal.append([{"op": "node_added", "node": node(1, "PC1", 0.0), "server": SERVER}])
+        journal.compact({"type": "topology", "topology": {"nodes": [node(1, "PC1", 0.0)], "servers": [SERVER]}})
+        journal.append([{"op": "node_added", "node": node(2, "PC2", 0.0), "server": SERVER}])
+        checkpoint = journal.checkpoint()
+        topology = recoverTopology(self.project_path)
+
+        # changed while the project file is being written
+        journal.append([{"op": "node_moved", "id": 2, "x": 7.0, "y": 7.0}])
+        writeProjectFile(self.project_path, topology)
+        journal.projectSaved(checkpoint)
+        self.assertEqual(journal.recordCount(), 1)
+        self.assertFalse(os.path.exists(snapshotPath(self.project_path)))
+        self.assertEqual(len(readJournal(journalPath(self.project_path))), 1)
+
+        topology = recoverTopology(self.project_path)
+        self.assertEqual([(n["id"], n["x"]) for n in topology["topology"]["nodes"]], [(1, 0.0), (2, 7.0)])
+
+        # a snapshot written after the topology was dumped is kept
+        checkpoint = journal.checkpoint()
+        journal.append([{"op": "node_moved", "id": 2, "x": 9.0, "y": 9.0}])
+        journal.compact(recoverTopology(self.project_path))
+        journal.projectSaved(checkpoint)
+        self.assertTrue(os.path.exists(snapshotPath(self.project_path)))
+
+    def test_snapshot_written(self):
+        journal = ProjectJournal(self.project_path)
+        journal.append([{"op": "node_added", "node": node(1, "PC1", 0.0), "server": SERVER}])
+        checkpoint = journal.checkpoint()
+        topology = recoverTopology(self.project_path)
+
+        # changed while the snapshot is being written
+        journal.append([{"op": "node_moved", "id": 1, "x": 4.0, "y": 4.0}])
+        writeProjectFile(journal.snapshotPath(), topology, binary=True)
+        journal.snapshotWritten(checkpoint)
+        self.assertEqual(journal.recordCount(), 1)
+        topology = recoverTopology(self.project_path)
+        self.assertEqual(topology["topology"]["nodes"][0]["x"], 4.0)
+
+        # a snapshot dumped before the project file was written is stale
+        checkpoint = journal.checkpoint()
+        topology = recoverTopology(self.project_path)
+        journal.append([{"op": "node_moved", "id": 1, "x": 6.0, "y": 6.0}])
+        journal.projectSaved(journal.checkpoint())
+        writeProjectFile(journal.snapshotPath(), topology, binary=True)
+        journal.snapshotWritten(checkpoint)
+        self.assertFalse(os.path.exists(journal.snapshotPath()))
+
+    def test_move(self):
+        journal = ProjectJournal(self.project_path)
+        journal.append([{"op": "node_added", "node": node(1, "PC1", 0.0), "server": SERVER}])
+        new_project_path = os.path.join(self.directory, "copy.gns3")
+        journal.move(new_project_path)
+        self.assertEqual(journal.projectPath(), new_project_path)
+        self.assertFalse(hasRecovery(self.project_path))
+        journal.append([{"op": "node_moved", "id": 1, "x": 3.0, "y": 3.0}])
+        topology = recoverTopology(new_project_path)
+        self.assertEqual(topology["topology"]["nodes"][0]["x"], 3.0)
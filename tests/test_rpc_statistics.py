@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from gns3.rpc_statistics import LatencyHistogram, RPCStatistics
+
+
+class TestLatencyHistogram(TestCase):
+
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.mean(), 0.0)
+        self.assertEqual(histogram.percentile(95), 0.0)
+
+    def test_latencies(self):
+        histogram = LatencyHistogram()
+        for latency in (0.001, 0.003, 0.003, 0.040, 2.5):
+            histogram.add(latency)
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.mean(), 509.4)
+        self.assertAlmostEqual(histogram.minimum, 1.0)
+        self.assertAlmostEqual(histogram.maximum, 2500.0)
+        self.assertEqual(histogram.percentile(50), 5.0)
+        self.assertEqual(histogram.percentile(100), 2500.0)
+
+    def test_slower_than_last_bucket(self):
+        histogram = LatencyHistogram()
+        histogram.add(30)
+        self.assertEqual(histogram.percentile(95), 30000.0)
+
+
+class TestRPCStatistics(TestCase):
+
+    def test_traffic(self):
+        statistics = RPCStatistics()
+        statistics.recordSent(120, 3)
+        statistics.recordReceived(80)
+        statistics.recordReceived(messages=2)
+        statistics.recordFailure()
+        self.assertEqual((statistics.bytes_sent, statistics.messages_sent), (120, 3))
+        self.assertEqual((statistics.bytes_received, statistics.messages_received), (80, 2))
+        self.assertEqual(statistics.requests_failed, 1)
+        statistics.reset()
+        self.assertEqual(statistics.bytes_sent, 0)
+
+    def test_slowest_methods(self):
+        statistics = RPCStatistics()
+        statistics.recordLatency("vpcs.add_nio", 0.002)
+        statistics.recordLatency("dynamips.vm.start", 1.2)
+        statistics.recordLatency("vpcs.add_nio", 0.004)
+        methods = [method for method, _ in statistics.slowestMethods()]
+        self.assertEqual(methods, ["dynamips.vm.start", "vpcs.add_nio"])
+        self.assertEqual(len(statistics.slowestMethods(1)), 1)
+        summary = statistics.summary()
+        self.assertEqual(len(summary), 3)
+        self.assertTrue(summary[1].startswith("dynamips.vm.start: 1 calls"))
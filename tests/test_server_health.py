@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from gns3.qt import QtCore
+from gns3.server_health import MAX_MISSED_PINGS, HealthMonitor, ServerHealth
+
+
+class FakeServer(QtCore.QObject):
+
+    connected_signal = QtCore.Signal()
+    connection_lost_signal = QtCore.Signal()
+    pong_signal = QtCore.Signal(bytes)
+
+    host = "192.168.1.10"
+    port = 8000
+
+    def __init__(self, answer=True):
+        QtCore.QObject.__init__(self)
+        self.answer = answer
+        self.pings = []
+        self.lost = False
+
+    def connected(self):
+        return not self.lost
+
+    def connecting(self):
+        return False
+
+    def version(self):
+        return "1.0"
+
+    def ping(self, payload):
+        self.pings.append(payload)
+        if self.answer:
+            self.pong_signal.emit(payload)
+
+    def connectionLost(self):
+        self.lost = True
+        self.connection_lost_signal.emit()
+
+
+class TestServerHealth(TestCase):
+
+    def test_summary(self):
+        health = ServerHealth()
+        self.assertEqual(health.summary(), "unknown")
+        health.alive = True
+        health.rtt = 1.25
+        health.version = "1.0"
+        self.assertEqual(health.summary(), "up, 1.2 ms, version 1.0")
+        health.alive = False
+        health.error = "connection lost"
+        self.assertEqual(health.summary(), "down, version 1.0, connection lost")
+
+
+class TestHealthMonitor(TestCase):
+
+    def test_pong(self):
+        monitor = HealthMonitor()
+        server = FakeServer()
+        updates = []
+        monitor.health_signal.connect(updates.append)
+        monitor.watch(server)
+        monitor.check()
+        monitor.check()
+        health = monitor.health(server)
+        self.assertEqual(len(set(server.pings)), 2)
+        self.assertEqual(updates, [server, server])
+        self.assertTrue(health.alive)
+        self.assertEqual(health.version, "1.0")
+        self.assertEqual(health.missed_pings, 0)
+        self.assertGreaterEqual(health.rtt, 0)
+
+    def test_missed_pings(self):
+        monitor = HealthMonitor()
+        server = FakeServer(answer=False)
+        monitor.watch(server)
+        for _ in range(MAX_MISSED_PINGS):
+            monitor.check()
+            self.assertFalse(server.lost)
+        monitor.check()
+        self.assertTrue(server.lost)
+        self.assertFalse(monitor.health(server).alive)
+
+        # late or unexpected pongs are ignored
+        server.pong_signal.emit(server.pings[0])
+        self.assertFalse(monitor.health(server).alive)
+
+    def test_unwatch(self):
+        monitor = HealthMonitor()
+        server = FakeServer()
+        monitor.watch(server)
+        monitor.unwatch(server)
+        monitor.check()
+        self.assertIsNone(monitor.health(server))
+        self.assertEqual(server.pings, [])
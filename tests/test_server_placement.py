@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+from unittest import TestCase
+
+from gns3.server_placement import PLACEMENT_POLICIES, ServerCapacity, ServerLoad, createPlacementPolicy
+
+
+def loads():
+    return [ServerLoad("A", ServerCapacity(max_nodes=10, ram=2048, weight=1), 4, 1024, Counter(IOUDevice=4)),
+            ServerLoad("B", ServerCapacity(max_nodes=10, ram=4096, weight=3), 6, 3800, Counter(C7200=6)),
+            ServerLoad("C", ServerCapacity(max_nodes=3), 3, 0, Counter(VPCSDevice=3)),
+            ServerLoad("D", ServerCapacity(), 5, 640, Counter(VPCSDevice=5))]
+
+
+def select(name, node_type=None, ram=0):
+    load = createPlacementPolicy(name).select(loads(), node_type, ram)
+    return load.server if load else None
+
+
+class TestPlacementPolicies(TestCase):
+
+    def test_fits(self):
+        server_a, server_b, server_c, server_d = loads()
+        self.assertTrue(server_a.fits(1024))
+        self.assertFalse(server_a.fits(1025))
+        self.assertFalse(server_c.fits())
+        self.assertTrue(server_d.fits(100000))
+
+    def test_round_robin(self):
+        policy = createPlacementPolicy("round_robin")
+        self.assertEqual([policy.select(loads()).server for _ in range(4)], ["A", "B", "D", "A"])
+
+    def test_least_loaded(self):
+        self.assertEqual(select("least_loaded"), "A")
+
+    def test_weighted(self):
+        # (6 + 1) / 3 is less than (4 + 1) / 1
+        self.assertEqual(select("weighted"), "B")
+
+    def test_ram(self):
+        # best fit: B has 296 MB left, A 1024 MB
+        self.assertEqual(select("ram", ram=256), "B")
+        self.assertEqual(select("ram", ram=512), "A")
+        # only the server without declared RAM is left
+        self.assertEqual(select("ram", ram=4096), "D")
+
+    def test_affinity(self):
+        self.assertEqual(select("affinity", "C7200"), "B")
+        self.assertEqual(select("affinity", "VPCSDevice"), "D")
+        self.assertEqual(select("affinity", "EthernetSwitch"), "A")
+
+    def test_no_capacity(self):
+        full = [ServerLoad("A", ServerCapacity(max_nodes=1), 1)]
+        for name in PLACEMENT_POLICIES:
+            self.assertIsNone(createPlacementPolicy(name).select(full))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            createPlacementPolicy("random")
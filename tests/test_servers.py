@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from unittest import TestCase, skipIf
+
+from PyQt4.QtGui import QApplication
+
+from gns3.servers import Servers, setNonBlocking
+
+
+@skipIf(sys.platform.startswith("win"), "the local server output is not read on Windows")
+class TestLocalServerOutput(TestCase):
+
+    def setUp(self):
+        self.app = QApplication(sys.argv)
+        self.servers = Servers.instance()
+        self.ready = []
+        self.servers.local_server_ready_signal.connect(self.readySlot)
+        self.read_fd, self.write_fd = os.pipe()
+        setNonBlocking(self.read_fd)
+        self.output = os.fdopen(self.read_fd, "rb")
+        self.servers._local_server_stdout = self.output
+
+    def tearDown(self):
+        self.servers.local_server_ready_signal.disconnect(self.readySlot)
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+        if self.servers._local_server_output_thread:
+            self.servers._local_server_output_thread.join(10)
+            self.servers._local_server_output_thread = None
+        self.servers._local_server_stdout = None
+        self.output.close()
+        del self.app
+
+    def readySlot(self):
+        self.ready.append(True)
+
+    def test_ready(self):
+        # nothing to read yet, the pipe does not block
+        self.servers._localServerOutputSlot(self.read_fd)
+        self.assertEqual(self.ready, [])
+
+        # the end of a line is read later
+        os.write(self.write_fd, b"GNS3 server version 1.0\nStarting server")
+        self.servers._localServerOutputSlot(self.read_fd)
+        self.assertEqual(self.ready, [])
+        os.write(self.write_fd, b" on 127.0.0.1:8000\nlistening")
+        self.servers._localServerOutputSlot(self.read_fd)
+        self.assertEqual(self.ready, [True])
+
+    def test_drained(self):
+        os.write(self.write_fd, b"Starting server on 127.0.0.1:8000\n")
+        self.servers._localServerOutputSlot(self.read_fd)
+        self.assertEqual(self.ready, [True])
+
+        # the event loop does not read the output any more, the server must not block
+        for _ in range(64):
+            os.write(self.write_fd, b"x" * 16383 + b"\n")
+        os.close(self.write_fd)
+        self.write_fd = None
+        self.servers._local_server_output_thread.join(10)
+        self.assertFalse(self.servers._local_server_output_thread.is_alive())
+
+    def test_process_exited(self):
+        os.write(self.write_fd, b"Traceback (most recent call last):\n")
+        os.close(self.write_fd)
+        self.write_fd = None
+        self.servers._localServerOutputSlot(self.read_fd)
+        self.servers._localServerOutputSlot(self.read_fd)
+        self.assertEqual(self.ready, [])
+        self.assertEqual(self.servers._local_server_output, b"")
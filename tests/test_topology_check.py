@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from gns3.topology_check import NODE_TYPES, checkTopology
+from gns3.topology_samples import generateTopology
+
+
+class TestCheckTopology(TestCase):
+
+    def test_valid(self):
+        report = checkTopology(generateTopology(20))
+        self.assertTrue(report.valid(), report.problems)
+        self.assertEqual((report.node_count, report.link_count, report.server_count), (20, 19, 1))
+        self.assertEqual(dict(report.nodes_by_module), {"vpcs": 20})
+        self.assertEqual(dict(report.links_by_server), {"127.0.0.1:8000": 19})
+        self.assertEqual(report.cross_server_links, 0)
+
+    def test_not_a_topology(self):
+        self.assertEqual(checkTopology({"type": "something"}).problems, ["not a topology"])
+
+    def test_problems(self):
+        topology = generateTopology(4)
+        nodes = topology["topology"]["nodes"]
+        links = topology["topology"]["links"]
+        nodes[1]["type"] = "Toaster"
+        nodes[2]["server_id"] = 42
+        nodes[2]["ports"][0]["id"] = nodes[0]["ports"][0]["id"]
+        nodes.append(dict(nodes[0], properties={"name": "PC5"}))
+        links.append(dict(links[0], id=100))
+        links.append(dict(links[0], id=101, destination_node_id=99))
+        links.append(dict(links[0], id=102, source_port_id=999))
+
+        report = checkTopology(topology)
+        self.assertFalse(report.valid())
+        self.assertEqual(report.nodes_by_module["unknown"], 1)
+        problems = "\n".join(report.problems)
+        for expected in ("duplicate node ID 1 (PC5)", "unknown type: Toaster", "unknown server: 42",
+                         "port ID {} of node PC3 is also used by node PC1".format(nodes[0]["ports"][0]["id"]),
+                         "port 4 of node 2 is used by links 2 and 100", "link 101 has an unknown destination node: 99",
+                         "link 102 has an unknown source port"):
+            self.assertIn(expected, problems)
+
+    def test_cross_server_links(self):
+        topology = generateTopology(3)
+        topology["topology"]["servers"].append({"id": 2, "host": "10.0.0.2", "port": 8000, "local": False})
+        topology["topology"]["nodes"][2]["server_id"] = 2
+        report = checkTopology(topology)
+        self.assertTrue(report.valid(), report.problems)
+        self.assertEqual(dict(report.links_by_server), {"127.0.0.1:8000": 1})
+        self.assertEqual(report.cross_server_links, 1)
+
+
+class TestNodeTypes(TestCase):
+
+    def test_modules(self):
+        # the modules need Qt, the checks must not
+        from gns3.modules import MODULES
+        node_types = {node_class.__name__: module.__name__.lower() for module in MODULES for node_class in module.nodes()}
+        self.assertEqual(NODE_TYPES, node_types)
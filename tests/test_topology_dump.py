@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from gns3.topology import Topology
+
+
+class FakeNodeItem(object):
+
+    def __init__(self, x, y, z=1.0):
+        self._x = x
+        self._y = y
+        self._z = z
+
+    def x(self):
+        return self._x
+
+    def y(self):
+        return self._y
+
+    def zValue(self):
+        return self._z
+
+
+class TestMergeGuiSettings(TestCase):
+
+    def test_positions(self):
+        topology_nodes = [{"id": 1}, {"id": 2}, {"id": 3}]
+        node_items = {1: FakeNodeItem(10.0, 20.0), 2: FakeNodeItem(-5.0, 0.0, 2.0)}
+        Topology.mergeGuiSettings(topology_nodes, node_items)
+        self.assertEqual(topology_nodes, [{"id": 1, "x": 10.0, "y": 20.0},
+                                          {"id": 2, "x": -5.0, "y": 0.0, "z": 2.0},
+                                          {"id": 3}])
+
+
+class FakeServer(object):
+
+    def __init__(self, server_id):
+        self._id = server_id
+
+    def id(self):
+        return self._id
+
+
+class FakeNode(object):
+
+    def __init__(self, node_id, server, ram=0):
+        self._id = node_id
+        self._server = server
+        self._settings = {"ram": ram}
+
+    def id(self):
+        return self._id
+
+    def server(self):
+        return self._server
+
+    def settings(self):
+        return self._settings
+
+
+class Router(FakeNode):
+    pass
+
+
+class TestServerUsage(TestCase):
+
+    def test_counters(self):
+        topology = Topology()
+        server1, server2 = FakeServer(1), FakeServer(2)
+        router = Router(1, server1, ram=256)
+        topology.addNode(router)
+        topology.addNode(FakeNode(2, server1))
+        topology.addNode(Router(3, server2, ram=128))
+        usage = topology.serverUsage()
+        self.assertEqual(usage[1][:2], (2, 256))
+        self.assertEqual(usage[1][2], {"Router": 1, "FakeNode": 1})
+        self.assertEqual(usage[2][:2], (1, 128))
+
+        router.settings()["ram"] = 512
+        topology.nodeUpdated(router)
+        self.assertEqual(topology.serverUsage()[1][1], 512)
+
+        topology.removeNode(router)
+        self.assertEqual(topology.serverUsage()[1], (1, 0, {"FakeNode": 1}))
+        topology.reset()
+        self.assertEqual(topology.serverUsage(), {})
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from gns3.topology_graph import TopologyGraph
+
+
+def buildGraph(links, server_id=1):
+    graph = TopologyGraph()
+    for link_id, (source_node_id, destination_node_id) in enumerate(links, 1):
+        for node_id in (source_node_id, destination_node_id):
+            graph.addNode(node_id, server_id)
+        graph.addLink(link_id, source_node_id, destination_node_id)
+    return graph
+
+
+class TestTopologyGraph(TestCase):
+
+    def setUp(self):
+        # two triangles (1, 2, 3) and (4, 5, 6) joined by the link 2 between 3 and 4,
+        # node 7 hangs on node 6 and node 8 has no link.
+        self.graph = buildGraph([(1, 2), (3, 4), (2, 3), (3, 1), (4, 5), (5, 6), (6, 4), (6, 7)])
+        self.graph.addNode(8, 1)
+
+    def test_components(self):
+        self.assertEqual(self.graph.connectedComponents(), [{1, 2, 3, 4, 5, 6, 7}, {8}])
+        self.graph.removeLink(2)
+        self.assertEqual(self.graph.connectedComponents(), [{1, 2, 3}, {4, 5, 6, 7}, {8}])
+
+    def test_shortest_path(self):
+        self.assertEqual(self.graph.shortestPath(1, 7), [1, 3, 4, 6, 7])
+        self.assertEqual(self.graph.shortestPath(5, 5), [5])
+        self.assertIsNone(self.graph.shortestPath(1, 8))
+        self.assertIsNone(self.graph.shortestPath(1, 42))
+
+    def test_bridges(self):
+        self.assertEqual(sorted(self.graph.bridges()), [2, 8])
+        self.assertEqual(self.graph.articulationPoints(), {3, 4, 6})
+        # a second link between the same nodes is a backup
+        self.graph.addLink(9, 4, 3)
+        self.assertEqual(self.graph.bridges(), [8])
+        self.assertEqual(self.graph.articulationPoints(), {3, 4, 6})
+
+    def test_split_by_link(self):
+        self.assertEqual(self.graph.splitByLink(2), ({1, 2, 3}, {4, 5, 6, 7}))
+        self.assertIsNone(self.graph.splitByLink(1))
+        self.assertIsNone(self.graph.splitByLink(42))
+
+    def test_remove_node(self):
+        self.graph.removeNode(3)
+        self.assertEqual(self.graph.links(), [1, 5, 6, 7, 8])
+        self.assertEqual(self.graph.neighbors(1), [2])
+        self.assertEqual(self.graph.degree(4), 2)
+
+    def test_partition(self):
+        assignment = self.graph.partition(["A", "B"])
+        self.assertEqual(assignment[1], assignment[2])
+        self.assertEqual(assignment[1], assignment[3])
+        self.assertEqual(len(self.graph.cutLinks(assignment)), 1)
+        self.assertLessEqual(abs(list(assignment.values()).count("A") - list(assignment.values()).count("B")), 2)
+
+    def test_partition_capacities(self):
+        assignment = self.graph.partition(["A", "B"], capacities={"A": 1, "B": 10})
+        self.assertEqual(list(assignment.values()).count("A"), 1)
+        with self.assertRaises(ValueError):
+            self.graph.partition(["A", "B"], capacities={"A": 1, "B": 1})
+        with self.assertRaises(ValueError):
+            self.graph.partition([])
+
+    def test_partition_keeps_assignment(self):
+        current = {node_id: "A" if node_id in (1, 2, 3, 8) else "B" for node_id in self.graph.nodes()}
+        assignment = self.graph.partition(["A", "B"], assignment=current)
+        self.assertEqual(len(self.graph.cutLinks(assignment)), 1)
+        self.assertEqual(dict(assignment), current)
+
+    def test_pods(self):
+        # 8 pods of 50 nodes in a ring, the pods are chained
+        links = []
+        for pod in range(8):
+            first = pod * 50
+            links.extend((first + index, first + (index + 1) % 50) for index in range(50))
+            if pod:
+                links.append((first - 50, first))
+        graph = buildGraph(links)
+
+        self.assertEqual(len(graph.bridges()), 7)
+        self.assertEqual(len(graph.connectedComponents()), 1)
+        self.assertEqual(len(graph.shortestPath(25, 375)), 58)
+        self.assertIsNone(graph.splitByLink(1))
+        # each server gets two whole pods
+        assignment = graph.partition(range(4))
+        self.assertEqual(len(graph.cutLinks(assignment)), 3)
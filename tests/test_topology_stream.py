@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from gns3.topology_samples import generateTopology
+from gns3.topology_stream import TopologyFile, TopologyStreamError, iterTopology
+
+
+class TestIterTopology(TestCase):
+
+    def setUp(self):
+        self.topology = generateTopology(20)
+        self.text = json.dumps(self.topology, sort_keys=True, indent=4)
+
+    def _read(self, text, chunk_size):
+        sections = {"topology.nodes": [], "topology.links": [], "topology.servers": []}
+        properties = {}
+        for path, value in iterTopology(io.StringIO(text), chunk_size):
+            if path in sections:
+                sections[path].append(value)
+            else:
+                properties[path] = value
+        return sections, properties
+
+    def test_same_as_json_load(self):
+        for chunk_size in (1, 3, 17, 4096):
+            sections, properties = self._read(self.text, chunk_size)
+            for section in ("nodes", "links", "servers"):
+                self.assertEqual(sections["topology." + section], self.topology["topology"][section])
+            self.assertEqual(properties, {"topology": None, "type": "topology", "version": "1.0"})
+
+    def test_numbers_across_blocks(self):
+        text = '{"version": 123456789, "topology": {"nodes": [1.5e3, 42]}}'
+        for chunk_size in range(1, len(text)):
+            sections, properties = self._read(text, chunk_size)
+            self.assertEqual(properties["version"], 123456789)
+            self.assertEqual(sections["topology.nodes"], [1500.0, 42])
+
+    def test_empty_topology(self):
+        sections, properties = self._read('{"topology": {"nodes": []}}', 4)
+        self.assertEqual(sections["topology.nodes"], [])
+        self.assertIn("topology", properties)
+
+    def test_invalid_files(self):
+        for text in ("", "[]", self.text[:-10], self.text + "{}", '{"topology": {"nodes": [{"id": 1} {"id": 2}]}}'):
+            with self.assertRaises(TopologyStreamError):
+                self._read(text, 16)
+
+
+class TestTopologyFile(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".gns3")
+        with os.fdopen(fd, "w") as f:
+            json.dump(generateTopology(1000), f, sort_keys=True, indent=4)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_scan_and_nodes(self):
+        topology_file = TopologyFile(self.path)
+        topology_file.scan(node_placement=True)
+        self.assertTrue(topology_file.isTopology())
+        self.assertEqual(topology_file.nodeCount(), 1000)
+        self.assertEqual(len(topology_file.links()), 999)
+        self.assertEqual(topology_file.servers()[0]["port"], 8000)
+        self.assertEqual(topology_file.properties()["version"], "1.0")
+        self.assertEqual(topology_file.nodePlacement()[42], (1, "VPCSDevice"))
+        node_ids = [node["id"] for node in topology_file.nodes()]
+        self.assertEqual(node_ids, list(range(1, 1001)))
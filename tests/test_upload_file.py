@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+from unittest import TestCase
+
+from PyQt4.QtGui import QApplication
+
+from gns3.binary_transfer import BINARY_PROTOCOL, decodeChunk, encodeAck
+from gns3.node import Node
+from gns3.utils.upload_file import UploadFile, _uploadAck, _uploadNotification
+
+
+class FakeServer(object):
+
+    host = "192.168.1.1"
+    port = 8000
+
+    def __init__(self, protocol=BINARY_PROTOCOL):
+        self._protocol = protocol
+        self.messages = []
+        self.chunks = []
+        self.notifications = []
+        self.canceled = []
+
+    def connected(self):
+        return True
+
+    def protocol(self):
+        return self._protocol
+
+    def send_message(self, destination, params, callback, timeout=None):
+        self.messages.append((destination, params, callback))
+        return len(self.messages)
+
+    def cancel_message(self, request_id):
+        self.canceled.append(request_id)
+
+    def send_notification(self, destination, params=None):
+        self.notifications.append((destination, params))
+
+    def send_binary(self, data):
+        self.chunks.append(decodeChunk(data))
+
+
+class FakeNode(Node):
+
+    def name(self):
+        return "R1"
+
+    def _base64Config(self, config_path):
+        return "aG9zdG5hbWUgUjEK"
+
+
+class UploadTestCase(TestCase):
+
+    def setUp(self):
+        self.app = QApplication(sys.argv)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "c7200.image")
+        with open(self.path, "wb") as f:
+            f.write(os.urandom(150000))
+        self.errors = []
+        self.completed = []
+        self.progress = []
+
+    def tearDown(self):
+        os.remove(self.path)
+        os.rmdir(self.directory)
+        del self.app
+
+    def watch(self, upload):
+        upload.error.connect(lambda message, stop: self.errors.append((message, stop)))
+        upload.completed.connect(lambda: self.completed.append(True))
+        upload.update.connect(self.progress.append)
+
+    def acknowledge(self, server, offset):
+        transfer_id = server.messages[0][1]["transfer_id"]
+        _uploadAck(encodeAck(transfer_id, offset))
+
+
+class TestUploadFile(UploadTestCase):
+
+    def test_upload(self):
+        server = FakeServer()
+        upload = UploadFile(server, self.path, "images/c7200.image", chunk_size=65536, window=131072)
+        self.watch(upload)
+        upload.start()
+        self.app.processEvents()
+        destination, params, callback = server.messages[0]
+        self.assertEqual(destination, "upload.start")
+        self.assertEqual((params["destination"], params["size"]), ("images/c7200.image", 150000))
+
+        # one window is sent
+        callback({})
+        self.assertEqual([(offset, len(data)) for _, offset, data in server.chunks], [(0, 65536), (65536, 65536)])
+
+        self.acknowledge(server, 65536)
+        self.assertEqual(len(server.chunks), 3)
+        self.assertEqual(self.progress, [43])
+        self.assertEqual(b"".join(data for _, _, data in server.chunks), open(self.path, "rb").read())
+
+        self.acknowledge(server, 150000)
+        destination, params, callback = server.messages[1]
+        self.assertEqual(destination, "upload.finish")
+        callback({"path": "/opt/gns3/images/c7200.image"})
+        self.assertEqual(self.completed, [True])
+        self.assertEqual(upload.serverPath(), "/opt/gns3/images/c7200.image")
+        self.assertEqual(self.errors, [])
+
+    def test_not_supported(self):
+        upload = UploadFile(FakeServer(protocol=None), self.path, "images/c7200.image")
+        self.watch(upload)
+        upload.start()
+        self.app.processEvents()
+        self.assertEqual(len(self.errors), 1)
+        self.assertTrue(self.errors[0][1])
+
+    def test_server_error(self):
+        server = FakeServer()
+        upload = UploadFile(server, self.path, "images/c7200.image")
+        self.watch(upload)
+        upload.start()
+        self.app.processEvents()
+        server.messages[0][2]({})
+        _uploadNotification("upload.error", {"transfer_id": server.messages[0][1]["transfer_id"], "message": "disk full"})
+        self.assertEqual(self.errors, [("disk full", True)])
+
+        # acknowledgments after the error are ignored
+        self.acknowledge(server, 1)
+        self.assertEqual(self.progress, [])
+
+    def test_stop(self):
+        server = FakeServer()
+        upload = UploadFile(server, self.path, "images/c7200.image")
+        self.watch(upload)
+        upload.start()
+        self.app.processEvents()
+        upload.stop()
+        self.assertEqual(server.canceled, [1])
+        self.assertEqual(server.notifications[0][0], "upload.cancel")
+        server.messages[0][2]({})
+        self.assertEqual(server.chunks, [])
+        self.assertEqual(self.errors, [])
+
+    def test_stop_before_start(self):
+        server = FakeServer()
+        upload = UploadFile(server, self.path, "images/c7200.image")
+        upload.start()
+        upload.stop()
+        self.app.processEvents()
+        self.assertEqual(server.messages, [])
+
+
+class TestSendWithConfigs(UploadTestCase):
+
+    def test_base64(self):
+        server = FakeServer(protocol=None)
+        node = FakeNode(server)
+        node._sendWithConfigs("dynamips.vm.update", {"id": 1}, {"startup_config": self.path}, None)
+        self.assertEqual(server.messages, [("dynamips.vm.update", {"id": 1, "startup_config_base64": "aG9zdG5hbWUgUjEK"}, None)])
+
+    def test_upload(self):
+        server = FakeServer()
+        node = FakeNode(server)
+        node._sendWithConfigs("dynamips.vm.update", {"id": 1}, {"startup_config": self.path}, None)
+        self.app.processEvents()
+        self.assertEqual(server.messages[0][0], "upload.start")
+        server.messages[0][2]({})
+        self.acknowledge(server, 150000)
+        self.assertEqual(server.messages[-1][0], "upload.finish")
+        server.messages[-1][2]({})
+        destination, params, callback = server.messages[-1]
+        self.assertEqual(destination, "dynamips.vm.update")
+        self.assertEqual(params, {"id": 1, "startup_config_upload": "configs/node{}_startup_config".format(node.id())})
+
+    def test_upload_error(self):
+        server = FakeServer()
+        node = FakeNode(server)
+        node._sendWithConfigs("dynamips.vm.update", {"id": 1}, {"startup_config": self.path}, None)
+        self.app.processEvents()
+        server.messages[0][2]({"code": -3200, "message": "unknown method"}, True)
+        destination, params, callback = server.messages[-1]
+        self.assertEqual(destination, "dynamips.vm.update")
+        self.assertEqual(params, {"id": 1, "startup_config_base64": "aG9zdG5hbWUgUjEK"})
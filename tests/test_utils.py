@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 from unittest import TestCase
 
+from PyQt4.QtCore import QEventLoop, QTimer
 from PyQt4.QtGui import QApplication
 
 from gns3.utils.choices_spinbox import ChoicesSpinBox
+from gns3.utils.wait_for_connection import WaitForConnection
 
+import socket
 import sys
 
 
@@ -31,3 +34,47 @@ class TestChoicesSpinBox(TestCase):
         self.assertEqual(self.sb.value(), 13)
         self.sb.setValue(-100)
         self.assertEqual(self.sb.value(), -1)
+
+
+class TestWaitForConnection(TestCase):
+    def setUp(self):
+        self.app = QApplication(sys.argv)
+        self.results = []
+
+    def tearDown(self):
+        del self.app
+
+    def wait(self, watcher, timeout=5000):
+        loop = QEventLoop()
+        watcher.completed.connect(lambda: self.results.append("completed"))
+        watcher.error.connect(lambda message, stop: self.results.append("error"))
+        watcher.completed.connect(loop.quit)
+        watcher.error.connect(loop.quit)
+        QTimer.singleShot(timeout, loop.quit)
+        watcher.start()
+        loop.exec_()
+
+    def test_connected(self):
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen(1)
+            self.wait(WaitForConnection("127.0.0.1", server.getsockname()[1]))
+        self.assertEqual(self.results, ["completed"])
+
+    def test_server_started_later(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = socket.socket()
+        # starts listening while the connection is being retried
+        QTimer.singleShot(300, lambda: (server.bind(("127.0.0.1", port)), server.listen(1)))
+        self.wait(WaitForConnection("127.0.0.1", port))
+        server.close()
+        self.assertEqual(self.results, ["completed"])
+
+    def test_timeout(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.wait(WaitForConnection("127.0.0.1", port, timeout=0.5))
+        self.assertEqual(self.results, ["error"])